@@ -1,8 +1,17 @@
 import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler, ContextTypes
-from config import TELEGRAM_TOKEN, ADMIN_ID
-from database import Database
+from config import (
+    TELEGRAM_TOKEN, TELEGRAM_API_URL, ADMIN_IDS, PROFILE_DEFAULT_SECONDS, PROFILE_MAX_SECONDS,
+    PENDING_PAGE_SIZE
+)
+from database import get_database
+from message_queue import get_send_queue
+import metrics
+import profiler
 
 # Логирование
 logging.basicConfig(
@@ -11,11 +20,19 @@ logging.basicConfig(
 )
 
 # Инициализация
-db = Database()
+db = get_database()
+# Уведомления пользователям идут через общую очередь с учетом лимитов Telegram
+send_queue = get_send_queue()
+
+# Наибольшая длина сообщения Telegram
+MESSAGE_LIMIT = 4096
+# Сколько символов карты показывается на странице: вся страница помещается в одно сообщение
+PREVIEW_LENGTH = max(100, min(500, 3000 // max(1, PENDING_PAGE_SIZE)))
 
+@metrics.handler
 async def admin_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Начальная команда для админа"""
-    if update.effective_user.id != ADMIN_ID:
+    if update.effective_user.id not in ADMIN_IDS:
         await update.message.reply_text("У вас нет доступа к админским функциям.")
         return
     
@@ -24,97 +41,234 @@ async def admin_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "Доступные команды:\n"
         "/pending - Показать карты на модерации\n"
         "/approve <map_id> - Одобрить карту\n"
-        "/reject <map_id> - Отклонить карту"
+        "/reject <map_id> - Отклонить карту\n"
+        "/profile [секунды] - Профиль работающего бота (flamegraph)"
     )
 
+def pending_page(after: int = 0, before: Optional[int] = None) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Текст и клавиатура страницы очереди модерации.
+    
+    Страница — PENDING_PAGE_SIZE карт с номером больше after (с before — перед
+    картой before). Кнопки страницы передают номера карт, а не их map_id:
+    так callback_data укладывается в 64 байта, а «одобрить страницу» касается
+    только карт с номерами из показанного диапазона — новые карты получают
+    большие номера и в него не попадают."""
+    if before is not None:
+        page = db.get_pending_page(limit=PENDING_PAGE_SIZE, before=before)
+        if len(page) < PENDING_PAGE_SIZE:
+            page = db.get_pending_page(limit=PENDING_PAGE_SIZE)
+    else:
+        page = db.get_pending_page(after, PENDING_PAGE_SIZE)
+        if not page and after:
+            # Разобрана последняя страница — показываем предыдущую
+            page = db.get_pending_page(limit=PENDING_PAGE_SIZE, before=after + 1)
+    if not page:
+        return "Нет карт на модерации.", None
+    
+    first, last = page[0][0], page[-1][0]
+    after = first - 1
+    total = db.count_pending()
+    position = db.count_pending(before=first)
+    
+    lines = [f"📋 Карты на модерации: {position + 1}–{position + len(page)} из {total}"]
+    keyboard = []
+    for number, (_, map_id, map_data) in enumerate(page, 1):
+        map_text = map_data['data']['map_text']
+        if len(map_text) > PREVIEW_LENGTH:
+            map_text = map_text[:PREVIEW_LENGTH] + "..."
+        lines.append("")
+        lines.append(f"{number}. {map_id} · пользователь {map_data['user_id']} · {map_data['data']['type']}")
+        if map_data['data'].get('duplicate_of'):
+            lines.append(f"⚠️ Повтор карты {map_data['data']['duplicate_of']}")
+        lines.append(map_text)
+        keyboard.append([
+            InlineKeyboardButton(f"✅ {number}", callback_data=f"pending_map:approve:{after}:{map_id}"),
+            InlineKeyboardButton(f"❌ {number}", callback_data=f"pending_map:reject:{after}:{map_id}")
+        ])
+    keyboard.append([
+        InlineKeyboardButton("✅ Одобрить страницу", callback_data=f"pending_page:approve:{after}:{last}"),
+        InlineKeyboardButton("❌ Отклонить страницу", callback_data=f"pending_page:reject:{after}:{last}")
+    ])
+    
+    pages = (total + PENDING_PAGE_SIZE - 1) // PENDING_PAGE_SIZE
+    navigation = []
+    if position > 0:
+        navigation.append(InlineKeyboardButton("◀️ Назад", callback_data=f"pending_before:{first}"))
+    navigation.append(InlineKeyboardButton(
+        f"🔄 {position // PENDING_PAGE_SIZE + 1}/{pages}", callback_data=f"pending:{after}"
+    ))
+    if position + len(page) < total:
+        navigation.append(InlineKeyboardButton("Вперед ▶️", callback_data=f"pending:{last}"))
+    keyboard.append(navigation)
+    
+    text = "\n".join(lines)
+    if len(text) > MESSAGE_LIMIT:
+        text = text[:MESSAGE_LIMIT - 3] + "..."
+    return text, InlineKeyboardMarkup(keyboard)
+
+@metrics.handler
 async def show_pending(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Показать карты на модерации"""
-    if update.effective_user.id != ADMIN_ID:
+    """Показать карты на модерации (первую страницу очереди)"""
+    if update.effective_user.id not in ADMIN_IDS:
         await update.message.reply_text("У вас нет доступа к админским функциям.")
         return
     
-    pending_maps = db.get_pending_maps()
+    text, reply_markup = pending_page()
+    await update.message.reply_text(text, reply_markup=reply_markup)
+
+async def edit_pending_page(query, after: int = 0, before: Optional[int] = None):
+    """Показывает страницу очереди в том же сообщении"""
+    text, reply_markup = pending_page(after, before)
+    try:
+        await query.edit_message_text(text, reply_markup=reply_markup)
+    except BadRequest as e:
+        # Страница не изменилась, например, при повторном нажатии «обновить»
+        if "not modified" not in str(e):
+            raise
+
+async def pending_callback(query, context: ContextTypes.DEFAULT_TYPE):
+    """Кнопки страницы очереди модерации: листание и решения по картам"""
+    kind, _, args = query.data.partition(":")
+    if kind == "pending":
+        await query.answer()
+        await edit_pending_page(query, after=int(args))
+    elif kind == "pending_before":
+        await query.answer()
+        await edit_pending_page(query, before=int(args))
+    elif kind == "pending_map":
+        action, after, map_id = args.split(":", 2)
+        map_data = db.get_map(map_id)
+        if map_data is None or map_data.get('status') != "pending":
+            await query.answer(f"Карта {map_id} уже разобрана.")
+        elif action == "approve":
+            await approve_map(map_id, context)
+            await query.answer(f"✅ Карта {map_id} одобрена")
+        else:
+            await reject_map(map_id, context)
+            await query.answer(f"❌ Карта {map_id} отклонена")
+        await edit_pending_page(query, after=int(after))
+    elif kind == "pending_page":
+        action, after, last = args.split(":")
+        # Только карты показанной страницы, которые еще на модерации
+        page = [
+            (map_id, map_data) for seq, map_id, map_data in db.get_pending_page(int(after), PENDING_PAGE_SIZE)
+            if seq <= int(last)
+        ]
+        await moderate_maps(page, action == "approve", context)
+        verdict = "Одобрено" if action == "approve" else "Отклонено"
+        await query.answer(f"{verdict} карт: {len(page)}")
+        await edit_pending_page(query, after=int(after))
+
+@metrics.handler
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Снимает профиль работающего процесса и присылает его файлом"""
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("У вас нет доступа к админским функциям.")
+        return
     
-    if not pending_maps:
-        await update.message.reply_text("Нет карт на модерации.")
+    seconds = PROFILE_DEFAULT_SECONDS
+    if context.args:
+        try:
+            seconds = float(context.args[0])
+        except ValueError:
+            seconds = 0
+    if not 1 <= seconds <= PROFILE_MAX_SECONDS:
+        await update.message.reply_text(f"Использование: /profile [секунды], от 1 до {PROFILE_MAX_SECONDS:g}")
         return
     
-    for map_id, map_data in pending_maps.items():
-        user_id = map_data['user_id']
-        map_type = map_data['data']['type']
-        map_text = map_data['data']['map_text'][:500] + "..." if len(map_data['data']['map_text']) > 500 else map_data['data']['map_text']
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("✅ Одобрить", callback_data=f"approve_{map_id}"),
-                InlineKeyboardButton("❌ Отклонить", callback_data=f"reject_{map_id}")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        message_text = f"📋 Карта на модерации\n\n"
-        message_text += f"ID: {map_id}\n"
-        message_text += f"Пользователь: {user_id}\n"
-        message_text += f"Тип: {map_type}\n\n"
-        message_text += f"Содержание:\n{map_text}"
-        
-        await update.message.reply_text(message_text, reply_markup=reply_markup)
+    await update.message.reply_text(f"Профилирование {seconds:g} с...")
+    try:
+        result = await profiler.profile(seconds)
+    except profiler.ProfilerBusy:
+        await update.message.reply_text("Профилирование уже идет, дождитесь результата.")
+        return
+    
+    await update.message.reply_document(
+        document=result.collapsed().encode("utf-8"),
+        filename=f"profile-{time.strftime('%Y%m%d-%H%M%S')}.collapsed",
+        caption=(
+            f"{result.samples} выборок за {result.elapsed:.1f} с, {len(result.stacks)} разных стеков.\n"
+            "Формат collapsed stacks: flamegraph.pl, speedscope.app, inferno"
+        )
+    )
 
+@metrics.handler
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка callback кнопок"""
-    if update.effective_user.id != ADMIN_ID:
+    if update.effective_user.id not in ADMIN_IDS:
         await update.callback_query.answer("У вас нет доступа к админским функциям.")
         return
     
     query = update.callback_query
-    await query.answer()
-    
     data = query.data
+    if data.startswith("pending"):
+        await pending_callback(query, context)
+        return
+    
+    await query.answer()
     if data.startswith("approve_"):
-        map_id = data.split("_")[1]
+        map_id = data.split("_", 1)[1]
         await approve_map(map_id, context)
         await query.edit_message_text(f"✅ Карта {map_id} одобрена!")
     elif data.startswith("reject_"):
-        map_id = data.split("_")[1]
+        map_id = data.split("_", 1)[1]
         await reject_map(map_id, context)
         await query.edit_message_text(f"❌ Карта {map_id} отклонена!")
 
+def notify_user(map_data: Dict[str, Any], approved: bool):
+    """Ставит в очередь сообщение пользователю о решении по его карте"""
+    if approved:
+        # Отправляем карту пользователю
+        text = f"✅ Ваша психологическая карта одобрена!\n\n{map_data['data']['map_text']}"
+    else:
+        text = "❌ Ваша психологическая карта была отклонена модератором. Попробуйте создать новую карту."
+    send_queue.send(map_data['user_id'], text)
+
 async def approve_map(map_id: str, context: ContextTypes.DEFAULT_TYPE):
     """Одобрить карту и отправить пользователю"""
-    map_data = db.data.get("psychological_maps", {}).get(map_id)
+    map_data = db.get_map(map_id)
     if not map_data:
         return
     
     db.approve_map(map_id)
-    user_id = map_data['user_id']
-    map_text = map_data['data']['map_text']
-    
-    # Отправляем карту пользователю
-    try:
-        await context.bot.send_message(
-            chat_id=user_id,
-            text=f"✅ Ваша психологическая карта одобрена!\n\n{map_text}"
-        )
-    except Exception as e:
-        logging.error(f"Error sending approved map to user {user_id}: {e}")
+    notify_user(map_data, True)
 
 async def reject_map(map_id: str, context: ContextTypes.DEFAULT_TYPE):
     """Отклонить карту и уведомить пользователя"""
-    map_data = db.data.get("psychological_maps", {}).get(map_id)
+    map_data = db.get_map(map_id)
     if not map_data:
         return
     
     db.reject_map(map_id)
-    user_id = map_data['user_id']
-    
-    # Уведомляем пользователя
-    try:
-        await context.bot.send_message(
-            chat_id=user_id,
-            text="❌ Ваша психологическая карта была отклонена модератором. Попробуйте создать новую карту."
-        )
-    except Exception as e:
-        logging.error(f"Error sending rejection to user {user_id}: {e}")
+    notify_user(map_data, False)
+
+async def moderate_maps(maps: List[Tuple[str, Dict[str, Any]]], approved: bool, context: ContextTypes.DEFAULT_TYPE):
+    """Одобрить или отклонить несколько карт одной записью и уведомить пользователей"""
+    if not maps:
+        return
+    db.set_maps_status([map_id for map_id, _ in maps], "approved" if approved else "rejected")
+    for _, map_data in maps:
+        notify_user(map_data, approved)
+
+async def post_init(application):
+    db.start_write_behind()
+    send_queue.start(application.bot)
+    await metrics.start(application)
+
+async def post_shutdown(application):
+    # Сохраняем изменения, накопленные при отложенной записи
+    await db.stop_write_behind()
+    # Дожидаемся отправки уведомлений пользователям
+    await send_queue.stop()
+    await metrics.stop()
+
+def register_handlers(app):
+    """Регистрирует обработчики админ-панели"""
+    app.add_handler(CommandHandler("admin", admin_start))
+    app.add_handler(CommandHandler("pending", show_pending))
+    # Замер длится секунды: обработчик не должен задерживать остальные обновления
+    app.add_handler(CommandHandler("profile", profile_command, block=False))
+    app.add_handler(CallbackQueryHandler(handle_callback))
 
 def main():
     """Запуск админского бота"""
@@ -123,19 +277,23 @@ def main():
         logging.error("BOT_TOKEN environment variable is not set")
         return
     
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
-    
-    app.add_handler(CommandHandler("admin", admin_start))
-    app.add_handler(CommandHandler("pending", show_pending))
-    app.add_handler(CallbackQueryHandler(handle_callback))
+    builder = (
+        ApplicationBuilder()
+        .token(TELEGRAM_TOKEN)
+        .request(metrics.bot_request(connection_pool_size=256, read_timeout=30, write_timeout=30))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(TELEGRAM_API_URL)
+    app = builder.build()
+    register_handlers(app)
     
     logging.info("Starting admin bot with polling...")
     app.run_polling(
         poll_interval=1.0,
         timeout=30,
-        bootstrap_retries=5,
-        read_timeout=30,
-        write_timeout=30
+        bootstrap_retries=5
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+"""
+Анализ ответов анкеты по измерениям из config.ANALYSIS_DIMENSIONS.
+
+Каждый ответ один раз разбивается на слова и превращается в разреженный
+мешок ключевых слов (сравнение по основам, см. StemMatcher). Оценки всех
+измерений считаются одним матричным умножением на матрицу весов:
+вклад ответа в измерение — сумма весов найденных слов, не больше 1,
+а оценка анкеты — среднее по ответам (от 0 до 1). Пакетный режим
+score_batch оценивает тысячи сохраненных анкет за одно умножение.
+"""
+
+from typing import Any, Dict, List, Sequence
+import numpy as np
+from config import ANALYSIS_DIMENSIONS
+from keyword_matcher import StemMatcher, WORD
+
+class AnswerAnalyzer:
+    def __init__(self, dimensions: Dict[str, Dict[str, Any]] = ANALYSIS_DIMENSIONS):
+        self.dimensions = dimensions
+        self.names = list(dimensions)
+        keywords = list(dict.fromkeys(
+            keyword.lower() for dimension in dimensions.values() for keyword in dimension["keywords"]
+        ))
+        self._columns = {keyword: column for column, keyword in enumerate(keywords)}
+        # Каждое ключевое слово — отдельный признак: категория совпадает с самим словом
+        self._matcher = StemMatcher({keyword: [keyword] for keyword in keywords})
+        self._weights = np.zeros((len(keywords), len(self.names)))
+        for index, dimension in enumerate(dimensions.values()):
+            for keyword, weight in dimension["keywords"].items():
+                self._weights[self._columns[keyword.lower()], index] = weight
+    
+    def vectorize(self, answers: Sequence[str]) -> np.ndarray:
+        """Матрица ответы x ключевые слова: сколько раз слово встречается в ответе"""
+        features = len(self._columns)
+        columns, lookup = self._columns, self._matcher.lookup
+        cells = []
+        for row, answer in enumerate(answers):
+            offset = row * features
+            for word in WORD.findall(answer.lower()):
+                found = lookup(word)
+                if found is not None:
+                    cells.append(offset + columns[found[0]])
+        counts = np.bincount(np.asarray(cells, dtype=np.int64), minlength=len(answers) * features)
+        return counts.reshape(len(answers), features)
+    
+    def answer_scores(self, answers: Sequence[str]) -> np.ndarray:
+        """Матрица ответы x измерения: вклад каждого ответа, от 0 до 1"""
+        return np.minimum(self.vectorize(answers) @ self._weights, 1.0)
+    
+    def score_batch(self, answer_lists: Sequence[Sequence[str]]) -> np.ndarray:
+        """Оценки многих анкет сразу: матрица анкеты x измерения"""
+        lengths = np.fromiter((len(answers) for answers in answer_lists), dtype=np.int64, count=len(answer_lists))
+        flat = [answer for answers in answer_lists for answer in answers]
+        totals = np.zeros((len(flat) + 1, len(self.names)))
+        np.cumsum(self.answer_scores(flat), axis=0, out=totals[1:])
+        ends = np.cumsum(lengths)
+        sums = totals[ends] - totals[ends - lengths]
+        return sums / np.maximum(lengths, 1)[:, None]
+    
+    def score(self, answers: Sequence[str]) -> Dict[str, float]:
+        """Оценки одной анкеты по всем измерениям"""
+        return dict(zip(self.names, self.score_batch([answers])[0].tolist()))
+    
+    def describe(self, scores: Dict[str, float]) -> List[str]:
+        """Строки анализа: для каждого измерения описание уровня, в который попала оценка"""
+        lines = []
+        for name, dimension in self.dimensions.items():
+            score = scores[name]
+            text = next(text for threshold, text in dimension["levels"] if score >= threshold)
+            lines.append(f"{dimension['title']}: {text} ({score:.0%})")
+        return lines
\ No newline at end of file
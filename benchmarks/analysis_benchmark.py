@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Оценка анкет по измерениям анализа: прежний подсчет (StemMatcher.categories
+и Counter для каждого ответа), AnswerAnalyzer.score по одной анкете и
+AnswerAnalyzer.score_batch для всех анкет сразу (повторный анализ
+сохраненных карт). Перед замером проверяется, что для измерений с весами 1
+оценка равна доле ответов, в которых найдено слово измерения.
+
+Запуск:
+    python3 benchmarks/analysis_benchmark.py [--maps 5000] [--answers 10]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis import AnswerAnalyzer
+from config import ANALYSIS_DIMENSIONS
+from keyword_matcher import StemMatcher
+
+PHRASES = [
+    "Постоянный стресс на работе, к вечеру чувствую сильную усталость",
+    "Люблю проводить время с друзьями и общаться с новыми людьми",
+    "Занимаюсь спортом три раза в неделю",
+    "Мне грустно по вечерам, иногда тревожусь без причины",
+    "Сегодня у меня хорошее настроение",
+    "Предпочитаю побыть одна и почитать",
+    "Мне нравится запах кофе по утрам",
+    "Часто беспокоюсь о будущем",
+    "Хожу на тренировки по плаванию",
+    "Читаю по вечерам классику",
+]
+
+def make_maps(count: int, answers: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [[rng.choice(PHRASES) for _ in range(answers)] for _ in range(count)]
+
+def legacy_scores(matcher: StemMatcher, answers) -> dict:
+    counts = Counter()
+    for answer in answers:
+        counts.update(matcher.categories(answer))
+    return {name: counts[name] / len(answers) for name in ANALYSIS_DIMENSIONS}
+
+def timed(func) -> float:
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--maps", type=int, default=5000)
+    parser.add_argument("--answers", type=int, default=10)
+    args = parser.parse_args()
+    
+    maps = make_maps(args.maps, args.answers)
+    analyzer = AnswerAnalyzer()
+    matcher = StemMatcher({name: dimension["keywords"] for name, dimension in ANALYSIS_DIMENSIONS.items()})
+    
+    unweighted = [name for name, dimension in ANALYSIS_DIMENSIONS.items()
+                  if all(weight == 1 for weight in dimension["keywords"].values())]
+    batch = analyzer.score_batch(maps)
+    for answers, row in zip(maps[:200], batch):
+        expected = legacy_scores(matcher, answers)
+        single = analyzer.score(answers)
+        for index, name in enumerate(analyzer.names):
+            assert abs(single[name] - row[index]) < 1e-9, (name, answers)
+            if name in unweighted:
+                assert abs(expected[name] - row[index]) < 1e-9, (name, answers)
+    
+    total = args.maps * args.answers
+    results = [
+        ("Counter по ответам", timed(lambda: [legacy_scores(matcher, answers) for answers in maps])),
+        ("score по анкете", timed(lambda: [analyzer.score(answers) for answers in maps])),
+        ("score_batch", timed(lambda: analyzer.score_batch(maps))),
+    ]
+    print(f"{args.maps} анкет по {args.answers} ответов, измерений: {len(analyzer.names)}")
+    for title, elapsed in results:
+        print(f"  {title:<20} {elapsed * 1000:>9.1f} мс  {total / elapsed:>12,.0f} ответов/с")
+    print("\nСредние оценки:", ", ".join(f"{name} {value:.2f}" for name, value in zip(analyzer.names, batch.mean(axis=0))))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
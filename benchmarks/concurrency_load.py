@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест параллельной обработки обновлений (update_processor).
+
+--users пользователей одновременно проходят базовую анкету: /start, выбор
+карты и типа анкеты, ответы на вопросы. Следующее сообщение пользователь
+отправляет после ответа бота и паузы (в среднем --think секунд, как будто
+читает вопрос и пишет ответ). Ответы принимает локальный Bot API с задержкой
+--api-delay на каждый sendMessage (сетевая задержка до Telegram). Bot API
+работает в отдельном процессе (FakeBotApiProcess).
+
+Тест выполняется дважды, в отдельных процессах: с UPDATE_CONCURRENCY=1
+(все обновления по очереди, как раньше) и с UPDATE_CONCURRENCY=--concurrency
+(PerUserUpdateProcessor). Для каждого режима выводится задержка первого
+ответа бота p50/p99 и проверяется, что ответы каждой анкеты сохранены в
+порядке отправки.
+
+Запуск:
+    python3 benchmarks/concurrency_load.py [--users 1000] [--concurrency 256] [--think 30] [--api-delay 0.005]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeBotApiProcess
+
+# Сколько пользователь ждет ответа бота, прежде чем бросить анкету, с
+REPLY_TIMEOUT = 120
+
+def message_update(user_id: int, text: str) -> dict:
+    message = {
+        "message_id": 1,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    return {"message": message}
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+def script(user_id: int):
+    """Сообщения пользователя, число ответов бота на каждое и ответы анкеты"""
+    from map_catalog import MAPS, MAP_TYPES
+    entry = MAPS[user_id % len(MAPS)]
+    map_type = MAP_TYPES[0]
+    answers = [f"Ответ {i + 1} пользователя {user_id}: обычно вечером я гуляю и отдыхаю."
+               for i in range(len(entry.questions(map_type)))]
+    steps = [("/start", 1), ("2️⃣ Создать психологическую карту", 2), (entry.button, 1), (map_type.button, 1)]
+    steps += [(answer, 1) for answer in answers[:-1]] + [(answers[-1], 2)]
+    return steps, answers
+
+async def run(users: int, think: float, api_delay: float):
+    loop = asyncio.get_running_loop()
+    replies = {}
+    
+    def on_send(sent):
+        queue = replies.get(int(sent["chat_id"]))
+        if queue is not None:
+            loop.call_soon_threadsafe(queue.put_nowait, sent["time"])
+    
+    api = FakeBotApiProcess(delay=api_delay, on_send=on_send).start()
+    os.environ.update(BOT_TOKEN="123456:FAKE", TELEGRAM_API_URL=api.base_url)
+    import bot_polling
+    # Строка лога на каждый запрос к Bot API заметно нагружает процесс теста
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    
+    app = bot_polling.build_application()
+    bot_polling.register_handlers(app)
+    latencies = []
+    
+    async def user(user_id: int) -> bool:
+        """Проходит анкету; False, если пользователь бросил ее без ответа бота"""
+        replies[user_id] = queue = asyncio.Queue()
+        steps, _ = script(user_id)
+        rng = random.Random(user_id)
+        await asyncio.sleep(rng.uniform(0, think))
+        try:
+            for text, expected in steps:
+                await asyncio.sleep(rng.expovariate(1 / think))
+                sent_at = time.perf_counter()
+                api.add_update(message_update(user_id, text))
+                latencies.append((await asyncio.wait_for(queue.get(), REPLY_TIMEOUT) - sent_at) * 1000)
+                for _ in range(expected - 1):
+                    await asyncio.wait_for(queue.get(), REPLY_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Ответ потерян (бот не смог его отправить) — пользователь бросает анкету
+            return False
+        return True
+    
+    async with app:
+        await bot_polling.post_init(app)
+        await app.start()
+        await app.updater.start_polling(poll_interval=0)
+        started = time.perf_counter()
+        finished = await asyncio.gather(*(user(10000 + i) for i in range(users)))
+        elapsed = time.perf_counter() - started
+        await app.updater.stop()
+        await app.stop()
+        await bot_polling.post_shutdown(app)
+    api.stop()
+    
+    in_order = 0
+    for i in range(users):
+        user_id = 10000 + i
+        saved = [m["data"]["answers"] for m in bot_polling.db.get_user_maps(user_id).values()]
+        in_order += saved == [script(user_id)[1]]
+    
+    print(f"UPDATE_CONCURRENCY={app.concurrent_updates}: {len(latencies)} сообщений за {elapsed:.1f} с "
+          f"({len(latencies) / elapsed:.0f}/с)")
+    print(f"  задержка ответа: p50 {percentile(latencies, 0.5):.1f} мс, p99 {percentile(latencies, 0.99):.1f} мс, "
+          f"макс {max(latencies):.1f} мс")
+    print(f"  анкет с ответами в порядке отправки: {in_order} из {users}, брошено без ответа бота: {finished.count(False)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--think", type=float, default=30.0)
+    parser.add_argument("--api-delay", type=float, default=0.005)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.chdir(tmp_dir)
+            asyncio.run(run(args.users, args.think, args.api_delay))
+            os.chdir(REPO_DIR)
+        return
+    
+    # В режиме json каждая запись переписывает весь файл базы и
+    # упирается в процессор раньше, чем обработка обновлений
+    env = {"DATABASE_MODE": "wal", **os.environ}
+    for concurrency in (1, args.concurrency):
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", "--users", str(args.users),
+             "--think", str(args.think), "--api-delay", str(args.api_delay)],
+            env={**env, "UPDATE_CONCURRENCY": str(concurrency)}, check=True
+        )
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
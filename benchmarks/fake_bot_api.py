@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Локальная замена Telegram Bot API для проверок без обращения к Telegram.
+
+Сервер понимает методы, которые использует бот (getUpdates, setWebhook,
+sendMessage, editMessageText, answerCallbackQuery, sendDocument и служебные), считает
+вызовы каждого метода и, как настоящий Telegram, завершает ответом
+409 Conflict предыдущий long-poll getUpdates, если пришел новый.
+
+Бот направляется на сервер переменной TELEGRAM_API_URL=http://127.0.0.1:<порт>/bot
+Параметр delay добавляет задержку к исходящим вызовам (как сетевая
+задержка до Telegram), on_send вызывается из потока сервера для каждого
+исходящего вызова: отправленного или измененного сообщения и ответа на
+нажатие кнопки. FakeBotApiProcess запускает сервер в отдельном процессе, чтобы
+под нагрузкой его потоки не конкурировали с ботом за GIL.
+
+Отдельный запуск:
+    python3 benchmarks/fake_bot_api.py [--port 8081]
+"""
+
+import argparse
+import email.parser
+import email.policy
+import json
+import multiprocessing
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qsl
+
+BOT_USER = {
+    "id": 100000001,
+    "is_bot": True,
+    "first_name": "FakeBot",
+    "username": "fake_bot",
+    "can_join_groups": False,
+    "can_read_all_group_messages": False,
+    "supports_inline_queries": False,
+}
+
+class _Server(ThreadingHTTPServer):
+    # Очередь входящих соединений: при параллельной обработке обновлений
+    # бот открывает сотни соединений одновременно
+    request_queue_size = 1024
+    daemon_threads = True
+
+class FakeBotApi:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0,
+                 on_send: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.delay = delay
+        self.on_send = on_send
+        self.calls: Counter = Counter()
+        self.conflicts = 0
+        self.sent: List[Dict[str, Any]] = []
+        self._updates: List[Dict[str, Any]] = []
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._poll_generation = 0
+        self._cond = threading.Condition()
+        self._server = _Server((host, port), self._make_handler())
+        self._thread = None
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+    
+    def start(self) -> "FakeBotApi":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def add_update(self, update: Dict[str, Any]) -> int:
+        """Ставит обновление в очередь getUpdates и возвращает его update_id"""
+        with self._cond:
+            update = dict(update, update_id=self._next_update_id)
+            self._next_update_id += 1
+            self._updates.append(update)
+            self._cond.notify_all()
+        return update["update_id"]
+    
+    def _make_handler(self):
+        api = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                method = self.path.rsplit("/", 1)[-1]
+                length = int(self.headers.get("Content-Length") or 0)
+                params = api._parse_params(self.headers.get("Content-Type", ""), self.rfile.read(length))
+                api.calls[method] += 1
+                status, body = api.dispatch(method, params)
+                payload = json.dumps(body).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # Клиент отменил long-poll при остановке
+            
+            do_GET = do_POST
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler
+    
+    @staticmethod
+    def _parse_params(content_type: str, raw: bytes) -> Dict[str, Any]:
+        if not raw:
+            return {}
+        if content_type.startswith("application/json"):
+            return json.loads(raw)
+        if content_type.startswith("multipart/form-data"):
+            # Загрузка файла (sendDocument): вместо содержимого файла — его размер
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + raw
+            )
+            params = {}
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                payload = part.get_payload(decode=True)
+                if part.get_filename():
+                    params[name] = {"filename": part.get_filename(), "size": len(payload)}
+                else:
+                    params[name] = payload.decode("utf-8")
+            return params
+        params = {}
+        for key, value in parse_qsl(raw.decode("utf-8"), keep_blank_values=True):
+            try:
+                params[key] = json.loads(value)
+            except ValueError:
+                params[key] = value
+        return params
+    
+    def _message(self, chat_id: Any, text: str = "", message_id: int = 0, **extra) -> Dict[str, Any]:
+        if not message_id:
+            with self._cond:
+                message_id = self._next_message_id
+                self._next_message_id += 1
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            "from": BOT_USER,
+            "text": text,
+        }
+        message.update(extra)
+        return message
+    
+    def dispatch(self, method: str, params: Dict[str, Any]):
+        """Возвращает (HTTP-статус, тело ответа) для метода Bot API"""
+        if method == "getUpdates":
+            return self._get_updates(params)
+        if method == "getMe":
+            return 200, {"ok": True, "result": BOT_USER}
+        if method in ("deleteWebhook", "setWebhook", "close", "logOut"):
+            return 200, {"ok": True, "result": True}
+        if method in ("sendMessage", "editMessageText", "answerCallbackQuery", "sendDocument"):
+            if self.delay:
+                time.sleep(self.delay)
+            if method == "answerCallbackQuery":
+                result = True
+            elif method == "editMessageText":
+                result = self._message(params["chat_id"], params.get("text", ""),
+                                       message_id=int(params["message_id"]), edit_date=int(time.time()))
+            elif method == "sendDocument":
+                document = params.get("document") or {}
+                result = self._message(params["chat_id"], caption=params.get("caption", ""), document={
+                    "file_id": f"document{self._next_message_id}",
+                    "file_unique_id": f"document{self._next_message_id}",
+                    "file_name": document.get("filename", ""),
+                    "file_size": document.get("size", 0),
+                })
+            else:
+                result = self._message(params["chat_id"], params.get("text", ""))
+            sent = {"method": method, "time": time.perf_counter(), **params}
+            if method != "answerCallbackQuery":
+                sent["message_id"] = result["message_id"]
+                with self._cond:
+                    self.sent.append(sent)
+            if self.on_send:
+                self.on_send(sent)
+            return 200, {"ok": True, "result": result}
+        return 404, {"ok": False, "error_code": 404, "description": "Not Found: method not found"}
+    
+    def _get_updates(self, params: Dict[str, Any]):
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            # Новый long-poll прерывает текущий, как в настоящем Bot API
+            self._poll_generation += 1
+            generation = self._poll_generation
+            self._cond.notify_all()
+            while True:
+                if generation != self._poll_generation:
+                    self.conflicts += 1
+                    return 409, {
+                        "ok": False,
+                        "error_code": 409,
+                        "description": "Conflict: terminated by other getUpdates request; "
+                                       "make sure that only one bot instance is running",
+                    }
+                if offset:
+                    self._updates = [u for u in self._updates if u["update_id"] >= offset]
+                if self._updates:
+                    return 200, {"ok": True, "result": list(self._updates)}
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return 200, {"ok": True, "result": []}
+                self._cond.wait(remaining)
+
+def _serve(delay: float, updates, sent):
+    api = FakeBotApi(delay=delay, on_send=sent.put).start()
+    sent.put(api.base_url)
+    for update in iter(updates.get, None):
+        api.add_update(update)
+    api.stop()
+
+class FakeBotApiProcess:
+    """FakeBotApi в отдельном процессе; on_send вызывается из потока этого процесса"""
+    
+    def __init__(self, delay: float = 0.0, on_send: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.on_send = on_send
+        self.base_url = None
+        self._updates = multiprocessing.Queue()
+        self._sent = multiprocessing.Queue()
+        self._process = multiprocessing.Process(target=_serve, args=(delay, self._updates, self._sent), daemon=True)
+        self._receiver = threading.Thread(target=self._receive, daemon=True)
+    
+    def start(self) -> "FakeBotApiProcess":
+        self._process.start()
+        self.base_url = self._sent.get(timeout=30)
+        self._receiver.start()
+        return self
+    
+    def stop(self):
+        self._updates.put(None)
+        self._process.join()
+        self._sent.put(None)
+        self._receiver.join()
+    
+    def add_update(self, update: Dict[str, Any]):
+        self._updates.put(update)
+    
+    def _receive(self):
+        # Время в записях — time.perf_counter процесса сервера: на Linux это
+        # CLOCK_MONOTONIC, общий для всех процессов
+        for sent in iter(self._sent.get, None):
+            if self.on_send:
+                self.on_send(sent)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+    
+    api = FakeBotApi(args.host, args.port).start()
+    print(f"Fake Bot API: {api.base_url}")
+    try:
+        while True:
+            time.sleep(10)
+            print(dict(api.calls), f"conflicts={api.conflicts}")
+    except KeyboardInterrupt:
+        api.stop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
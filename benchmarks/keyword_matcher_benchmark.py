@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Сравнение поиска ключевых слов-подстрок: прежний вариант из LocalResponseSystem
+(lower() и any(word in text ...) для каждой группы слов) и KeywordMatcher
+в обоих режимах — str.find по словам и одно скомпилированное выражение.
+Перед замером проверяется, что все варианты дают одинаковый результат.
+Последняя таблица показывает, с какого размера словаря выражение выгоднее
+(порог keyword_matcher.REGEX_MIN_KEYWORDS).
+
+Запуск:
+    python3 benchmarks/keyword_matcher_benchmark.py [--size 4096] [--answers 10]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keyword_matcher import KeywordMatcher
+
+# Словари в том виде, в котором они искались как подстроки
+CONSULTATION_TOPICS = {
+    "stress": ['стресс', 'устал', 'утомлен', 'напряжен'],
+    "anxiety": ['тревож', 'беспоко', 'волну'],
+    "loneliness": ['одинок', 'непонят', 'отвергнут'],
+    "anger": ['злость', 'раздражен', 'сердит'],
+}
+ANSWER_KEYWORDS = {
+    "emotional": ['хорошо', 'плохо', 'грустно', 'радостно', 'спокойно', 'волнуюсь', 'устал'],
+    "social": ['люди', 'друзья', 'общение', 'компания', 'один'],
+    "active": ['движение', 'спорт', 'активность', 'работа', 'занятия'],
+}
+
+FILLER = (
+    "я сегодня снова думал о том что происходит вокруг меня и почему жизнь иногда "
+    "кажется такой сложной хотя есть семья дом планы на лето и много всего интересного"
+).split()
+KEYWORD_WORDS = ["тревожно", "устала", "одиноко", "раздраженный", "друзья", "спорт", "спокойно", "работа"]
+
+def legacy_consultation_topic(question: str):
+    question_lower = question.lower()
+    for topic, words in CONSULTATION_TOPICS.items():
+        if any(word in question_lower for word in words):
+            return topic
+    return None
+
+def legacy_answer_counts(answers):
+    return {
+        group: sum(1 for answer in answers if any(word in answer.lower() for word in words))
+        for group, words in ANSWER_KEYWORDS.items()
+    }
+
+def make_text(rng: random.Random, size: int, keyword_rate: float) -> str:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(KEYWORD_WORDS) if rng.random() < keyword_rate else rng.choice(FILLER)
+        if rng.random() < 0.1:
+            word = word.capitalize()
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+def timeit(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=4096, help="длина одного текста, символов")
+    parser.add_argument("--answers", type=int, default=10, help="ответов в анкете")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    
+    rng = random.Random(1)
+    matchers = {
+        "find": (KeywordMatcher(CONSULTATION_TOPICS, use_regex=False), KeywordMatcher(ANSWER_KEYWORDS, use_regex=False)),
+        "regex": (KeywordMatcher(CONSULTATION_TOPICS, use_regex=True), KeywordMatcher(ANSWER_KEYWORDS, use_regex=True)),
+    }
+    
+    def consultation_topic(matcher: KeywordMatcher, question: str):
+        topics = matcher.categories(question)
+        return next((topic for topic in CONSULTATION_TOPICS if topic in topics), None)
+    
+    def answer_counts(matcher: KeywordMatcher, answers):
+        counts = dict.fromkeys(ANSWER_KEYWORDS, 0)
+        for answer in answers:
+            for group in matcher.categories(answer):
+                counts[group] += 1
+        return counts
+    
+    for _ in range(500):
+        text = make_text(rng, rng.randint(10, 400), 0.05)
+        answers = [make_text(rng, rng.randint(10, 200), 0.05) for _ in range(4)]
+        for consultation, answer in matchers.values():
+            assert legacy_consultation_topic(text) == consultation_topic(consultation, text), text
+            assert legacy_answer_counts(answers) == answer_counts(answer, answers), answers
+    print("Результаты совпадают на 500 случайных текстах\n")
+    
+    print(f"{'Сценарий':<46}{'было':>9}{'find':>9}{'regex':>9}{'ускорение':>11}")
+    for title, rate in (("без ключевых слов", 0.0), ("ключевые слова 1%", 0.01)):
+        question = make_text(rng, args.size, rate)
+        answers = [make_text(rng, args.size, rate) for _ in range(args.answers)]
+        for scenario, legacy, run in (
+            (f"консультация, {args.size} симв., {title}",
+             lambda: legacy_consultation_topic(question),
+             lambda matcher: consultation_topic(matcher[0], question)),
+            (f"анкета, {args.answers} x {args.size} симв., {title}",
+             lambda: legacy_answer_counts(answers),
+             lambda matcher: answer_counts(matcher[1], answers)),
+        ):
+            before = timeit(legacy, args.repeat)
+            find = timeit(lambda: run(matchers["find"]), args.repeat)
+            regex = timeit(lambda: run(matchers["regex"]), args.repeat)
+            print(f"{scenario:<46}{before * 1e6:6.0f}мкс{find * 1e6:6.0f}мкс{regex * 1e6:6.0f}мкс"
+                  f"{before / min(find, regex):10.1f}x")
+    
+    print(f"\nРазмер словаря (текст {args.size} симв.)   find    regex")
+    text = make_text(rng, args.size, 0.0)
+    alphabet = "абвгдежзийклмнопрстуфхцчшщыьэюя"
+    for size in (10, 40, 80, 120, 160, 320):
+        words = {"".join(rng.choice(alphabet) for _ in range(rng.randint(4, 9))) for _ in range(size)}
+        categories = {f"group{i % 4}": [] for i in range(4)}
+        for i, word in enumerate(words):
+            categories[f"group{i % 4}"].append(word)
+        find_matcher = KeywordMatcher(categories, use_regex=False)
+        regex_matcher = KeywordMatcher(categories, use_regex=True)
+        find = timeit(lambda: find_matcher.categories(text), args.repeat // 4)
+        regex = timeit(lambda: regex_matcher.categories(text), args.repeat // 4)
+        print(f"{len(words):>10} слов{'':<21}{find * 1e6:6.0f}мкс{regex * 1e6:6.0f}мкс")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Накладные расходы метрик (metrics.py) на горячем пути.
+
+Сравнивается вызов пустого асинхронного обработчика без декоратора (так
+обработчик вызывается при METRICS_PORT=0) и с декоратором metrics.handler,
+а также запись одного значения в гистограмму при выключенных и включенных
+метриках. Отдельно замеряется время запроса /metrics (render) при
+заполненных гистограммах всех обработчиков.
+
+Запуск:
+    python3 benchmarks/metrics_overhead.py [--calls 200000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Декоратор оборачивает обработчик, только если метрики включены при импорте
+os.environ["METRICS_PORT"] = os.environ.get("METRICS_PORT") or "9464"
+
+import metrics
+
+HANDLERS = ("start", "menu_handler", "consult_handler", "map_select_handler", "map_type_handler",
+            "map_questions_handler", "waiting_handler", "show_pending", "handle_callback")
+
+async def noop_handler(update, context):
+    return None
+
+def ns_per_call(func, calls: int) -> float:
+    started = time.perf_counter()
+    func(calls)
+    return (time.perf_counter() - started) / calls * 1e9
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+    
+    instrumented = metrics.handler(noop_handler)
+    
+    def call_handlers(handler):
+        async def run(calls: int):
+            for _ in range(calls):
+                await handler(None, None)
+        return lambda calls: asyncio.run(run(calls))
+    
+    def observe(calls: int):
+        histogram = metrics.HANDLER_SECONDS
+        for _ in range(calls):
+            histogram.observe(0.003, "start")
+    
+    plain = ns_per_call(call_handlers(noop_handler), args.calls)
+    wrapped = ns_per_call(call_handlers(instrumented), args.calls)
+    print(f"Обработчик без метрик:   {plain:8.0f} нс на вызов")
+    print(f"Обработчик с метриками:  {wrapped:8.0f} нс на вызов (+{wrapped - plain:.0f} нс)")
+    
+    metrics.ENABLED = False
+    disabled = ns_per_call(observe, args.calls)
+    metrics.ENABLED = True
+    enabled = ns_per_call(observe, args.calls)
+    print(f"observe, метрики выключены: {disabled:6.0f} нс")
+    print(f"observe, метрики включены:  {enabled:6.0f} нс")
+    
+    for i, name in enumerate(HANDLERS):
+        for j in range(1000):
+            metrics.HANDLER_SECONDS.observe((i + 1) * j / 1e5, name)
+        metrics.BOT_API_SECONDS.observe(0.01 * i, "sendMessage")
+    started = time.perf_counter()
+    text = metrics.render()
+    print(f"render: {(time.perf_counter() - started) * 1000:.2f} мс, {len(text.encode('utf-8'))} байт, "
+          f"{text.count(chr(10))} строк")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
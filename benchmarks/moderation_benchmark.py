@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Задержка этапа модерации (moderation.ModerationStage) на одно входящее
+сообщение: p50/p99/максимум для коротких и длинных текстов, в том числе с
+постановкой срочного оповещения в очередь. Бюджет — 1 мс на сообщение;
+при превышении p99 скрипт завершается с кодом 1.
+
+Вторая часть проверяет срочную очередь: при очереди из --backlog обычных
+уведомлений администратору кризисное оповещение отправляется первым.
+
+Запуск:
+    python3 benchmarks/moderation_benchmark.py [--messages 20000] [--backlog 50]
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Chat, Message, Update, User
+from config import ADMIN_IDS
+from message_queue import AdminDigest, MessageScheduler
+from moderation import ModerationStage
+from rate_limit import RateLimits
+
+BUDGET_MS = 1.0
+
+SAFE_PHRASES = [
+    "Последнее время много работы и мало отдыха, вечером сил хватает только на сериалы.",
+    "С друзьями видимся редко, но когда встречаемся, мне становится легче.",
+    "Люблю гулять в парке, особенно осенью, когда вокруг тихо.",
+    "Иногда тревожусь перед важными встречами, но справляюсь.",
+]
+CRISIS_PHRASES = [
+    "Мне кажется, я больше не хочу жить.",
+    "Думаю о самоубийстве каждый вечер.",
+]
+
+def make_update(update_id: int, user_id: int, text: str) -> Update:
+    user = User(id=user_id, first_name="U", is_bot=False, username=f"user{user_id}")
+    chat = Chat(id=user_id, type=Chat.PRIVATE)
+    message = Message(message_id=update_id, date=datetime.datetime.now(), chat=chat, from_user=user, text=text)
+    return Update(update_id=update_id, message=message)
+
+def make_text(rng: random.Random, length: int, crisis: bool) -> str:
+    parts = []
+    while sum(map(len, parts)) < length:
+        parts.append(rng.choice(SAFE_PHRASES))
+    text = " ".join(parts)[:length]
+    if crisis:
+        position = rng.randrange(len(text) + 1)
+        text = text[:position] + " " + rng.choice(CRISIS_PHRASES) + " " + text[position:]
+    return text
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+class RecordingBot:
+    def __init__(self):
+        self.texts = []
+    
+    async def send_message(self, chat_id, text, **kwargs):
+        self.texts.append(text)
+
+async def measure(messages: int) -> bool:
+    rng = random.Random(1)
+    scheduler = MessageScheduler()
+    stage = ModerationStage(scheduler, AdminDigest(scheduler), RateLimits.from_config())
+    ok = True
+    for title, length, crisis_share in (
+        ("короткие (~100 символов)", 100, 0.01),
+        ("длинные (4096 символов)", 4096, 0.01),
+        ("короткие, все кризисные", 100, 1.0),
+    ):
+        updates = [
+            make_update(i, 1000 + i % 500, make_text(rng, length, rng.random() < crisis_share))
+            for i in range(messages)
+        ]
+        timings = []
+        for update in updates:
+            started = time.perf_counter()
+            await stage(update, None)
+            timings.append((time.perf_counter() - started) * 1000)
+        p99 = percentile(timings, 0.99)
+        ok = ok and p99 < BUDGET_MS
+        print(f"  {title:<26} p50 {percentile(timings, 0.5):.4f} мс  p99 {p99:.4f} мс  "
+              f"макс {max(timings):.4f} мс")
+    print(f"  проверено {stage.checked}, кризисных {stage.flagged}, "
+          f"в очереди оповещений {scheduler.queue_depth}")
+    return ok
+
+async def priority_lane(backlog: int):
+    bot = RecordingBot()
+    scheduler = MessageScheduler(per_chat_rate=1000, global_rate=1000)
+    stage = ModerationStage(scheduler, AdminDigest(scheduler, immediate_limit=backlog), RateLimits.from_config())
+    for i in range(backlog):
+        scheduler.notify_admins(f"обычное уведомление {i}")
+    await stage(make_update(1, 42, "Я думаю о самоубийстве"), None)
+    scheduler.start(bot)
+    await scheduler.stop()
+    position = next(i for i, text in enumerate(bot.texts) if "кризисное" in text)
+    print(f"  отправлено {len(bot.texts)} сообщений, кризисное оповещение — №{position + 1} "
+          f"(в очереди уже было {backlog * len(ADMIN_IDS)} обычных)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--backlog", type=int, default=50)
+    args = parser.parse_args()
+    
+    print(f"Задержка модерации на сообщение (бюджет {BUDGET_MS} мс):")
+    ok = asyncio.run(measure(args.messages))
+    print("\nСрочная очередь:")
+    asyncio.run(priority_lane(args.backlog))
+    if not ok:
+        print(f"\np99 превышает бюджет {BUDGET_MS} мс")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Очередь модерации (/pending) при большом числе карт.
+
+В базе каждого режима хранения (json, wal, sqlite) создается --maps карт,
+из них --pending на модерации. Сравнивается:
+  - полный список get_pending_maps (прежний /pending) и страница очереди
+    get_pending_page с count_pending — первая и из середины очереди;
+  - разбор очереди: по одной карте (approve_map, на выборке из
+    SINGLE_SAMPLE карт) и страницами по --page карт (set_maps_status).
+Также выводится число вызовов Bot API в чате админа: прежний /pending
+отправлял по сообщению на карту, постраничный — одно сообщение, которое
+меняется при каждом нажатии.
+
+Запуск:
+    python3 benchmarks/pending_queue.py [--maps 10000] [--pending 500] [--page 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+from sqlite_database import SqliteDatabase
+
+# Сколько карт одобряется по одной для замера
+SINGLE_SAMPLE = 50
+
+MAP_TEXT = "Психологическая карта: " + "обычно вечером я гуляю в парке и отдыхаю. " * 20
+
+def open_database(mode: str, directory: str):
+    if mode == "sqlite":
+        return SqliteDatabase(os.path.join(directory, "bench.sqlite3"))
+    return Database(os.path.join(directory, f"bench-{mode}.json"), mode, write_behind=False)
+
+def fill(db, maps: int, pending: int):
+    """Создает карты; на модерации остаются последние pending"""
+    if isinstance(db, Database):
+        # Одной записью: в режиме json save_psychological_map перезаписывает
+        # растущий файл для каждой карты, и заполнение заняло бы O(n²)
+        db._commit(*(
+            {
+                "op": "add_map",
+                "map_id": f"map_{10000 + i}_{i + 1}",
+                "map": {
+                    "user_id": 10000 + i,
+                    "data": {"type": "Базовая", "map_text": MAP_TEXT},
+                    "status": "pending" if i >= maps - pending else "approved",
+                },
+            }
+            for i in range(maps)
+        ))
+        return
+    map_ids = [db.save_psychological_map(10000 + i, {"type": "Базовая", "map_text": MAP_TEXT}) for i in range(maps)]
+    db.set_maps_status(map_ids[:maps - pending], "approved")
+
+def ms(func, repeat: int = 20) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--maps", type=int, default=10000)
+    parser.add_argument("--pending", type=int, default=500)
+    parser.add_argument("--page", type=int, default=5)
+    args = parser.parse_args()
+    
+    pages = (args.pending + args.page - 1) // args.page
+    print(f"Карт: {args.maps}, на модерации: {args.pending}, на странице: {args.page}")
+    print(f"Вызовов Bot API в чате админа: {args.pending} сообщений (по карте) "
+          f"против 1 сообщения и {pages} изменений при разборе страницами\n")
+    
+    for mode in ("json", "wal", "sqlite"):
+        with tempfile.TemporaryDirectory() as directory:
+            db = open_database(mode, directory)
+            fill(db, args.maps, args.pending)
+            middle = db.get_pending_page(0, max(1, args.pending // 2))[-1][0]
+            
+            def page(after: int):
+                rows = db.get_pending_page(after, args.page)
+                db.count_pending()
+                if rows:
+                    db.count_pending(before=rows[0][0])
+            
+            full = ms(db.get_pending_maps)
+            first = ms(lambda: page(0))
+            deep = ms(lambda: page(middle))
+            print(f"{mode:>6}: весь список {full:8.2f} мс, страница {first:6.3f} мс, "
+                  f"из середины {deep:6.3f} мс")
+            
+            map_ids = list(db.get_pending_maps())
+            # Стоимость на карту считается по выборке: в режиме json каждое
+            # одобрение перезаписывает всю базу
+            one_by_one = map_ids[:min(len(map_ids) // 2, SINGLE_SAMPLE)]
+            started = time.perf_counter()
+            for map_id in one_by_one:
+                db.approve_map(map_id)
+            single = (time.perf_counter() - started) / max(1, len(one_by_one)) * 1000
+            started = time.perf_counter()
+            while True:
+                rows = db.get_pending_page(0, args.page)
+                if not rows:
+                    break
+                db.set_maps_status([map_id for _, map_id, _ in rows], "approved")
+            paged = (time.perf_counter() - started) / max(1, len(map_ids) - len(one_by_one)) * 1000
+            print(f"        разбор: {single:6.3f} мс на карту по одной, {paged:6.3f} мс на карту страницами")
+            db.close()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
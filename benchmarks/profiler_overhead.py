@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Накладные расходы выборочного профилировщика (profiler.SamplingProfiler).
+
+Одна и та же нагрузка — консультации и карты из generation.py в пуле из
+--workers потоков, которые ждет цикл событий, как в боте, — выполняется без
+профилировщика и с ним (интервал --interval). Выводится замедление,
+частота выборок и самые частые стеки; с --output профиль сохраняется в файл
+collapsed stacks (flamegraph.pl, speedscope).
+
+Запуск:
+    python3 benchmarks/profiler_overhead.py [--jobs 20000] [--workers 4] [--interval 0.01] [--output profile.collapsed]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generation
+from map_catalog import MAPS, MAP_TYPES
+from profiler import SamplingProfiler
+
+QUESTIONS = [
+    "Как справиться с тревогой перед важной встречей?",
+    "Последнее время много работы и мало отдыха, что делать?",
+    "С друзьями видимся редко, мне одиноко по вечерам.",
+]
+ANSWERS = [
+    "Обычно вечером я гуляю в парке и отдыхаю.",
+    "Иногда тревожусь, но с друзьями становится легче.",
+    "Много работы, сил хватает только на сериалы.",
+]
+
+def job(i: int):
+    if i % 2:
+        return generation.consultation(f"{QUESTIONS[i % len(QUESTIONS)]} ({i})")
+    entry = MAPS[i % len(MAPS)]
+    map_type = MAP_TYPES[i % len(MAP_TYPES)]
+    questions = entry.questions(map_type)
+    answers = [f"{ANSWERS[(i + k) % len(ANSWERS)]} ({i})" for k in range(len(questions))]
+    return generation.psychological_map(answers, questions, map_type.name)
+
+async def workload(jobs: int, workers: int) -> float:
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="generation") as pool:
+        started = time.perf_counter()
+        await asyncio.gather(*(loop.run_in_executor(pool, job, i) for i in range(jobs)))
+        return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=0.01)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    
+    # Прогрев: словари и стеммер строятся при первом вызове
+    asyncio.run(workload(args.workers, args.workers))
+    
+    baseline = min(asyncio.run(workload(args.jobs, args.workers)) for _ in range(3))
+    profiled = []
+    for _ in range(3):
+        sampler = SamplingProfiler(args.interval).start()
+        profiled.append(asyncio.run(workload(args.jobs, args.workers)))
+        sampler.stop()
+    profiled_time = min(profiled)
+    
+    print(f"Без профилировщика: {baseline:.3f} с на {args.jobs} задач")
+    print(f"С профилировщиком:  {profiled_time:.3f} с ({(profiled_time / baseline - 1) * 100:+.1f}%)")
+    print(f"Выборок: {sampler.samples} за {sampler.elapsed:.2f} с "
+          f"({sampler.samples / sampler.elapsed:.0f}/с при интервале {args.interval * 1000:g} мс), "
+          f"разных стеков: {len(sampler.stacks)}")
+    print("\nСамые частые стеки (верхние кадры):")
+    for stack, count in sampler.stacks.most_common(5):
+        frames = stack.split(";")
+        print(f"  {count:6}  {frames[0]}: ... {' <- '.join(reversed(frames[-3:]))}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(sampler.collapsed())
+        print(f"\nПрофиль сохранен в {args.output}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
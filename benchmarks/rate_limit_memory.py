@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Память ограничителя частоты при 1M разных пользователей (tracemalloc).
+
+Сравниваются:
+- старый defaultdict(float) с временем последнего запроса — растет на каждого пользователя;
+- RateLimiter (token_bucket и sliding_window), когда пользователи приходят
+  равномерным потоком (--rate запросов/с): живут только записи, срок которых не истек;
+- RateLimiter, когда все пользователи приходят одновременно: размер ограничен max_entries.
+
+Запуск:
+    python3 benchmarks/rate_limit_memory.py [--users 1000000] [--rate 1000]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limit import RateLimiter, parse_policy
+
+def measure(title: str, users: int, make, record):
+    gc.collect()
+    tracemalloc.start()
+    store = make()
+    started = time.perf_counter()
+    for user_id in range(users):
+        record(store, user_id)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{title:<44} записей: {len(store):>8}  память: {current / 2**20:7.1f} МБ  "
+          f"пик: {peak / 2**20:7.1f} МБ  {elapsed / users * 1e6:5.2f} мкс/запрос")
+    del store
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--rate", type=float, default=1000, help="новых пользователей в секунду")
+    parser.add_argument("--max-entries", type=int, default=100_000)
+    args = parser.parse_args()
+    
+    start = 1_700_000_000.0
+    step = 1.0 / args.rate
+    
+    def legacy(store, user_id):
+        store[user_id] = start + user_id * step
+    
+    measure("defaultdict(float) (как раньше)", args.users, lambda: defaultdict(float), legacy)
+    
+    for spec in ("token_bucket:1/10", "sliding_window:10/3600"):
+        def stream(limiter, user_id):
+            limiter.hit(user_id, start + user_id * step)
+        
+        def burst(limiter, user_id):
+            limiter.hit(user_id, start)
+        
+        measure(f"{spec}, поток {args.rate:.0f}/с", args.users,
+                lambda: RateLimiter(parse_policy(spec), args.max_entries), stream)
+        measure(f"{spec}, все сразу", args.users,
+                lambda: RateLimiter(parse_policy(spec), args.max_entries), burst)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Сквозной нагрузочный сценарий: бот с админ-панелью (run_all) против
+локального Bot API (fake_bot_api) — без обращения к Telegram.
+
+--users пользователей проходят путь целиком: /start, затем консультация
+(доля --consult) или анкета психологической карты. --admins админов в
+среднем раз в --admin-interval секунд открывают /pending и одобряют очередь
+постранично кнопкой «Одобрить страницу», после чего пользователь получает
+одобренную карту. Между
+сообщениями пользователь думает в среднем --think секунд.
+
+Выводится:
+  - обновлений/с, отправленных боту, и исходящих вызовов Bot API/с;
+  - гистограмма задержки первого ответа бота по обработчикам;
+  - число исходящих вызовов каждого метода Bot API по обработчикам
+    (уведомления админам, отправленные не в ответ на обновление, — "фон");
+  - время от последнего ответа анкеты до получения одобренной карты.
+
+Запуск:
+    python3 benchmarks/scenario_load.py [--users 200] [--consult 0.3] [--admins 2] [--admin-interval 5] [--think 5] [--api-delay 0.005]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import BOT_USER, FakeBotApiProcess
+
+# Сколько пользователь или админ ждет ответа бота, с
+REPLY_TIMEOUT = 120
+# Границы корзин гистограммы задержки, мс
+BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+BACKGROUND = "фон"
+# Обработчики в порядке сценария
+HANDLERS = ("start", "menu_handler", "consult_handler", "map_select_handler", "map_type_handler",
+            "map_questions_handler", "show_pending", "handle_callback", BACKGROUND)
+METHODS = ("sendMessage", "editMessageText", "answerCallbackQuery")
+
+def message_update(user_id: int, text: str) -> dict:
+    message = {
+        "message_id": 1,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    return {"message": message}
+
+def callback_update(admin_id: int, query_id: str, message: dict, data: str) -> dict:
+    return {
+        "callback_query": {
+            "id": query_id,
+            "from": {"id": admin_id, "is_bot": False, "first_name": "Admin"},
+            "chat_instance": str(admin_id),
+            "data": data,
+            "message": {
+                "message_id": message["message_id"],
+                "date": int(time.time()),
+                "chat": {"id": admin_id, "type": "private"},
+                "from": BOT_USER,
+                "text": message.get("text", ""),
+            },
+        }
+    }
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+def approve_data(sent: dict):
+    """callback_data кнопки "Одобрить страницу" в странице очереди /pending или None"""
+    markup = sent.get("reply_markup") or {}
+    if isinstance(markup, str):
+        markup = json.loads(markup)
+    for row in markup.get("inline_keyboard", []):
+        for button in row:
+            if button.get("callback_data", "").startswith("pending_page:approve:"):
+                return button["callback_data"]
+    return None
+
+def is_pending_reply(sent: dict) -> bool:
+    return sent.get("text", "").startswith(("📋 Карты на модерации", "Нет карт"))
+
+def user_script(user_id: int, consult: bool):
+    """Сообщения пользователя: (текст, обработчик, число ответов бота)"""
+    steps = [("/start", "start", 1)]
+    if consult:
+        steps += [
+            ("1️⃣ Получить консультацию", "menu_handler", 1),
+            (f"Вопрос пользователя {user_id}: как справиться с тревогой перед экзаменом?", "consult_handler", 2),
+        ]
+        return steps
+    from map_catalog import MAPS, MAP_TYPES
+    entry = MAPS[user_id % len(MAPS)]
+    map_type = MAP_TYPES[user_id % len(MAP_TYPES)]
+    steps += [
+        ("2️⃣ Создать психологическую карту", "menu_handler", 2),
+        (entry.button, "map_select_handler", 1),
+        (map_type.button, "map_type_handler", 1),
+    ]
+    questions = entry.questions(map_type)
+    for i in range(len(questions)):
+        answer = f"Ответ {i + 1} пользователя {user_id}: обычно вечером я гуляю и отдыхаю."
+        steps.append((answer, "map_questions_handler", 2 if i == len(questions) - 1 else 1))
+    return steps
+
+def print_histogram(name: str, latencies):
+    counts = Counter(next(i for i, bound in enumerate(BUCKETS) if value <= bound) for value in latencies)
+    print(f"{name}: {len(latencies)} ответов, p50 {percentile(latencies, 0.5):.1f} мс, "
+          f"p99 {percentile(latencies, 0.99):.1f} мс, макс {max(latencies):.1f} мс")
+    scale = max(counts.values())
+    for i in range(min(counts), max(counts) + 1):
+        label = f"≤{BUCKETS[i]} мс" if BUCKETS[i] != float("inf") else f">{BUCKETS[i - 1]} мс"
+        print(f"    {label:>10} {counts[i]:6} {'█' * round(40 * counts[i] / scale)}")
+
+async def run(args):
+    loop = asyncio.get_running_loop()
+    admin_ids = [900000000 + i for i in range(args.admins)]
+    inboxes = {}
+    # Обработчик, ответа которого ждет чат пользователя
+    waiting_for = {}
+    callback_owner = {}
+    calls = defaultdict(Counter)
+    
+    def on_send(sent):
+        method = sent["method"]
+        chat_id = callback_owner.get(sent["callback_query_id"]) if "callback_query_id" in sent else int(sent["chat_id"])
+        if chat_id in admin_ids:
+            if method != "sendMessage":
+                handler = "handle_callback"
+            elif is_pending_reply(sent):
+                handler = "show_pending"
+            else:
+                handler = BACKGROUND
+        else:
+            handler = waiting_for.get(chat_id, BACKGROUND)
+        calls[handler][method] += 1
+        inbox = inboxes.get(chat_id)
+        if inbox is not None:
+            inbox.put_nowait(sent)
+    
+    api = FakeBotApiProcess(delay=args.api_delay, on_send=lambda sent: loop.call_soon_threadsafe(on_send, sent)).start()
+    os.environ.update(
+        BOT_TOKEN="123456:FAKE",
+        TELEGRAM_API_URL=api.base_url,
+        ADMIN_IDS=",".join(map(str, admin_ids)),
+    )
+    import run_all
+    import bot_polling
+    # Строка лога на каждый запрос к Bot API заметно нагружает процесс теста
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    
+    app = run_all.build_application()
+    latencies = defaultdict(list)
+    approval = []
+    updates_sent = Counter()
+    abandoned = Counter()
+    users_done = asyncio.Event()
+    
+    def send(update: dict):
+        updates_sent["callback_query" if "callback_query" in update else "message"] += 1
+        api.add_update(update)
+    
+    async def reply(inbox: asyncio.Queue, accept=lambda sent: True) -> dict:
+        while True:
+            sent = await asyncio.wait_for(inbox.get(), REPLY_TIMEOUT)
+            if accept(sent):
+                return sent
+    
+    async def user(user_id: int, rng: random.Random):
+        inboxes[user_id] = inbox = asyncio.Queue()
+        consult = rng.random() < args.consult
+        await asyncio.sleep(rng.uniform(0, args.think))
+        try:
+            for text, handler, expected in user_script(user_id, consult):
+                await asyncio.sleep(rng.expovariate(1 / args.think))
+                waiting_for[user_id] = handler
+                sent_at = time.perf_counter()
+                send(message_update(user_id, text))
+                latencies[handler].append(((await reply(inbox))["time"] - sent_at) * 1000)
+                for _ in range(expected - 1):
+                    await reply(inbox)
+            if not consult:
+                # Одобренную карту отправляет обработчик кнопки админа
+                waiting_for[user_id] = "handle_callback"
+                finished_at = time.perf_counter()
+                approved = await reply(inbox, lambda sent: sent.get("text", "").startswith("✅"))
+                approval.append(approved["time"] - finished_at)
+        except asyncio.TimeoutError:
+            abandoned["консультация" if consult else "карта"] += 1
+        waiting_for.pop(user_id, None)
+    
+    async def admin(admin_id: int, rng: random.Random):
+        inboxes[admin_id] = inbox = asyncio.Queue()
+        queries = 0
+        while not users_done.is_set():
+            try:
+                await asyncio.wait_for(users_done.wait(), rng.expovariate(1 / args.admin_interval))
+                return
+            except asyncio.TimeoutError:
+                pass
+            while not inbox.empty():
+                inbox.get_nowait()
+            sent_at = time.perf_counter()
+            send(message_update(admin_id, "/pending"))
+            try:
+                page = await reply(inbox, is_pending_reply)
+            except asyncio.TimeoutError:
+                abandoned["очередь"] += 1
+                continue
+            latencies["show_pending"].append((page["time"] - sent_at) * 1000)
+            # Страницы одобряются по очереди: каждое нажатие меняет то же сообщение
+            while approve_data(page):
+                queries += 1
+                query_id = f"{admin_id}:{queries}"
+                callback_owner[query_id] = admin_id
+                sent_at = time.perf_counter()
+                send(callback_update(admin_id, query_id, page, approve_data(page)))
+                try:
+                    sent = await reply(inbox, lambda sent: sent["method"] == "answerCallbackQuery")
+                    latencies["handle_callback"].append((sent["time"] - sent_at) * 1000)
+                    page = await reply(inbox, lambda sent: sent["method"] == "editMessageText")
+                except asyncio.TimeoutError:
+                    abandoned["одобрение"] += 1
+                    break
+    
+    async with app:
+        await bot_polling.post_init(app)
+        await app.start()
+        await app.updater.start_polling(poll_interval=0)
+        started = time.perf_counter()
+        rng = random.Random(args.seed)
+        admins = [asyncio.create_task(admin(admin_id, random.Random(rng.random()))) for admin_id in admin_ids]
+        await asyncio.gather(*(user(10000 + i, random.Random(rng.random())) for i in range(args.users)))
+        users_done.set()
+        await asyncio.gather(*admins)
+        elapsed = time.perf_counter() - started
+        await app.updater.stop()
+        await app.stop()
+        await bot_polling.post_shutdown(app)
+    api.stop()
+    
+    total_calls = sum(sum(methods.values()) for methods in calls.values())
+    print(f"Пользователей: {args.users}, админов: {args.admins}, {elapsed:.1f} с")
+    updates_total = sum(updates_sent.values())
+    print(f"Обновлений боту: {updates_total} ({updates_total / elapsed:.1f}/с; сообщений {updates_sent['message']}, "
+          f"нажатий кнопок {updates_sent['callback_query']}), "
+          f"исходящих вызовов Bot API: {total_calls} ({total_calls / elapsed:.1f}/с)")
+    if abandoned:
+        print("Брошено без ответа бота: " + ", ".join(f"{name} {count}" for name, count in abandoned.items()))
+    if approval:
+        print(f"От последнего ответа анкеты до одобренной карты: {len(approval)} карт, "
+              f"p50 {percentile(approval, 0.5):.1f} с, p99 {percentile(approval, 0.99):.1f} с")
+    
+    print("\nЗадержка первого ответа бота")
+    for handler in HANDLERS:
+        if latencies[handler]:
+            print_histogram(handler, latencies[handler])
+    
+    print("\nИсходящие вызовы Bot API по обработчикам")
+    print(f"{'обработчик':<24}" + "".join(f"{method:>22}" for method in METHODS))
+    for handler in HANDLERS:
+        if calls[handler]:
+            print(f"{handler:<24}" + "".join(f"{calls[handler][method]:>22}" for method in METHODS))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--consult", type=float, default=0.3, help="доля пользователей, задающих вопрос психологу")
+    parser.add_argument("--admins", type=int, default=2)
+    parser.add_argument("--admin-interval", type=float, default=5.0)
+    parser.add_argument("--think", type=float, default=5.0)
+    parser.add_argument("--api-delay", type=float, default=0.005)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    # В режиме json каждая запись переписывает весь файл базы
+    os.environ.setdefault("DATABASE_MODE", "wal")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        asyncio.run(run(args))
+        os.chdir(REPO_DIR)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
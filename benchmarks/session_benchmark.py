@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Память и размер сохраненного состояния анкеты для --sessions одновременных
+пользователей, которые находятся на случайном вопросе случайной карты.
+
+Сравниваются три вида context.user_data после восстановления из базы:
+    словарь до каталога — вся карта (selected_map) и копия вопросов у каждого
+                          пользователя, ответы и стек навигации списками;
+    словарь с map_id    — то же без карты и вопросов;
+    UserSession         — session.UserSession (__slots__, ответы одним буфером).
+Память считается через tracemalloc, размер — длина JSON в базе.
+
+Запуск:
+    python3 benchmarks/session_benchmark.py [--sessions 100000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from map_catalog import MAPS, MAP_TYPES
+from psychological_maps import PSYCHOLOGICAL_MAPS_BY_ID
+from session import UserSession, decode_user_data, encode_user_data
+
+PHRASES = [
+    "Чаще всего я чувствую усталость к вечеру,",
+    "но когда рядом близкие люди, становится спокойнее.",
+    "Мне важно, чтобы меня слышали и принимали таким, какой я есть.",
+    "Иногда злюсь на себя за то, что откладываю важные дела.",
+    "В детстве я много времени проводил с бабушкой.",
+    "Радость приходит неожиданно: от музыки, прогулки или разговора.",
+]
+
+def make_answer(rng: random.Random) -> str:
+    return " ".join(rng.choice(PHRASES) for _ in range(rng.randint(3, 6)))
+
+def make_user_data(rng: random.Random):
+    """Один и тот же пользователь в трех видах (для записи в базу)"""
+    entry = rng.choice(MAPS)
+    map_type = rng.choice(MAP_TYPES)
+    questions = entry.questions(map_type)
+    answers = [make_answer(rng) for _ in range(rng.randrange(len(questions)))]
+    navigation = [0, 2, 3]
+    legacy = {
+        "navigation_stack": navigation, "current_state": 4,
+        "selected_map": PSYCHOLOGICAL_MAPS_BY_ID[entry.id], "map_questions": questions,
+        "map_type": map_type.name, "map_answers": answers, "current_q": len(answers),
+    }
+    by_id = {
+        "navigation_stack": navigation, "current_state": 4,
+        "map_id": entry.id, "map_type": map_type.name, "map_answers": answers, "current_q": len(answers),
+    }
+    session = UserSession.from_legacy(by_id)
+    return legacy, by_id, {"session": session}
+
+def measure(stored, restore):
+    """Память восстановленных user_data (байт) при заранее прочитанных строках JSON"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    restored = [restore(json.loads(text)) for text in stored]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    # Список нужен только до замера
+    del restored
+    return used
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100000)
+    args = parser.parse_args()
+    
+    rng = random.Random(1)
+    users = [make_user_data(rng) for _ in range(args.sessions)]
+    layouts = [
+        ("словарь до каталога", [json.dumps(legacy, ensure_ascii=False) for legacy, _, _ in users], dict),
+        ("словарь с map_id", [json.dumps(by_id, ensure_ascii=False) for _, by_id, _ in users], dict),
+        ("UserSession", [json.dumps(encode_user_data(data), ensure_ascii=False) for _, _, data in users], decode_user_data),
+    ]
+    
+    print(f"Сессий: {args.sessions}")
+    print(f"  {'вид':<22}{'память':>12}{'на сессию':>12}{'в базе':>12}{'на сессию':>12}")
+    for title, stored, restore in layouts:
+        used = measure(stored, restore)
+        size = sum(len(text.encode("utf-8")) for text in stored)
+        print(f"  {title:<22}{used / 2**20:>9.1f} МБ{used / args.sessions:>10.0f} Б"
+              f"{size / 2**20:>9.1f} МБ{size / args.sessions:>10.0f} Б")
+    
+    # Восстановленная сессия совпадает с исходной
+    for (_, by_id, data), text in zip(users[:1000], layouts[2][1]):
+        session = decode_user_data(json.loads(text))["session"]
+        assert session.answers == by_id["map_answers"]
+        assert session.map_id == by_id["map_id"] and session.map_type.name == by_id["map_type"]
+        assert list(session.navigation) == by_id["navigation_stack"] and session.state == by_id["current_state"]
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Стресс-тест совместной работы двух процессов с одной базой:
+процесс «бота» создает карты и меняет состояния пользователей, процесс
+«админки» одновременно одобряет карты из очереди модерации.
+В конце проверяется, что ни одно изменение не потерялось.
+
+Запуск:
+    python3 benchmarks/shared_state_stress.py [--modes json,wal,sqlite] [--maps 300] [--users 50]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+from sqlite_database import SqliteDatabase
+
+ADMIN_ID = 1
+
+def open_database(mode: str, path: str):
+    if mode == "sqlite":
+        return SqliteDatabase(path + ".sqlite3")
+    return Database(path, mode=mode)
+
+def user_bot(mode: str, path: str, maps: int, users: int):
+    db = open_database(mode, path)
+    for i in range(maps):
+        user_id = 1000 + i % users
+        db.set_user_state(user_id, f"MAP_QUESTIONS_{i}")
+        db.save_psychological_map(user_id, {"type": "Базовая", "map_text": f"Карта {i}"})
+        db.set_user_data(user_id, "maps_created", i // users + 1)
+    db.close()
+
+def admin_bot(mode: str, path: str, maps: int, deadline: float):
+    db = open_database(mode, path)
+    approved = 0
+    while approved < maps and time.time() < deadline:
+        for map_id in db.get_pending_maps():
+            db.approve_map(map_id)
+            approved += 1
+            db.set_user_data(ADMIN_ID, "approved", approved)
+    db.close()
+
+def run(mode: str, maps: int, users: int) -> bool:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "database.json")
+        open_database(mode, path).close()
+        started = time.time()
+        processes = [
+            multiprocessing.Process(target=user_bot, args=(mode, path, maps, users)),
+            multiprocessing.Process(target=admin_bot, args=(mode, path, maps, started + 120)),
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.time() - started
+        
+        db = open_database(mode, path)
+        all_maps = {}
+        for user_id in range(1000, 1000 + users):
+            all_maps.update(db.get_user_maps(user_id))
+        errors = []
+        if len(all_maps) != maps:
+            errors.append(f"карт сохранено {len(all_maps)} из {maps}")
+        not_approved = [map_id for map_id, map_data in all_maps.items() if map_data["status"] != "approved"]
+        if not_approved:
+            errors.append(f"не одобрено карт: {len(not_approved)}")
+        for i in range(maps - users, maps):
+            user_id = 1000 + i % users
+            if db.get_user_state(user_id) != f"MAP_QUESTIONS_{i}":
+                errors.append(f"потеряно состояние пользователя {user_id}")
+            if db.get_user_data(user_id).get("maps_created") != i // users + 1:
+                errors.append(f"потерян счетчик карт пользователя {user_id}")
+        if db.get_user_data(ADMIN_ID).get("approved") != maps:
+            errors.append("потерян счетчик одобрений админа")
+        db.close()
+    
+    status = "OK" if not errors else "ОШИБКИ: " + "; ".join(errors[:5])
+    print(f"{mode:<7} карт: {maps:>5}  время: {elapsed:6.2f} с  {status}")
+    return not errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="json,wal,sqlite")
+    parser.add_argument("--maps", type=int, default=300)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+    
+    results = [run(mode, args.maps, args.users) for mode in args.modes.split(",")]
+    sys.exit(0 if all(results) else 1)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Сравнение запуска run.py + run_admin.py (два Application с одним токеном)
+и run_all.py (один процесс) на локальном Bot API: сколько вызовов getUpdates
+сделано, сколько из них завершилось Conflict и ответили ли обе части бота
+на /start и /admin.
+
+Запуск:
+    python3 benchmarks/single_poll_check.py [--seconds 20]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeBotApi
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USER_ID = 5001
+ADMIN_ID = 42
+
+def command_update(user_id: int, command: str) -> dict:
+    return {
+        "message": {
+            "message_id": 1,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": command,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+        }
+    }
+
+def run(scripts, seconds: float) -> dict:
+    api = FakeBotApi().start()
+    env = dict(
+        os.environ,
+        BOT_TOKEN="123456:FAKE",
+        ADMIN_IDS=str(ADMIN_ID),
+        TELEGRAM_API_URL=api.base_url,
+        PYTHONPATH=REPO_DIR,
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        processes = [
+            subprocess.Popen(
+                [sys.executable, os.path.join(REPO_DIR, script)],
+                cwd=tmp_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            for script in scripts
+        ]
+        time.sleep(seconds / 2)
+        api.add_update(command_update(USER_ID, "/start"))
+        api.add_update(command_update(ADMIN_ID, "/admin"))
+        time.sleep(seconds / 2)
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+    api.stop()
+    replied = {message["chat_id"] for message in api.sent}
+    return {
+        "getUpdates": api.calls["getUpdates"],
+        "conflicts": api.conflicts,
+        "user_replied": USER_ID in replied,
+        "admin_replied": ADMIN_ID in replied,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=20)
+    args = parser.parse_args()
+    
+    for title, scripts in (("run.py + run_admin.py", ["run.py", "run_admin.py"]), ("run_all.py", ["run_all.py"])):
+        result = run(scripts, args.seconds)
+        print(
+            f"{title:<22} getUpdates: {result['getUpdates']:>4}  Conflict: {result['conflicts']:>4}  "
+            f"/start: {'да' if result['user_replied'] else 'нет'}  /admin: {'да' if result['admin_replied'] else 'нет'}"
+        )
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Стеммер и поиск по основам слов.
+
+1. Полнота на наборе ответов с разными формами слов: прежний поиск
+   подстрок по прежним словарям и StemMatcher по словарям из local_responses
+   и config.ANALYSIS_DIMENSIONS.
+   Отдельно считаются ложные срабатывания на ответах без ключевых слов.
+2. Скорость стеммера в словах/с: без кэша и с кэшем (повторяющаяся лексика).
+
+Запуск:
+    python3 benchmarks/stemmer_benchmark.py [--tokens 200000]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import russian_stemmer
+from config import ANALYSIS_DIMENSIONS
+from keyword_matcher import StemMatcher
+from local_responses import CONSULTATION_TOPICS
+
+# Словари до перехода на основы (искались как подстроки)
+LEGACY_KEYWORDS = {
+    "stress": ['стресс', 'устал', 'утомлен', 'напряжен'],
+    "anxiety": ['тревож', 'беспоко', 'волну'],
+    "loneliness": ['одинок', 'непонят', 'отвергнут'],
+    "anger": ['злость', 'раздражен', 'сердит'],
+    "emotional": ['хорошо', 'плохо', 'грустно', 'радостно', 'спокойно', 'волнуюсь', 'устал'],
+    "social": ['люди', 'друзья', 'общение', 'компания', 'один'],
+    "active": ['движение', 'спорт', 'активность', 'работа', 'занятия'],
+}
+
+# Ответ и категории, которые в нем должны быть найдены
+RECALL_SET = [
+    ("Постоянный стресс на работе, к вечеру чувствую сильную усталость", {"stress", "active"}),
+    ("Я очень утомляюсь от шума", {"stress"}),
+    ("Все время в напряжении, не могу расслабиться", {"stress"}),
+    ("Меня мучает тревога перед экзаменами", {"anxiety"}),
+    ("Тревожусь за детей и родителей", {"anxiety"}),
+    ("Часто беспокоюсь о будущем", {"anxiety"}),
+    ("Начинаю волноваться, когда звонит начальник", {"anxiety", "emotional"}),
+    ("Меня пугает одиночество", {"loneliness"}),
+    ("Чувствую себя одинокой даже среди знакомых", {"loneliness"}),
+    ("Кажется, меня никто не понимает, я непонятая", {"loneliness"}),
+    ("Меня раздражают мелочи", {"anger"}),
+    ("Я часто злюсь на себя", {"anger"}),
+    ("Его поведение меня злит", {"anger"}),
+    ("Сержусь, когда меня перебивают", {"anger"}),
+    ("Не могу справиться со злостью", {"anger"}),
+    ("Сегодня у меня хорошее настроение", {"emotional"}),
+    ("Было плохое утро, но потом стало лучше", {"emotional"}),
+    ("Мне грустно по вечерам", {"emotional"}),
+    ("Меня накрывает грусть осенью", {"emotional"}),
+    ("Радость приносят простые вещи", {"emotional"}),
+    ("Ищу спокойствие в природе", {"emotional"}),
+    ("Люблю проводить время с друзьями", {"social"}),
+    ("Мой лучший друг всегда рядом", {"social"}),
+    ("Мне нравится общаться с новыми людьми", {"social"}),
+    ("Среди людей я заряжаюсь энергией", {"social"}),
+    ("Для меня важно общение с семьей", {"social"}),
+    ("Шумная компания меня утомляет", {"social", "stress"}),
+    ("Вечером гуляю с подругой", {"social"}),
+    ("Занимаюсь спортом три раза в неделю", {"active"}),
+    ("Хожу на тренировки по плаванию", {"active"}),
+    ("Работаю без выходных", {"active"}),
+    ("Люблю активный отдых в горах", {"active"}),
+    ("Движения в танце помогают отвлечься", {"active"}),
+    ("Мои занятия музыкой очень важны", {"active"}),
+]
+
+# Ответы без ключевых слов: любое найденное — ложное срабатывание
+NEGATIVE_SET = [
+    "Установка программы заняла весь вечер",
+    "Вспоминаю уставшую улицу детства",
+    "Люблю читать книги о путешествиях",
+    "Сердце города — старая площадь",
+    "Одинаковые дни сливаются в серый поток",
+    "Волна накрыла берег",
+    "Мне нравится запах кофе по утрам",
+    "Читаю по вечерам классику",
+    # Основы "друг" и "одн" у частых слов
+    "Одно и то же каждый день, в другой раз будет иначе",
+    "Другие варианты мне не подходят",
+    "Одной из причин стала погода",
+]
+
+def legacy_categories(text: str) -> set:
+    text = text.lower()
+    return {category for category, words in LEGACY_KEYWORDS.items() if any(word in text for word in words)}
+
+def evaluate(title: str, find_categories):
+    expected_total = found_total = 0
+    misses = []
+    for text, expected in RECALL_SET:
+        found = find_categories(text)
+        expected_total += len(expected)
+        found_total += len(expected & found)
+        if expected - found:
+            misses.append(f"{text} (не найдено: {', '.join(sorted(expected - found))})")
+    false_positives = [text for text in NEGATIVE_SET if find_categories(text)]
+    print(f"{title}: полнота {found_total}/{expected_total} ({found_total / expected_total:.0%}), "
+          f"ложных срабатываний {len(false_positives)}/{len(NEGATIVE_SET)}")
+    for miss in misses:
+        print(f"    пропуск: {miss}")
+    for text in false_positives:
+        print(f"    ложное: {text}")
+
+def throughput(tokens, stem_func) -> float:
+    started = time.perf_counter()
+    for token in tokens:
+        stem_func(token)
+    return len(tokens) / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=200_000)
+    args = parser.parse_args()
+    
+    consultation = StemMatcher(CONSULTATION_TOPICS)
+    answers = StemMatcher({name: dimension["keywords"] for name, dimension in ANALYSIS_DIMENSIONS.items()})
+    evaluate("Подстроки (прежние словари)", legacy_categories)
+    evaluate("Основы слов (StemMatcher)", lambda text: consultation.categories(text) | answers.categories(text))
+    
+    vocabulary = re.findall(r"[^\W\d_]+", " ".join(text for text, _ in RECALL_SET).lower())
+    vocabulary += [word for words in LEGACY_KEYWORDS.values() for word in words]
+    rng = random.Random(1)
+    # Лексика ответов повторяется: типичный текст состоит из нескольких тысяч разных слов
+    distinct = [word + suffix for word in vocabulary for suffix in ("", "ая", "ого", "ами", "ость", "ется")]
+    tokens = [rng.choice(distinct) for _ in range(args.tokens)]
+    
+    print(f"\nСтеммер, {len(tokens)} слов ({len(set(tokens))} разных):")
+    print(f"  без кэша:  {throughput(tokens, russian_stemmer._stem):>10,.0f} слов/с")
+    russian_stemmer.stem.cache_clear()
+    print(f"  с кэшем:   {throughput(tokens, russian_stemmer.stem):>10,.0f} слов/с  ({russian_stemmer.stem.cache_info()})")
+    text = " ".join(tokens[:5000])
+    started = time.perf_counter()
+    for _ in range(10):
+        answers.categories(text)
+    print(f"  StemMatcher.categories: {10 * 5000 / (time.perf_counter() - started):>10,.0f} слов/с")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк задержки одного изменения базы данных в режимах "json" и "wal"
+в зависимости от количества пользователей.
+
+Запуск:
+    python3 benchmarks/wal_benchmark.py [--sizes 1000,10000,100000,1000000] [--mutations 2000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+# Полная перезапись файла на больших объемах занимает секунды на одно изменение
+JSON_MODE_MAX_USERS = 10000
+
+def populate(db: Database, users: int):
+    """Заполняет базу пользователями и записывает снимок"""
+    db.data["users"] = {str(user_id): {"state": "MENU"} for user_id in range(users)}
+    db.compact()
+
+def measure(mode: str, users: int, mutations: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(os.path.join(tmp_dir, "database.json"), mode=mode)
+        populate(db, users)
+        states = ["MENU", "CONSULT", "MAP_SELECT", "MAP_TYPE", "MAP_QUESTIONS"]
+        timings = []
+        started = time.perf_counter()
+        for _ in range(mutations):
+            user_id = random.randrange(users)
+            t0 = time.perf_counter()
+            db.set_user_state(user_id, random.choice(states))
+            timings.append(time.perf_counter() - t0)
+        total = time.perf_counter() - started
+        db.close()
+    timings.sort()
+    return {
+        "mean_us": statistics.mean(timings) * 1e6,
+        "p50_us": timings[len(timings) // 2] * 1e6,
+        "p99_us": timings[int(len(timings) * 0.99)] * 1e6,
+        "max_us": timings[-1] * 1e6,
+        "per_sec": mutations / total,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    parser.add_argument("--mutations", type=int, default=2000)
+    args = parser.parse_args()
+    
+    sizes = [int(size) for size in args.sizes.split(",")]
+    print(f"{'mode':<5} {'users':>9} {'mean, мкс':>11} {'p50, мкс':>10} {'p99, мкс':>10} {'max, мкс':>11} {'изм./с':>10}")
+    for users in sizes:
+        for mode in ("json", "wal"):
+            if mode == "json" and users > JSON_MODE_MAX_USERS:
+                continue
+            mutations = args.mutations if mode == "wal" else min(args.mutations, 200)
+            result = measure(mode, users, mutations)
+            print(
+                f"{mode:<5} {users:>9} {result['mean_us']:>11.1f} {result['p50_us']:>10.1f} "
+                f"{result['p99_us']:>10.1f} {result['max_us']:>11.1f} {result['per_sec']:>10.0f}"
+            )
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест режима webhook: синтетические обновления /start отправляются
+POST-запросами на WebhookServer, ответы бота принимает локальный Bot API.
+
+Измеряются пропускная способность приема (обновлений/с), полная
+пропускная способность до ответа бота и задержка обработки (от POST до
+sendMessage) — p50/p99.
+
+Запуск:
+    python3 benchmarks/webhook_load.py [--updates 2000] [--concurrency 50]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeBotApi
+
+SECRET = "load-test-secret"
+
+def start_update(update_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+async def run(updates: int, concurrency: int, api: FakeBotApi):
+    import aiohttp
+    import run_all
+    from webhook import WebhookServer, SECRET_HEADER
+    
+    app = run_all.build_application()
+    server = WebhookServer(app, listen="127.0.0.1", port=0, url="https://example.invalid/telegram", secret=SECRET)
+    await server.start()
+    host, port = server.address[:2]
+    url = f"http://{host}:{port}{server.path}"
+    sent_at = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json=start_update(0, 1), headers={SECRET_HEADER: "wrong"}) as response:
+            print(f"Неверный секрет: HTTP {response.status}")
+        
+        async def post(i: int):
+            user_id = 10000 + i
+            async with semaphore:
+                sent_at[user_id] = time.perf_counter()
+                async with session.post(url, json=start_update(i + 1, user_id), headers={SECRET_HEADER: SECRET}) as response:
+                    response.raise_for_status()
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(post(i) for i in range(updates)))
+        accepted = time.perf_counter() - started
+        
+        replied_at = {}
+        deadline = time.perf_counter() + 120
+        while len(replied_at) < updates and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+            for message in list(api.sent):
+                replied_at.setdefault(int(message["chat_id"]), message["time"])
+        finished = max(replied_at.values()) - started if replied_at else float("nan")
+        
+        async with session.get(f"http://{host}:{port}/health") as response:
+            print(f"/health: HTTP {response.status} {await response.json()}")
+    
+    await server.stop()
+    
+    latencies = [(replied_at[user_id] - sent_at[user_id]) * 1000 for user_id in replied_at]
+    print(f"Обновлений: {updates}, ответов: {len(replied_at)}, параллельных запросов: {concurrency}")
+    print(f"Прием:      {updates / accepted:8.0f} обновлений/с")
+    print(f"Обработка:  {len(replied_at) / finished:8.0f} обновлений/с")
+    if latencies:
+        print(f"Задержка:   p50 {percentile(latencies, 0.5):.1f} мс, p99 {percentile(latencies, 0.99):.1f} мс")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    
+    api = FakeBotApi().start()
+    os.environ.update(BOT_TOKEN="123456:FAKE", TELEGRAM_API_URL=api.base_url)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        asyncio.run(run(args.updates, args.concurrency, api))
+        os.chdir(REPO_DIR)
+    api.stop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,12 +1,26 @@
+import asyncio
+import html
 import logging
+import math
 import time
-from collections import defaultdict
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler
-from config import TELEGRAM_TOKEN, ADMIN_IDS
-from database import Database
-from local_responses import LocalResponseSystem
-from psychological_maps import PSYCHOLOGICAL_MAPS
+from telegram.ext import (
+    ApplicationBuilder, CommandHandler, MessageHandler, TypeHandler, filters, ContextTypes, ConversationHandler
+)
+from config import TELEGRAM_TOKEN, TELEGRAM_API_URL, BOT_MODE, UPDATE_CONCURRENCY, BOT_API_POOL_TIMEOUT
+from database import get_database
+from map_cache import MapCache, map_key
+from message_queue import AdminDigest, get_send_queue
+from moderation import ModerationStage, MODERATION_GROUP
+from persistence import DatabasePersistence
+from rate_limit import RateLimits
+import generation
+import metrics
+from generation import GenerationExecutor, GenerationQueueFull, GenerationCancelled
+from map_catalog import MAPS, MAP_SELECT_KEYBOARD, MAP_TYPE_KEYBOARD, find_map, find_map_type
+from session import get_session
+from session_store import SessionManager, SESSION_GROUP
+from update_processor import PerUserUpdateProcessor
 
 # Состояния для ConversationHandler
 MENU, CONSULT, MAP_SELECT, MAP_TYPE, MAP_QUESTIONS, WAITING_MODERATION = range(6)
@@ -22,15 +36,7 @@ navigation_keyboard = ReplyKeyboardMarkup([
     ["🔙 Назад", "🏠 Главное меню"]
 ], resize_keyboard=True)
 
-# Формируем клавиатуру выбора карты с навигацией
-map_names = [[f"{i+1}. {m['name']}"] for i, m in enumerate(PSYCHOLOGICAL_MAPS)]
-map_select_keyboard = ReplyKeyboardMarkup(map_names + [["🔙 Назад", "🏠 Главное меню"]], resize_keyboard=True)
-
-map_type_keyboard = ReplyKeyboardMarkup([
-    ["Базовая анкета (4 вопроса)"],
-    ["Расширенная анкета (10 вопросов)"],
-    ["🔙 Назад", "🏠 Главное меню"]
-], resize_keyboard=True)
+# Клавиатуры выбора карты и типа анкеты построены в map_catalog
 
 # Приветствия
 MAP_RULES_TEXT = (
@@ -54,43 +60,39 @@ logging.basicConfig(
     level=logging.INFO
 )
 
-db = Database()
-ai = LocalResponseSystem()
-user_last_request = defaultdict(float)
-MIN_REQUEST_INTERVAL = 10
-
-def check_user_rate_limit(user_id: int) -> bool:
-    now = time.time()
-    last_request = user_last_request.get(user_id, 0)
-    if now - last_request < MIN_REQUEST_INTERVAL:
-        return False
-    user_last_request[user_id] = now
-    return True
+db = get_database()
+# Ответы и карты генерируются в пуле, чтобы не блокировать обработку других пользователей
+generator = GenerationExecutor()
+# Уведомления админам отправляются в фоне с учетом лимитов Telegram
+send_queue = get_send_queue()
+# При большом потоке уведомления админам объединяются в сводки
+admin_digest = AdminDigest(send_queue)
+# Ограничения частоты консультаций и анкет (политики задаются в config.py)
+rate_limits = RateLimits.from_config()
+# Готовые карты для повторно отправленных ответов
+map_cache = MapCache.from_config()
+# Проверка каждого входящего текста; кризисные сообщения срочно уходят админам
+moderation = ModerationStage(send_queue, admin_digest, rate_limits)
+# Сессии молчащих пользователей переносятся из памяти в файл и возвращаются при новом сообщении
+sessions = SessionManager.from_config()
+# Очереди, которые видны в /metrics (METRICS_PORT)
+metrics.Gauge("bot_generation_pending", "Задачи генерации в очереди и в работе", lambda: generator.pending)
+metrics.Gauge("bot_sessions_resident", "Сессии пользователей в памяти", lambda: sessions.stats()["resident"])
 
 def save_navigation_state(context: ContextTypes.DEFAULT_TYPE, current_state: int, previous_state: int = None):
     """Сохраняет состояние навигации"""
     if context.user_data is None:
-        context.user_data = {}
-    
-    # Сохраняем стек состояний
-    if 'navigation_stack' not in context.user_data:
-        context.user_data['navigation_stack'] = []
-    
-    # Добавляем текущее состояние в стек
-    if previous_state is not None:
-        context.user_data['navigation_stack'].append(previous_state)
+        return
     
-    context.user_data['current_state'] = current_state
+    # Предыдущее состояние добавляется в стек сессии
+    get_session(context.user_data).push_state(current_state, previous_state)
 
 def get_previous_state(context: ContextTypes.DEFAULT_TYPE) -> int:
     """Получает предыдущее состояние из стека"""
-    if context.user_data is None or 'navigation_stack' not in context.user_data:
+    if context.user_data is None:
         return MENU
     
-    navigation_stack = context.user_data.get('navigation_stack', [])
-    if navigation_stack:
-        return navigation_stack.pop()
-    return MENU
+    return get_session(context.user_data).pop_state(MENU)
 
 async def handle_navigation(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> int:
     """Обрабатывает навигационные команды"""
@@ -115,8 +117,7 @@ async def handle_navigation(update: Update, context: ContextTypes.DEFAULT_TYPE,
     elif text == "🏠 Главное меню":
         # Очищаем стек навигации и возвращаемся в главное меню
         if context.user_data:
-            context.user_data['navigation_stack'] = []
-            context.user_data['current_state'] = MENU
+            get_session(context.user_data).reset(MENU)
         
         await update.message.reply_text(
             "Выберите действие:",
@@ -144,18 +145,18 @@ async def navigate_to_state(update: Update, context: ContextTypes.DEFAULT_TYPE,
     
     elif target_state == MAP_SELECT:
         await update.message.reply_text(
-            "Выберите одну из 15 психологических карт:",
-            reply_markup=map_select_keyboard
+            f"Выберите одну из {len(MAPS)} психологических карт:",
+            reply_markup=MAP_SELECT_KEYBOARD
         )
         db.set_user_state(user_id, "MAP_SELECT")
         return MAP_SELECT
     
     elif target_state == MAP_TYPE:
-        selected_map = context.user_data.get('selected_map')
+        selected_map = get_session(context.user_data).selected_map if context.user_data is not None else None
         if selected_map:
             await update.message.reply_text(
-                f"<b>{selected_map['name']}</b>\n\n{selected_map['description']}\n\nВыберите тип анкеты:",
-                reply_markup=map_type_keyboard,
+                f"<b>{selected_map.name}</b>\n\n{selected_map.description}\n\nВыберите тип анкеты:",
+                reply_markup=MAP_TYPE_KEYBOARD,
                 parse_mode='HTML'
             )
             db.set_user_state(user_id, "MAP_TYPE")
@@ -169,6 +170,7 @@ async def navigate_to_state(update: Update, context: ContextTypes.DEFAULT_TYPE,
     db.set_user_state(user_id, "MENU")
     return MENU
 
+@metrics.handler
 async def handle_non_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обрабатывает нетекстовые сообщения"""
     if not update.message:
@@ -179,12 +181,12 @@ async def handle_non_text_message(update: Update, context: ContextTypes.DEFAULT_
         reply_markup=ReplyKeyboardRemove()
     )
 
+@metrics.handler
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message and update.effective_user:
         # Очищаем навигационный стек при старте
         if context.user_data:
-            context.user_data['navigation_stack'] = []
-            context.user_data['current_state'] = MENU
+            get_session(context.user_data).reset(MENU)
         
         await update.message.reply_text(
             "Добро пожаловать в психологический бот!\n\nВыберите действие:",
@@ -193,6 +195,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         db.set_user_state(update.effective_user.id, "MENU")
     return MENU
 
+@metrics.handler
 async def menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not update.message.text or not update.effective_user:
         return MENU
@@ -215,8 +218,8 @@ async def menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Сразу отправляем приветствие и меню выбора карты
         await update.message.reply_text(MAP_RULES_TEXT, reply_markup=ReplyKeyboardRemove())
         await update.message.reply_text(
-            "Выберите одну из 15 психологических карт:",
-            reply_markup=map_select_keyboard
+            f"Выберите одну из {len(MAPS)} психологических карт:",
+            reply_markup=MAP_SELECT_KEYBOARD
         )
         db.set_user_state(user_id, "MAP_SELECT")
         return MAP_SELECT
@@ -224,6 +227,7 @@ async def menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Пожалуйста, выберите действие из меню.")
         return MENU
 
+@metrics.handler
 async def consult_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not update.message.text or not update.effective_user:
         return MENU
@@ -237,31 +241,44 @@ async def consult_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     user = update.effective_user
     user_id = user.id
+    question = text
+    
+    # 1. Ограничение частоты: отклоненные сообщения не доходят до админов
+    wait = rate_limits.hit("consult", user_id)
+    if wait:
+        await update.message.reply_text(
+            f"Пожалуйста, подождите {math.ceil(wait)} секунд перед следующим запросом.",
+            reply_markup=main_keyboard
+        )
+        db.set_user_state(user_id, "MENU")
+        return MENU
+    
+    # 2. Уведомление админам (сразу или в сводке)
     username = user.username or '-'
     phone = '-'
-    question = text
     admin_text = (
         f"📝 <b>Вопрос психологу</b>\n"
         f"ID: <code>{user_id}</code>\n"
-        f"Ник: @{username}\n"
+        f"Ник: @{html.escape(username)}\n"
         f"Телефон: {phone}\n"
-        f"\n<b>Вопрос:</b>\n{question}"
+        f"\n<b>Вопрос:</b>\n{html.escape(question)}"
     )
-    for admin_id in ADMIN_IDS:
-        await context.bot.send_message(chat_id=admin_id, text=admin_text, parse_mode='HTML')
-    if not check_user_rate_limit(user_id):
-        remaining_time = MIN_REQUEST_INTERVAL - (time.time() - user_last_request.get(user_id, 0))
-        await update.message.reply_text(
-            f"Пожалуйста, подождите {int(remaining_time)} секунд перед следующим запросом.",
-            reply_markup=main_keyboard
-        )
-        db.set_user_state(user_id, "MENU")
-        return MENU
+    admin_digest.add(admin_text)
+    
+    # 3. Ответ пользователю
     processing_msg = await update.message.reply_text("Ваш вопрос принят. Пожалуйста, подождите, идет обработка...")
     try:
-        answer = ai.get_psychological_consultation(question)
+        answer = await generator.run(user_id, generation.consultation, question)
         await update.message.reply_text(answer, reply_markup=main_keyboard)
         db.set_user_state(user_id, "MENU")
+    except GenerationCancelled:
+        return MENU
+    except GenerationQueueFull:
+        await update.message.reply_text(
+            "Сейчас слишком много запросов, очередь заполнена. Пожалуйста, попробуйте через минуту.",
+            reply_markup=main_keyboard
+        )
+        db.set_user_state(user_id, "MENU")
     except Exception as e:
         logging.error(f"Error in consult_handler: {e}")
         await update.message.reply_text(
@@ -271,6 +288,7 @@ async def consult_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         db.set_user_state(user_id, "MENU")
     return MENU
 
+@metrics.handler
 async def map_select_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not update.message.text or not update.effective_user:
         return MAP_SELECT
@@ -283,24 +301,23 @@ async def map_select_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return navigation_result
     
     user_id = update.effective_user.id
-    try:
-        idx = int(text.split('.')[0].strip()) - 1
-        selected_map = PSYCHOLOGICAL_MAPS[idx]
-    except Exception:
-        await update.message.reply_text("Пожалуйста, выберите карту из списка.", reply_markup=map_select_keyboard)
+    selected_map = find_map(text)
+    if selected_map is None:
+        await update.message.reply_text("Пожалуйста, выберите карту из списка.", reply_markup=MAP_SELECT_KEYBOARD)
         return MAP_SELECT
     
-    context.user_data['selected_map'] = selected_map
+    get_session(context.user_data).map_id = selected_map.id
     save_navigation_state(context, MAP_TYPE, MAP_SELECT)
     
     await update.message.reply_text(
-        f"<b>{selected_map['name']}</b>\n\n{selected_map['description']}\n\nВыберите тип анкеты:",
-        reply_markup=map_type_keyboard,
+        f"<b>{selected_map.name}</b>\n\n{selected_map.description}\n\nВыберите тип анкеты:",
+        reply_markup=MAP_TYPE_KEYBOARD,
         parse_mode='HTML'
     )
     db.set_user_state(user_id, "MAP_TYPE")
     return MAP_TYPE
 
+@metrics.handler
 async def map_type_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not update.message.text or not update.effective_user:
         return MAP_TYPE
@@ -317,25 +334,28 @@ async def map_type_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return MENU
     
     user_id = update.effective_user.id
-    selected_map = context.user_data.get('selected_map')
+    session = get_session(context.user_data)
+    selected_map = session.selected_map
     if not selected_map:
         await update.message.reply_text("Ошибка: карта не выбрана. Начните заново с /start.")
         return MENU
     
-    if "Базовая" in text:
-        questions = selected_map['basic']
-        map_type = "Базовая"
-    elif "Расширенная" in text:
-        questions = selected_map['extended']
-        map_type = "Расширенная"
-    else:
-        await update.message.reply_text("Пожалуйста, выберите тип анкеты.", reply_markup=map_type_keyboard)
+    map_type = find_map_type(text)
+    if map_type is None:
+        await update.message.reply_text("Пожалуйста, выберите тип анкеты.", reply_markup=MAP_TYPE_KEYBOARD)
         return MAP_TYPE
+    questions = selected_map.questions(map_type)
     
-    context.user_data['map_questions'] = questions
-    context.user_data['map_type'] = map_type
-    context.user_data['map_answers'] = []
-    context.user_data['current_q'] = 0
+    # Ограничение числа анкет проверяем до вопросов, чтобы ответы не пропали зря
+    wait = rate_limits.hit("map", user_id)
+    if wait:
+        await update.message.reply_text(
+            f"Вы уже заполнили много анкет. Следующую можно начать через {math.ceil(wait / 60)} мин.",
+            reply_markup=MAP_TYPE_KEYBOARD
+        )
+        return MAP_TYPE
+    
+    session.start_questionnaire(map_type)
     save_navigation_state(context, MAP_QUESTIONS, MAP_TYPE)
     
     await update.message.reply_text(
@@ -345,6 +365,7 @@ async def map_type_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     db.set_user_state(user_id, "MAP_QUESTIONS")
     return MAP_QUESTIONS
 
+@metrics.handler
 async def map_questions_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not update.message.text or not update.effective_user:
         return MAP_QUESTIONS
@@ -361,38 +382,77 @@ async def map_questions_handler(update: Update, context: ContextTypes.DEFAULT_TY
         return MENU
     
     user_id = update.effective_user.id
-    answer = text
-    answers = context.user_data.get('map_answers', [])
-    questions = context.user_data.get('map_questions', [])
-    current_q = context.user_data.get('current_q', 0)
-    selected_map = context.user_data.get('selected_map')
-    map_type = context.user_data.get('map_type')
-    
-    if not questions or not selected_map or not map_type:
+    session = get_session(context.user_data)
+    selected_map = session.selected_map
+    questions = session.questions()
+    
+    if not questions:
         await update.message.reply_text("Ошибка: потерян контекст. Начните заново с /start")
         return MENU
     
-    # Сохраняем ответ
-    answers.append(answer)
-    context.user_data['map_answers'] = answers
+    # Сохраняем ответ; номер следующего вопроса — число ответов
+    session.add_answer(text)
     
-    if current_q + 1 < len(questions):
-        context.user_data['current_q'] = current_q + 1
-        next_question = questions[current_q + 1]
+    if session.current_q < len(questions):
+        next_question = questions[session.current_q]
         await update.message.reply_text(next_question, reply_markup=navigation_keyboard)
         return MAP_QUESTIONS
     else:
+        answers = session.answers
+        map_type = session.map_type.name
         await update.message.reply_text("Спасибо за ваши ответы! Формируется психологическая карта...")
+        cache_key = map_key(selected_map.id, map_type, answers)
+        cached = map_cache.get(cache_key)
+        duplicate_of = None
+        started = time.perf_counter()
+        try:
+            if cached is not None:
+                map_text, duplicate_of = cached
+            else:
+                map_text = await generator.run(user_id, generation.psychological_map, answers, questions, map_type)
+        except GenerationCancelled:
+            return MENU
+        except GenerationQueueFull:
+            # Ответ не засчитываем, чтобы пользователь мог отправить его еще раз
+            session.pop_answer()
+            await update.message.reply_text(
+                "Сейчас слишком много запросов, очередь заполнена. "
+                "Пожалуйста, отправьте последний ответ еще раз через минуту.",
+                reply_markup=navigation_keyboard
+            )
+            return MAP_QUESTIONS
+        except asyncio.TimeoutError:
+            logging.error(f"Map generation timed out for user {user_id}")
+            await update.message.reply_text(
+                "Извините, карта формируется слишком долго. Попробуйте позже.",
+                reply_markup=main_keyboard
+            )
+            db.set_user_state(user_id, "MENU")
+            return MENU
+        except Exception as e:
+            logging.error(f"Error in map_questions_handler: {e}")
+            session.reset(MENU)
+            await update.message.reply_text(
+                "Извините, произошла ошибка при создании карты. Попробуйте позже.",
+                reply_markup=main_keyboard
+            )
+            db.set_user_state(user_id, "MENU")
+            return MENU
+        map_cache.observe(cached is not None, time.perf_counter() - started)
         try:
-            map_text = ai.generate_psychological_map(answers, questions, map_type)
-            map_id = db.save_psychological_map(user_id, {
+            map_data = {
                 "type": map_type,
-                "map_id": selected_map['id'],
-                "map_name": selected_map['name'],
+                "map_id": selected_map.id,
+                "map_name": selected_map.name,
                 "questions": questions,
                 "answers": answers,
                 "map_text": map_text
-            })
+            }
+            if duplicate_of:
+                map_data["duplicate_of"] = duplicate_of
+            map_id = db.save_psychological_map(user_id, map_data)
+            if cached is None:
+                map_cache.put(cache_key, map_text, map_id)
             await update.message.reply_text(
                 "Ваша карта отправлена на модерацию. После проверки вы получите результат.",
                 reply_markup=main_keyboard
@@ -401,19 +461,19 @@ async def map_questions_handler(update: Update, context: ContextTypes.DEFAULT_TY
             user = update.effective_user
             username = user.username or '-'
             phone = '-'
-            qa_lines = [f"<b>{i+1}. {q}</b>\n{a}" for i, (q, a) in enumerate(zip(questions, answers))]
+            qa_lines = [f"<b>{i+1}. {html.escape(q)}</b>\n{html.escape(a)}" for i, (q, a) in enumerate(zip(questions, answers))]
             qa_text = '\n\n'.join(qa_lines)
             admin_text = (
                 f"🗺 <b>Ответы пользователя на вопросы для генерации карты</b>\n"
                 f"ID: <code>{user_id}</code>\n"
-                f"Ник: @{username}\n"
+                f"Ник: @{html.escape(username)}\n"
                 f"Телефон: {phone}\n"
-                f"Карта: {selected_map['name']}\n"
-                f"Тип анкеты: {map_type}\n\n"
-                f"<b>Вопросы и ответы:</b>\n{qa_text}"
+                f"Карта: {selected_map.name}\n"
+                f"Тип анкеты: {map_type}\n"
+                + (f"⚠️ Повтор: те же ответы, что в карте <code>{duplicate_of}</code>\n" if duplicate_of else "")
+                + f"\n<b>Вопросы и ответы:</b>\n{qa_text}"
             )
-            for admin_id in ADMIN_IDS:
-                await context.bot.send_message(chat_id=admin_id, text=admin_text, parse_mode='HTML')
+            admin_digest.add(admin_text)
         except Exception as e:
             logging.error(f"Error in map_questions_handler: {e}")
             await update.message.reply_text(
@@ -423,11 +483,31 @@ async def map_questions_handler(update: Update, context: ContextTypes.DEFAULT_TY
             db.set_user_state(user_id, "MENU")
         return MENU
 
+@metrics.handler
 async def unknown_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message:
         await update.message.reply_text("Пожалуйста, используйте меню для взаимодействия с ботом.")
     return MENU
 
+@metrics.handler
+async def waiting_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Сообщения, пришедшие пока готовится ответ или карта"""
+    if not update.message or not update.message.text or not update.effective_user:
+        return
+    if update.message.text in ("🔙 Назад", "🏠 Главное меню"):
+        # Обработчик, ожидающий генерацию, получит GenerationCancelled и вернет диалог в меню
+        if generator.cancel(update.effective_user.id):
+            if context.user_data:
+                get_session(context.user_data).reset(MENU)
+            await update.message.reply_text("Генерация отменена. Выберите действие:", reply_markup=main_keyboard)
+            db.set_user_state(update.effective_user.id, "MENU")
+            return
+    await update.message.reply_text(
+        "⏳ Ответ еще готовится. Чтобы отменить, нажмите «🏠 Главное меню».",
+        reply_markup=navigation_keyboard
+    )
+
+@metrics.handler
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message:
         return
@@ -450,11 +530,74 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     await update.message.reply_text(help_text)
 
-def main():
-    if not TELEGRAM_TOKEN:
-        logging.error("BOT_TOKEN environment variable is not set")
-        return
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+async def post_init(application):
+    db.start_write_behind()
+    generator.start()
+    send_queue.start(application.bot)
+    admin_digest.start()
+    sessions.start(application)
+    await metrics.start(application)
+
+async def post_shutdown(application):
+    # Досылаем уведомления и сохраняем изменения, накопленные при отложенной записи
+    await admin_digest.stop()
+    await send_queue.stop()
+    await metrics.stop()
+    await db.stop_write_behind()
+    await generator.stop()
+    rate_limits.save()
+    map_cache.save()
+    sessions.stop()
+    stats = map_cache.stats()
+    logging.info(
+        f"Map cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%}), "
+        f"latency {stats['hit_latency'] * 1000:.2f} ms hit / {stats['miss_latency'] * 1000:.2f} ms miss"
+    )
+
+def build_application():
+    """Создает Application (с локальным Bot API, если задан TELEGRAM_API_URL)"""
+    # Диалоги и user_data сохраняются в базе и восстанавливаются после перезапуска
+    builder = (
+        ApplicationBuilder()
+        .token(TELEGRAM_TOKEN)
+        .persistence(DatabasePersistence(db))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        # 256 соединений — как в пуле ApplicationBuilder по умолчанию
+        .request(metrics.bot_request(connection_pool_size=256, pool_timeout=BOT_API_POOL_TIMEOUT))
+    )
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(TELEGRAM_API_URL)
+    # Медленный обработчик одного пользователя не задерживает остальных
+    if UPDATE_CONCURRENCY > 1:
+        builder = builder.concurrent_updates(PerUserUpdateProcessor(UPDATE_CONCURRENCY))
+    return builder.build()
+
+class LastAnswerFilter(filters.MessageFilter):
+    """Ответ на последний вопрос анкеты: только он запускает генерацию карты.
+    
+    Промежуточные ответы обрабатываются с блокировкой, чтобы второе сообщение,
+    пришедшее до ответа бота на первое (например, длинный текст, разбитый
+    Telegram на два сообщения), тоже было засчитано как ответ, а не попало в WAITING."""
+    
+    def __init__(self, user_data):
+        super().__init__(name="LastAnswerFilter")
+        self.user_data = user_data
+    
+    def filter(self, message) -> bool:
+        user_data = self.user_data.get(message.from_user.id) if message.from_user else None
+        if not user_data:
+            return False
+        session = get_session(user_data)
+        questions = session.questions()
+        return bool(questions) and session.current_q == len(questions) - 1
+
+def register_handlers(app):
+    """Регистрирует обработчики пользовательского бота"""
+    # Вытесненная сессия возвращается в user_data раньше остальных обработчиков
+    app.add_handler(TypeHandler(Update, sessions), group=SESSION_GROUP)
+    # Модерация выполняется раньше остальных обработчиков и не прерывает обработку
+    app.add_handler(TypeHandler(Update, moderation), group=MODERATION_GROUP)
     
     # Обработчик нетекстовых сообщений (должен быть первым!)
     non_text_handler = MessageHandler(
@@ -467,16 +610,39 @@ def main():
         entry_points=[CommandHandler("start", start)],
         states={
             MENU: [MessageHandler(filters.TEXT & ~filters.COMMAND, menu_handler)],
-            CONSULT: [MessageHandler(filters.TEXT & ~filters.COMMAND, consult_handler)],
+            # Ответ и карта генерируются без блокировки обработки обновлений;
+            # пока генерация идет, сообщения пользователя попадают в WAITING.
+            # В анкете без блокировки обрабатывается только последний ответ
+            CONSULT: [MessageHandler(filters.TEXT & ~filters.COMMAND, consult_handler, block=False)],
             MAP_SELECT: [MessageHandler(filters.TEXT & ~filters.COMMAND, map_select_handler)],
             MAP_TYPE: [MessageHandler(filters.TEXT & ~filters.COMMAND, map_type_handler)],
-            MAP_QUESTIONS: [MessageHandler(filters.TEXT & ~filters.COMMAND, map_questions_handler)],
+            MAP_QUESTIONS: [
+                MessageHandler(
+                    filters.TEXT & ~filters.COMMAND & LastAnswerFilter(app.user_data),
+                    map_questions_handler, block=False
+                ),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, map_questions_handler),
+            ],
+            ConversationHandler.WAITING: [MessageHandler(filters.TEXT & ~filters.COMMAND, waiting_handler)],
         },
-        fallbacks=[CommandHandler("help", help_command), MessageHandler(filters.COMMAND, unknown_handler)]
+        fallbacks=[CommandHandler("help", help_command), MessageHandler(filters.COMMAND, unknown_handler)],
+        name="main_conversation",
+        persistent=True
     )
     app.add_handler(conv_handler)
     app.add_handler(CommandHandler("help", help_command))
-    app.run_polling()
+
+def main():
+    if not TELEGRAM_TOKEN:
+        logging.error("BOT_TOKEN environment variable is not set")
+        return
+    app = build_application()
+    register_handlers(app)
+    if BOT_MODE == "webhook":
+        from webhook import run_webhook
+        run_webhook(app)
+    else:
+        app.run_polling()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -6,14 +6,180 @@ load_dotenv()
 # Telegram Bot Token
 TELEGRAM_TOKEN = os.getenv("BOT_TOKEN")
 
+# Адрес Bot API (например, локальный сервер для нагрузочных тестов: http://127.0.0.1:8081/bot)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+# Сколько секунд запрос к Bot API ждет свободного соединения из пула, прежде чем
+# завершиться ошибкой (при большом потоке ответы ждут очереди, а не теряются)
+BOT_API_POOL_TIMEOUT = float(os.getenv("BOT_API_POOL_TIMEOUT", "30"))
+
 # Admin IDs for moderation (список)
 ADMIN_IDS = [int(x) for x in os.getenv("ADMIN_IDS", "196035876").split(",") if x.strip()]
 
+# Лимиты исходящих сообщений Telegram (сообщений в секунду): на один чат и на всего бота
+SEND_PER_CHAT_RATE = float(os.getenv("SEND_PER_CHAT_RATE", "1"))
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+# Одновременных запросов sendMessage и попыток при сетевых ошибках
+SEND_MAX_CONCURRENCY = int(os.getenv("SEND_MAX_CONCURRENCY", "8"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "5"))
+# Ожидание отправки очереди при остановке (секунды): запас сверх расчетного времени
+# разбора очереди при текущих лимитах и наибольшее ожидание
+SEND_STOP_TIMEOUT = float(os.getenv("SEND_STOP_TIMEOUT", "10"))
+SEND_STOP_MAX_TIMEOUT = float(os.getenv("SEND_STOP_MAX_TIMEOUT", "300"))
+
+# Сводки для админов: сколько уведомлений за интервал (секунды) отправлять сразу;
+# остальные объединяются в одно сообщение в конце интервала
+ADMIN_DIGEST_INTERVAL = float(os.getenv("ADMIN_DIGEST_INTERVAL", "30"))
+ADMIN_DIGEST_IMMEDIATE = int(os.getenv("ADMIN_DIGEST_IMMEDIATE", "5"))
+# Сколько уведомлений держать в очереди сводки (самые старые вытесняются)
+ADMIN_DIGEST_MAX_ITEMS = int(os.getenv("ADMIN_DIGEST_MAX_ITEMS", "1000"))
+
+# Ограничения частоты действий пользователей:
+# "token_bucket:<N>/<секунд>[:<burst>]" или "sliding_window:<N>/<секунд>"
+RATE_LIMIT_CONSULT = os.getenv("RATE_LIMIT_CONSULT", "token_bucket:1/10")
+RATE_LIMIT_MAP = os.getenv("RATE_LIMIT_MAP", "sliding_window:10/3600")
+# Срочные оповещения админам о кризисных сообщениях одного пользователя
+# (сверх лимита оповещения попадают в обычную сводку)
+RATE_LIMIT_CRISIS_ALERT = os.getenv("RATE_LIMIT_CRISIS_ALERT", "token_bucket:3/600:3")
+# Сколько пользователей хранить в каждом ограничителе (самые давние вытесняются)
+RATE_LIMIT_MAX_ENTRIES = int(os.getenv("RATE_LIMIT_MAX_ENTRIES", "100000"))
+# Файл, в котором ограничения сохраняются при остановке (если не задан, не сохраняются)
+RATE_LIMIT_STATE_FILE = os.getenv("RATE_LIMIT_STATE_FILE")
+
 # Domains
 EXTERNAL_DOMAIN = "myslennyj-veter-letoff.amvera.io"
 INTERNAL_DOMAIN = "amvera-letoff-run-myslennyj-veter"
 
+# Способ получения обновлений: "polling" (getUpdates) или "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+
+# Сколько обновлений разных пользователей обрабатывать одновременно
+# (обновления одного пользователя всегда по очереди); 1 — все по очереди
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "256"))
+
+# Настройки webhook-сервера (BOT_MODE=webhook)
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", f"https://{EXTERNAL_DOMAIN}{WEBHOOK_PATH}")
+# Секрет для заголовка X-Telegram-Bot-Api-Secret-Token (если не задан, генерируется при запуске)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+
 # Database file
 DATABASE_FILE = "database.json"
 
+# Режим хранения: "json" (перезапись всего файла), "wal" (журнал изменений + снимок) или "sqlite"
+DATABASE_MODE = os.getenv("DATABASE_MODE", "json")
+
+# Файл базы данных для режима "sqlite"
+DATABASE_SQLITE_FILE = os.getenv("DATABASE_SQLITE_FILE", "database.sqlite3")
+
+# Размер журнала (байт), после которого он сворачивается в снимок
+DATABASE_WAL_COMPACT_BYTES = int(os.getenv("DATABASE_WAL_COMPACT_BYTES", str(1024 * 1024)))
+
+# fsync после каждой записи в журнал (надежнее, но медленнее)
+DATABASE_WAL_FSYNC = os.getenv("DATABASE_WAL_FSYNC", "0") == "1"
+
+# Отложенная запись: изменения копятся в памяти и сбрасываются пакетами
+DATABASE_WRITE_BEHIND = os.getenv("DATABASE_WRITE_BEHIND", "0") == "1"
+
+# Интервал сброса (секунды) и число изменений, при котором сброс происходит досрочно
+DATABASE_FLUSH_INTERVAL = float(os.getenv("DATABASE_FLUSH_INTERVAL", "5"))
+DATABASE_FLUSH_THRESHOLD = int(os.getenv("DATABASE_FLUSH_THRESHOLD", "500"))
+
+# Сколько слов хранить в кэше стеммера (слово -> основа)
+STEM_CACHE_SIZE = int(os.getenv("STEM_CACHE_SIZE", "100000"))
+
+# Измерения анализа ответов анкеты: ключевые слова с весами и описания уровней
+# (от высокого к низкому: минимальная оценка от 0 до 1 и текст).
+# Слово находит все свои формы, "основа*" — все слова, начинающиеся с нее,
+# "=слово" — только эту форму (если основа совпадает с частыми словами:
+# "друг" и "другой", "одна" и "одно")
+ANALYSIS_DIMENSIONS = {
+    "emotional": {
+        "title": "Эмоциональное состояние",
+        "keywords": {
+            'хорошо': 1.0, 'плохо': 1.0, 'грустно': 1.0, 'грусть': 1.0, 'радостно': 1.0, 'радость': 1.0,
+            'спокойно': 1.0, 'спокойствие': 1.0, 'волну*': 1.0, 'волнов*': 1.0, 'устал*': 1.0,
+        },
+        "levels": [
+            (0.6, "В целом позитивное, с некоторыми колебаниями настроения."),
+            (0.3, "Переменчивое: есть и спокойные, и напряженные периоды."),
+            (0.0, "Требует внимания, возможны признаки стресса или тревоги."),
+        ],
+    },
+    "social": {
+        "title": "Социальная активность",
+        "keywords": {
+            'люди': 1.0, 'людьми': 1.0, 'друзья': 1.0, '=друг': 1.0, '=друга': 1.0, '=другу': 1.0,
+            '=другом': 1.0, '=друге': 1.0, 'подруг*': 1.0, 'общение': 1.0, 'обща*': 1.0,
+            'компания': 1.0, 'один': 1.0,
+        },
+        "levels": [
+            (0.6, "Вы цените общение и связи с людьми."),
+            (0.3, "Вам важны и общение, и время наедине с собой."),
+            (0.0, "Вы предпочитаете уединение и внутреннюю работу."),
+        ],
+    },
+    "active": {
+        "title": "Уровень активности",
+        "keywords": {
+            'движение': 1.0, 'спорт*': 1.0, 'активн*': 1.0, 'работ*': 1.0, 'занятия': 1.0, 'трениров*': 1.0,
+        },
+        "levels": [
+            (0.6, "Вы ведете активный образ жизни."),
+            (0.3, "Вы сочетаете активность и отдых."),
+            (0.0, "Вы предпочитаете спокойный, размеренный ритм жизни."),
+        ],
+    },
+    "tension": {
+        "title": "Напряжение",
+        "keywords": {
+            'стресс*': 1.0, 'напряж*': 1.0, 'тревож*': 1.0, 'тревог*': 1.0, 'беспоко*': 1.0,
+            'устал*': 0.5, 'утомл*': 0.5, 'волну*': 0.5, 'волнов*': 0.5,
+        },
+        "levels": [
+            (0.5, "Заметны признаки стресса, стоит уделить внимание отдыху и восстановлению."),
+            (0.2, "Иногда появляются стресс и тревога."),
+            (0.0, "Выраженных признаков стресса нет."),
+        ],
+    },
+}
+
+# Генерация ответов и карт в пуле: "thread" или "process", число исполнителей,
+# предельное число задач в очереди и в работе, таймаут одной задачи (секунды)
+GENERATION_EXECUTOR = os.getenv("GENERATION_EXECUTOR", "thread")
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "4"))
+GENERATION_MAX_PENDING = int(os.getenv("GENERATION_MAX_PENDING", "32"))
+GENERATION_TIMEOUT = float(os.getenv("GENERATION_TIMEOUT", "30"))
+
+# Кэш сгенерированных карт: сколько карт хранить и файл, в котором кэш
+# сохраняется при остановке (если не задан, не сохраняется)
+MAP_CACHE_SIZE = int(os.getenv("MAP_CACHE_SIZE", "10000"))
+MAP_CACHE_FILE = os.getenv("MAP_CACHE_FILE")
+
+# Как часто (секунды) сохранять изменившиеся диалоги и user_data в базу
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv("PERSISTENCE_UPDATE_INTERVAL", "30"))
+
+# Неактивные сессии: через сколько секунд без сообщений сессия переносится из
+# памяти в файл SESSION_STORE_FILE, через сколько секунд в файле удаляется
+# и как часто (секунды) это проверяется
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "1800"))
+SESSION_STALE_TIMEOUT = float(os.getenv("SESSION_STALE_TIMEOUT", str(30 * 24 * 3600)))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "300"))
+SESSION_STORE_FILE = os.getenv("SESSION_STORE_FILE", "sessions.sqlite3")
+
+# Метрики Prometheus: порт эндпоинта /metrics (0 — метрики не собираются) и адрес,
+# на котором он слушает (по умолчанию доступен только локально)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# Профилировщик (/profile в админ-панели): интервал выборки стеков (секунды),
+# длительность замера по умолчанию и наибольшая длительность (секунды)
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.01"))
+PROFILE_DEFAULT_SECONDS = float(os.getenv("PROFILE_DEFAULT_SECONDS", "30"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+
+# Сколько карт показывает одна страница очереди модерации (/pending)
+PENDING_PAGE_SIZE = int(os.getenv("PENDING_PAGE_SIZE", "5"))
+
 # Удаляю старые вопросы для карт 
\ No newline at end of file
@@ -1,12 +1,63 @@
+import asyncio
+import bisect
+import contextlib
 import json
+import logging
 import os
-from typing import Dict, Any, Optional
-from config import DATABASE_FILE
+import metrics
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from config import (
+    DATABASE_FILE, DATABASE_MODE, DATABASE_WAL_COMPACT_BYTES, DATABASE_WAL_FSYNC,
+    DATABASE_WRITE_BEHIND, DATABASE_FLUSH_INTERVAL, DATABASE_FLUSH_THRESHOLD
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессная блокировка недоступна
+    fcntl = None
 
 class Database:
-    def __init__(self):
-        self.db_file = DATABASE_FILE
-        self.data = self._load_data()
+    """Хранилище пользователей и карт.
+    
+    Режимы хранения (DATABASE_MODE):
+    - "json": каждое изменение перезаписывает весь файл базы данных;
+    - "wal": изменения дописываются короткими записями в журнал (<файл>.wal),
+      который периодически сворачивается в снимок database.json и
+      проигрывается поверх снимка при запуске.
+    Режим "sqlite" реализован в sqlite_database.SqliteDatabase (см. get_database).
+    
+    При отложенной записи (DATABASE_WRITE_BEHIND) изменения помечаются как
+    «грязные» и сохраняются фоновой задачей раз в DATABASE_FLUSH_INTERVAL секунд
+    или при накоплении DATABASE_FLUSH_THRESHOLD изменений.
+    
+    Файлы базы могут одновременно использовать несколько процессов
+    (run.py и run_admin.py): запись идет под блокировкой <файл>.lock, а перед
+    чтением и записью изменения других процессов подхватываются по смене
+    inode/mtime/размера снимка и размера журнала.
+    """
+    
+    def __init__(self, db_file: Optional[str] = None, mode: Optional[str] = None,
+                 write_behind: Optional[bool] = None):
+        self.db_file = db_file or DATABASE_FILE
+        self.mode = mode or DATABASE_MODE
+        self.write_behind = DATABASE_WRITE_BEHIND if write_behind is None else write_behind
+        self.wal_file = self.db_file + ".wal"
+        self._dirty: Dict[tuple, Dict[str, Any]] = {}
+        self._flush_event: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._log = None
+        self._log_size = 0
+        self._snapshot_size = 0
+        self._snapshot_signature = None
+        self._lock_file = None
+        self._lock_depth = 0
+        # Порядковые номера карт (с 1, в порядке создания) и номера карт на модерации
+        # по возрастанию: страница очереди модерации — срез по bisect, без обхода всех карт
+        self._map_ids: List[str] = []
+        self._map_seqs: Dict[str, int] = {}
+        self._pending_seqs: List[int] = []
+        with self._locked():
+            self._reload(repair=True)
     
     def _load_data(self) -> Dict[str, Any]:
         """Загружает данные из файла базы данных"""
@@ -20,77 +71,404 @@ class Database:
     
     def _save_data(self):
         """Сохраняет данные в файл базы данных"""
-        with open(self.db_file, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        tmp_file = self.db_file + ".tmp"
+        with metrics.DB_WRITE_SECONDS.time("snapshot"):
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.db_file)
+        self._snapshot_signature = self._file_signature(self.db_file)
+        if self._snapshot_signature:
+            metrics.DB_WRITE_BYTES.inc("snapshot", amount=self._snapshot_signature[2])
+    
+    @staticmethod
+    def _file_signature(path: str) -> Optional[tuple]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    
+    @contextlib.contextmanager
+    def _locked(self, shared: bool = False):
+        """Межпроцессная блокировка файлов базы (повторно входимая)"""
+        if fcntl is None or self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+        if self._lock_file is None:
+            self._lock_file = open(self.db_file + ".lock", 'a')
+        fcntl.flock(self._lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+    
+    def _reload(self, repair: bool = False):
+        """Перечитывает снимок и журнал целиком"""
+        self._snapshot_signature = self._file_signature(self.db_file)
+        self._snapshot_size = self._snapshot_signature[2] if self._snapshot_signature else 0
+        self.data = self._load_data()
+        self._index_maps()
+        self._log_size = 0
+        if self.mode == "wal":
+            self._replay_log(repair)
+        self._reapply_dirty()
+    
+    def _index_maps(self):
+        """Строит индекс карт по загруженному снимку"""
+        maps = self.data.get("psychological_maps", {})
+        self._map_ids = list(maps)
+        self._map_seqs = {map_id: seq for seq, map_id in enumerate(self._map_ids, 1)}
+        self._pending_seqs = [
+            seq for seq, map_data in enumerate(maps.values(), 1) if map_data.get("status") == "pending"
+        ]
+    
+    def _index_status(self, map_id: str, old_status: Optional[str], new_status: Optional[str]):
+        """Обновляет очередь модерации при смене статуса карты"""
+        if (old_status == "pending") == (new_status == "pending"):
+            return
+        seq = self._map_seqs[map_id]
+        if new_status == "pending":
+            bisect.insort(self._pending_seqs, seq)
+            return
+        i = bisect.bisect_left(self._pending_seqs, seq)
+        if i < len(self._pending_seqs) and self._pending_seqs[i] == seq:
+            del self._pending_seqs[i]
+    
+    def _refresh(self):
+        """Подхватывает изменения, сделанные другими процессами"""
+        if self._file_signature(self.db_file) == self._snapshot_signature:
+            if self.mode != "wal" or self._wal_size() == self._log_size:
+                return
+        with self._locked(shared=True):
+            if self._file_signature(self.db_file) != self._snapshot_signature or self._wal_size() < self._log_size:
+                self._reload()
+            elif self.mode == "wal":
+                self._replay_log()
+                self._reapply_dirty()
+    
+    def _wal_size(self) -> int:
+        try:
+            return os.path.getsize(self.wal_file)
+        except FileNotFoundError:
+            return 0
+    
+    def _reapply_dirty(self):
+        # Несохраненные изменения этого процесса остаются поверх прочитанных
+        for record in self._dirty.values():
+            self._apply(record)
+    
+    def _replay_log(self, repair: bool = False):
+        """Проигрывает журнал изменений с последней прочитанной позиции"""
+        if not os.path.exists(self.wal_file):
+            return
+        valid_size = self._log_size
+        with open(self.wal_file, 'rb') as f:
+            f.seek(valid_size)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Оборванная запись после аварийной остановки
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                self._apply(record)
+                valid_size += len(line)
+        if repair and valid_size != os.path.getsize(self.wal_file):
+            with open(self.wal_file, 'r+b') as f:
+                f.truncate(valid_size)
+        self._log_size = valid_size
+    
+    def _apply(self, record: Dict[str, Any]):
+        """Применяет одну запись изменения к данным в памяти"""
+        op = record["op"]
+        if op == "set_user":
+            users = self.data.setdefault("users", {})
+            users.setdefault(record["user_id"], {})[record["key"]] = record["value"]
+        elif op == "add_map":
+            map_id = record["map_id"]
+            maps = self.data.setdefault("psychological_maps", {})
+            old_map = maps.get(map_id)
+            maps[map_id] = record["map"]
+            if old_map is None:
+                self._map_ids.append(map_id)
+                self._map_seqs[map_id] = len(self._map_ids)
+            self._index_status(map_id, old_map and old_map.get("status"), record["map"].get("status"))
+        elif op == "set_map_status":
+            map_data = self.data.get("psychological_maps", {}).get(record["map_id"])
+            if map_data is not None:
+                old_status, map_data["status"] = map_data.get("status"), record["status"]
+                self._index_status(record["map_id"], old_status, record["status"])
+        elif op == "set_map_text":
+            map_data = self.data.get("psychological_maps", {}).get(record["map_id"])
+            if map_data is not None:
+                map_data.setdefault("data", {})["map_text"] = record["map_text"]
+    
+    @staticmethod
+    def _record_key(record: Dict[str, Any]) -> tuple:
+        """Ключ изменяемого поля: повторные изменения поля до сброса схлопываются"""
+        if record["op"] == "set_user":
+            return ("user", record["user_id"], record["key"])
+        return (record["op"], record["map_id"])
+    
+    def _commit(self, *records: Dict[str, Any]):
+        """Применяет изменения и сохраняет их согласно режиму хранения
+        (несколько изменений сохраняются одной записью)"""
+        if not self.write_behind:
+            with self._locked():
+                self._refresh()
+                for record in records:
+                    self._apply(record)
+                self._persist(list(records))
+            return
+        for record in records:
+            self._apply(record)
+            self._dirty[self._record_key(record)] = record
+        if len(self._dirty) >= DATABASE_FLUSH_THRESHOLD:
+            if self._flush_event is not None:
+                self._flush_event.set()
+            else:
+                self.flush()
+    
+    def _persist(self, records: List[Dict[str, Any]]):
+        if self.mode == "wal":
+            self._append_log(records)
+        else:
+            self._save_data()
+    
+    def flush(self):
+        """Сохраняет все накопленные изменения"""
+        if not self._dirty:
+            return
+        with self._locked():
+            self._refresh()
+            records = list(self._dirty.values())
+            self._persist(records)
+            # Только после успешной записи: иначе изменения останутся до следующего сброса
+            self._dirty.clear()
+    
+    async def _flush_loop(self):
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._flush_event.wait(), timeout=DATABASE_FLUSH_INTERVAL)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Например, нет места на диске: повторим при следующем сбросе
+                logging.error(f"Error flushing {len(self._dirty)} database changes: {e}")
+    
+    def start_write_behind(self):
+        """Запускает фоновый сброс изменений (вызывается из post_init)"""
+        if not self.write_behind or self._flush_task is not None:
+            return
+        self._flush_event = asyncio.Event()
+        self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+    
+    async def stop_write_behind(self):
+        """Останавливает фоновый сброс и сохраняет остаток (вызывается из post_shutdown)"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flush_task
+            self._flush_task = None
+            self._flush_event = None
+        self.flush()
+    
+    def _append_log(self, records: List[Dict[str, Any]]):
+        """Дописывает записи в журнал и при необходимости сворачивает его"""
+        payload = "".join(
+            json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for record in records
+        ).encode("utf-8")
+        if self._log is None:
+            self._log = open(self.wal_file, 'ab')
+        with metrics.DB_WRITE_SECONDS.time("wal"):
+            self._log.write(payload)
+            self._log.flush()
+            if DATABASE_WAL_FSYNC:
+                os.fsync(self._log.fileno())
+        metrics.DB_WRITE_BYTES.inc("wal", amount=len(payload))
+        self._log_size += len(payload)
+        # Порог растет вместе со снимком, поэтому стоимость свертки
+        # на одно изменение остается постоянной
+        if self._log_size > max(DATABASE_WAL_COMPACT_BYTES, self._snapshot_size):
+            self.compact()
+    
+    def compact(self):
+        """Сворачивает журнал: записывает снимок и очищает журнал"""
+        with self._locked():
+            self._refresh()
+            self._save_data()
+            self._snapshot_size = self._snapshot_signature[2]
+            if self.mode != "wal":
+                return
+            if self._log is None:
+                self._log = open(self.wal_file, 'ab')
+            self._log.truncate(0)
+            self._log_size = 0
+    
+    def close(self):
+        """Сохраняет накопленные изменения и закрывает файл журнала"""
+        self.flush()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
     
     def get_user_state(self, user_id: int) -> Optional[str]:
         """Получает текущее состояние пользователя"""
+        self._refresh()
         return self.data.get("users", {}).get(str(user_id), {}).get("state")
     
     def set_user_state(self, user_id: int, state: str):
         """Устанавливает состояние пользователя"""
-        if "users" not in self.data:
-            self.data["users"] = {}
-        
-        if str(user_id) not in self.data["users"]:
-            self.data["users"][str(user_id)] = {}
-        
-        self.data["users"][str(user_id)]["state"] = state
-        self._save_data()
+        self._commit({"op": "set_user", "user_id": str(user_id), "key": "state", "value": state})
     
     def get_user_data(self, user_id: int) -> Dict[str, Any]:
         """Получает данные пользователя"""
+        self._refresh()
         return self.data.get("users", {}).get(str(user_id), {})
     
+    def get_all_users(self) -> Dict[int, Dict[str, Any]]:
+        """Получает данные всех пользователей"""
+        self._refresh()
+        return {int(user_id): data for user_id, data in self.data.get("users", {}).items()}
+    
     def set_user_data(self, user_id: int, key: str, value: Any):
         """Устанавливает данные пользователя"""
-        if "users" not in self.data:
-            self.data["users"] = {}
-        
-        if str(user_id) not in self.data["users"]:
-            self.data["users"][str(user_id)] = {}
-        
-        self.data["users"][str(user_id)][key] = value
-        self._save_data()
+        self._commit({"op": "set_user", "user_id": str(user_id), "key": key, "value": value})
+    
+    def set_users_data(self, changes: Dict[int, Dict[str, Any]]):
+        """Устанавливает данные нескольких пользователей одной записью ({user_id: {ключ: значение}})"""
+        records = [
+            {"op": "set_user", "user_id": str(user_id), "key": key, "value": value}
+            for user_id, fields in changes.items() for key, value in fields.items()
+        ]
+        if records:
+            self._commit(*records)
     
     def save_psychological_map(self, user_id: int, map_data: Dict[str, Any]):
         """Сохраняет психологическую карту"""
-        if "psychological_maps" not in self.data:
-            self.data["psychological_maps"] = {}
-        
-        map_id = f"map_{user_id}_{len(self.data['psychological_maps']) + 1}"
-        self.data["psychological_maps"][map_id] = {
-            "user_id": user_id,
-            "data": map_data,
-            "status": "pending"  # pending, approved, rejected
-        }
-        self._save_data()
+        with self._locked():
+            # Номер карты считается по актуальным данным всех процессов
+            self._refresh()
+            map_id = f"map_{user_id}_{len(self.data.get('psychological_maps', {})) + 1}"
+            self._commit({
+                "op": "add_map",
+                "map_id": map_id,
+                "map": {
+                    "user_id": user_id,
+                    "data": map_data,
+                    "status": "pending"  # pending, approved, rejected
+                }
+            })
         return map_id
     
+    def get_map(self, map_id: str) -> Optional[Dict[str, Any]]:
+        """Получает карту по идентификатору"""
+        self._refresh()
+        return self.data.get("psychological_maps", {}).get(map_id)
+    
+    def count_maps(self) -> int:
+        """Количество всех карт"""
+        self._refresh()
+        return len(self.data.get("psychological_maps", {}))
+    
+    def iter_maps(self, after: Optional[str] = None, batch_size: int = 500) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Перебирает все карты в порядке создания, начиная после карты after.
+        Изменения других процессов подхватываются каждые batch_size карт"""
+        self._refresh()
+        map_ids = list(self.data.get("psychological_maps", {}))
+        start = map_ids.index(after) + 1 if after in map_ids else 0
+        for i in range(start, len(map_ids), batch_size):
+            self._refresh()
+            maps = self.data.get("psychological_maps", {})
+            for map_id in map_ids[i:i + batch_size]:
+                if map_id in maps:
+                    yield map_id, maps[map_id]
+    
+    def update_map_texts(self, texts: Dict[str, str]):
+        """Заменяет тексты нескольких карт одной записью"""
+        if not texts:
+            return
+        self._commit(*(
+            {"op": "set_map_text", "map_id": map_id, "map_text": map_text}
+            for map_id, map_text in texts.items()
+        ))
+    
     def get_pending_maps(self) -> Dict[str, Any]:
         """Получает все карты на модерации"""
-        pending_maps = {}
-        for map_id, map_data in self.data.get("psychological_maps", {}).items():
-            if map_data.get("status") == "pending":
-                pending_maps[map_id] = map_data
-        return pending_maps
+        self._refresh()
+        maps = self.data.get("psychological_maps", {})
+        return {self._map_ids[seq - 1]: maps[self._map_ids[seq - 1]] for seq in self._pending_seqs}
+    
+    def count_pending(self, before: Optional[int] = None) -> int:
+        """Количество карт на модерации (с before — только с номером меньше before)"""
+        self._refresh()
+        if before is None:
+            return len(self._pending_seqs)
+        return bisect.bisect_left(self._pending_seqs, before)
+    
+    def get_pending_page(self, after: int = 0, limit: int = 10,
+                         before: Optional[int] = None) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """Страница очереди модерации: (номер, map_id, карта) по возрастанию номера.
+        
+        Берутся первые limit карт с номером больше after, а с before —
+        последние limit карт с номером меньше before."""
+        self._refresh()
+        if before is None:
+            start = bisect.bisect_right(self._pending_seqs, after)
+            seqs = self._pending_seqs[start:start + limit]
+        else:
+            end = bisect.bisect_left(self._pending_seqs, before)
+            seqs = self._pending_seqs[max(0, end - limit):end]
+        maps = self.data.get("psychological_maps", {})
+        return [(seq, self._map_ids[seq - 1], maps[self._map_ids[seq - 1]]) for seq in seqs]
     
     def approve_map(self, map_id: str):
         """Одобряет психологическую карту"""
-        if map_id in self.data.get("psychological_maps", {}):
-            self.data["psychological_maps"][map_id]["status"] = "approved"
-            self._save_data()
+        if self.get_map(map_id) is not None:
+            self._commit({"op": "set_map_status", "map_id": map_id, "status": "approved"})
     
     def reject_map(self, map_id: str):
         """Отклоняет психологическую карту"""
-        if map_id in self.data.get("psychological_maps", {}):
-            self.data["psychological_maps"][map_id]["status"] = "rejected"
-            self._save_data()
+        if self.get_map(map_id) is not None:
+            self._commit({"op": "set_map_status", "map_id": map_id, "status": "rejected"})
+    
+    def set_maps_status(self, map_ids: List[str], status: str):
+        """Меняет статус нескольких карт одной записью (approved, rejected)"""
+        self._refresh()
+        maps = self.data.get("psychological_maps", {})
+        records = [{"op": "set_map_status", "map_id": map_id, "status": status} for map_id in map_ids if map_id in maps]
+        if records:
+            self._commit(*records)
     
     def get_user_maps(self, user_id: int) -> Dict[str, Any]:
         """Получает все карты пользователя"""
+        self._refresh()
         user_maps = {}
         for map_id, map_data in self.data.get("psychological_maps", {}).items():
             if map_data.get("user_id") == user_id:
                 user_maps[map_id] = map_data
-        return user_maps 
\ No newline at end of file
+        return user_maps
+
+_shared_database = None
+
+def get_database():
+    """Возвращает общее для процесса хранилище согласно DATABASE_MODE"""
+    global _shared_database
+    if _shared_database is None:
+        if DATABASE_MODE == "sqlite":
+            from sqlite_database import SqliteDatabase
+            _shared_database = SqliteDatabase()
+        else:
+            _shared_database = Database()
+    return _shared_database
\ No newline at end of file
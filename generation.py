@@ -0,0 +1,123 @@
+"""
+Генерация ответов и карт вне цикла событий.
+
+Обработчики бота ждут результат пула (как при run_in_executor), поэтому тяжелый
+анализ не задерживает обновления других пользователей. Пул потоков или
+процессов (GENERATION_EXECUTOR) размером GENERATION_WORKERS; у каждой задачи
+есть таймаут GENERATION_TIMEOUT, а пользователь может отменить свою задачу,
+уйдя в меню. Если в работе уже GENERATION_MAX_PENDING задач, новая не
+ставится в очередь — run() сразу выбрасывает GenerationQueueFull.
+"""
+
+import asyncio
+import threading
+import metrics
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from config import GENERATION_EXECUTOR, GENERATION_WORKERS, GENERATION_MAX_PENDING, GENERATION_TIMEOUT
+from local_responses import LocalResponseSystem
+
+class GenerationQueueFull(Exception):
+    """В работе слишком много задач генерации"""
+
+class GenerationCancelled(Exception):
+    """Пользователь отменил генерацию"""
+
+# Функции выполняются в пуле; в режиме "process" у каждого процесса свой экземпляр
+_local_system: Optional[LocalResponseSystem] = None
+
+def _system() -> LocalResponseSystem:
+    global _local_system
+    if _local_system is None:
+        _local_system = LocalResponseSystem()
+    return _local_system
+
+def consultation(question: str) -> str:
+    return _system().get_psychological_consultation(question)
+
+def psychological_map(answers: List[str], questions: List[str], map_type: str) -> str:
+    return _system().generate_psychological_map(answers, questions, map_type)
+
+class GenerationExecutor:
+    def __init__(self, kind: str = GENERATION_EXECUTOR, workers: int = GENERATION_WORKERS,
+                 max_pending: int = GENERATION_MAX_PENDING, timeout: float = GENERATION_TIMEOUT):
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor: Optional[Executor] = None
+        # Задачи считаются до фактического завершения в пуле: отмененная или
+        # просроченная задача, которая уже выполняется, продолжает занимать место
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._jobs: Dict[int, asyncio.Future] = {}
+    
+    def start(self):
+        """Создает пул (вызывается из post_init)"""
+        if self._executor is not None:
+            return
+        if self.kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="generation")
+    
+    async def stop(self):
+        """Отменяет ожидающие задачи и закрывает пул (вызывается из post_shutdown)"""
+        if self._executor is None:
+            return
+        for user_id in list(self._jobs):
+            self.cancel(user_id)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+    
+    @property
+    def pending(self) -> int:
+        """Количество задач в очереди и в работе"""
+        return self._pending
+    
+    def _job_done(self, _: Future):
+        with self._lock:
+            self._pending -= 1
+    
+    def cancel(self, user_id: int) -> bool:
+        """Отменяет задачу пользователя. Задача, которая уже выполняется,
+        дорабатывает в пуле, но ее результат не будет использован"""
+        job = self._jobs.pop(user_id, None)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+    
+    async def run(self, user_id: int, func: Callable[..., Any], *args) -> Any:
+        """Выполняет func(*args) в пуле и возвращает результат.
+        
+        Выбрасывает GenerationQueueFull, если очередь заполнена,
+        GenerationCancelled, если пользователь отменил задачу, и
+        asyncio.TimeoutError, если задача не уложилась в таймаут."""
+        self.start()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                metrics.GENERATION_REJECTED.inc(func.__name__)
+                raise GenerationQueueFull()
+            self._pending += 1
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._job_done)
+        job = asyncio.wrap_future(future)
+        self.cancel(user_id)
+        self._jobs[user_id] = job
+        try:
+            with metrics.GENERATION_SECONDS.time(func.__name__):
+                return await asyncio.wait_for(job, self.timeout)
+        except asyncio.CancelledError:
+            # Задачу отменил cancel(), а не остановка обработчика
+            if job.cancelled() and self._jobs.get(user_id) is not job:
+                raise GenerationCancelled() from None
+            raise
+        finally:
+            if self._jobs.get(user_id) is job:
+                del self._jobs[user_id]
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+Поиск ключевых слов нескольких категорий: текст приводится к нижнему
+регистру один раз, а все категории проверяются по нему сразу.
+
+KeywordMatcher ищет ключевые слова как подстроки, StemMatcher сравнивает
+основы слов (russian_stemmer) и находит любые формы слова.
+
+Для небольшого словаря быстрее всего отдельный поиск str.find для каждого
+слова (он выполняется на C и почти не зависит от содержимого текста).
+Начиная с REGEX_MIN_KEYWORDS слов выгоднее один проход скомпилированным
+выражением по префиксному дереву слов: его стоимость не растет с размером
+словаря. Замер: python3 benchmarks/keyword_matcher_benchmark.py
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from config import STEM_CACHE_SIZE
+from russian_stemmer import stem
+
+# Размер словаря, с которого одно регулярное выражение быстрее поиска по словам
+REGEX_MIN_KEYWORDS = 100
+
+# Слово текста: последовательность букв
+WORD = re.compile(r"[^\W\d_]+")
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Строит регулярное выражение по префиксному дереву слов, чтобы общие
+    начала ("напряжен", "непонят") проверялись один раз"""
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Слово может закончиться здесь, а может продолжиться более длинным
+        return "(?:" + body + ")?" if "" in node else body
+    
+    return build(trie) or "(?!)"
+
+class KeywordMatcher:
+    """Находит категории, ключевые слова которых встречаются в тексте.
+    
+    Ключевые слова ищутся как подстроки без учета регистра (основа "тревож"
+    находит "тревожно"). Словарь разбирается один раз при создании."""
+    
+    def __init__(self, categories: Dict[str, Iterable[str]], use_regex: Optional[bool] = None):
+        self._categories: Dict[str, str] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                self._categories.setdefault(keyword.lower(), category)
+        if use_regex is None:
+            use_regex = len(self._categories) >= REGEX_MIN_KEYWORDS
+        self._pattern = re.compile(_trie_pattern(self._categories)) if use_regex else None
+    
+    def finditer(self, text: str) -> Iterator[Tuple[str, str, int]]:
+        """Возвращает (категория, ключевое слово, позиция) для каждого вхождения"""
+        text = text.lower()
+        if self._pattern is not None:
+            for match in self._pattern.finditer(text):
+                keyword = match.group()
+                yield self._categories[keyword], keyword, match.start()
+            return
+        for keyword, category in self._categories.items():
+            position = text.find(keyword)
+            while position != -1:
+                yield category, keyword, position
+                position = text.find(keyword, position + 1)
+    
+    def match(self, text: str) -> Dict[str, List[int]]:
+        """Возвращает найденные категории с позициями вхождений"""
+        found: Dict[str, List[int]] = {}
+        for category, _, position in self.finditer(text):
+            found.setdefault(category, []).append(position)
+        for positions in found.values():
+            positions.sort()
+        return found
+    
+    def categories(self, text: str) -> Set[str]:
+        """Возвращает только найденные категории (быстрее, чем match)"""
+        text = text.lower()
+        if self._pattern is not None:
+            return {self._categories[keyword] for keyword in self._pattern.findall(text)}
+        found = set()
+        for keyword, category in self._categories.items():
+            if category not in found and keyword in text:
+                found.add(category)
+        return found
+
+class StemMatcher(KeywordMatcher):
+    """Находит категории по словам текста с учетом словоизменения.
+    
+    Ключевое слово "друзья" совпадает с любым словом с той же основой
+    ("друзей", "друзьям"). Ключевое слово со звездочкой ("тревож*") — это
+    начало слова: оно находит "тревожно", "тревожность" и т. п. Ключевое
+    слово со знаком равенства ("=друг") находит только эту форму: так
+    задаются слова, основа которых совпадает с частыми словами ("другой").
+    
+    Результат разбора слова кэшируется (до STEM_CACHE_SIZE слов), поэтому
+    повторяющееся слово стоит одного обращения к словарю."""
+    
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        self._forms: Dict[str, Tuple[str, str]] = {}
+        self._stems: Dict[str, Tuple[str, str]] = {}
+        self._prefixes: Dict[str, Tuple[str, str]] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if keyword.endswith("*"):
+                    self._prefixes.setdefault(keyword[:-1], (category, keyword))
+                elif keyword.startswith("="):
+                    self._forms.setdefault(keyword[1:], (category, keyword))
+                else:
+                    self._stems.setdefault(stem(keyword), (category, keyword))
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._prefixes}, reverse=True)
+        self._words: Dict[str, Optional[Tuple[str, str]]] = {}
+    
+    def lookup(self, word: str) -> Optional[Tuple[str, str]]:
+        """Возвращает (категория, ключевое слово) для слова в нижнем регистре или None"""
+        try:
+            return self._words[word]
+        except KeyError:
+            pass
+        found = self._forms.get(word)
+        if found is None:
+            found = self._stems.get(stem(word))
+        if found is None:
+            for length in self._prefix_lengths:
+                found = self._prefixes.get(word[:length])
+                if found is not None:
+                    break
+        if len(self._words) >= STEM_CACHE_SIZE:
+            self._words.clear()
+        self._words[word] = found
+        return found
+    
+    def finditer(self, text: str) -> Iterator[Tuple[str, str, int]]:
+        """Возвращает (категория, ключевое слово, позиция) для каждого найденного слова"""
+        for word in WORD.finditer(text.lower()):
+            found = self.lookup(word.group())
+            if found is not None:
+                yield found[0], found[1], word.start()
+    
+    def categories(self, text: str) -> Set[str]:
+        """Возвращает только найденные категории"""
+        found = set()
+        for word in WORD.findall(text.lower()):
+            match = self.lookup(word)
+            if match is not None:
+                found.add(match[0])
+        return found
\ No newline at end of file
@@ -5,6 +5,37 @@
 
 import random
 from typing import List, Dict, Any
+from analysis import AnswerAnalyzer
+from keyword_matcher import KeywordMatcher, StemMatcher
+
+# Темы консультаций в порядке приоритета: ответ дается по первой найденной.
+# Слово находит все свои формы, "основа*" — все слова, начинающиеся с нее
+CONSULTATION_TOPICS = {
+    "stress": ['стресс*', 'устал*', 'утомл*', 'напряж*'],
+    "anxiety": ['тревож*', 'тревог*', 'беспоко*', 'волну*', 'волнов*'],
+    "loneliness": ['одинок*', 'одиноч*', 'непонят*', 'отвергнут*'],
+    "anger": ['злость', 'злюсь', 'злит*', 'раздраж*', 'серди*', 'сержусь'],
+}
+
+# Признаки кризисного состояния (ищутся как подстроки без учета регистра)
+CRISIS_KEYWORDS = ['самоубийств', 'суицид', 'убить', 'умереть', 'больно', 'ненавижу себя',
+                   'покончить с собой', 'не хочу жить']
+
+# Словарь разбирается один раз: проверяется каждое входящее сообщение
+_crisis_matcher = KeywordMatcher({"crisis": CRISIS_KEYWORDS})
+
+def moderate_content(content: str) -> Dict[str, Any]:
+    """Локальная модерация контента"""
+    keywords = sorted({keyword for _, keyword, _ in _crisis_matcher.finditer(content)})
+    is_safe = not keywords
+    
+    return {
+        "is_safe": is_safe,
+        "risk_level": "high" if not is_safe else "low",
+        "concerns": [] if is_safe else ["Обнаружен потенциально опасный контент"],
+        "keywords": keywords,
+        "recommendation": "Контент прошел проверку" if is_safe else "Рекомендуется профессиональная помощь"
+    }
 
 class LocalResponseSystem:
     def __init__(self):
@@ -30,6 +61,17 @@ class LocalResponseSystem:
             "Я слышу вашу боль и понимаю, что это непросто. В такие моменты важно быть добрым к себе и помнить, что трудности временны. Обращение за профессиональной помощью - это мудрое решение."
         ]
         
+        self.topic_responses = {
+            "stress": "Я понимаю, что вы испытываете стресс. Рекомендую практиковать техники релаксации: глубокое дыхание, медитацию или прогулки на природе. Важно найти время для отдыха и восстановления.",
+            "anxiety": "Тревога - это нормальная реакция на неопределенность. Попробуйте техники заземления: сосредоточьтесь на дыхании, обратите внимание на то, что видите, слышите, чувствуете. Помните, что тревога временна.",
+            "loneliness": "Чувство одиночества знакомо многим. Попробуйте найти способы связи с другими: хобби, группы по интересам, волонтерство. Помните, что вы не одиноки в своих чувствах.",
+            "anger": "Злость - это естественная эмоция. Важно выражать ее конструктивно. Попробуйте физическую активность, письмо или разговор с понимающим человеком. Найдите здоровые способы выражения эмоций.",
+        }
+        
+        # Ключевые слова сравниваются по основам, поэтому находятся любые их формы
+        self.consultation_matcher = StemMatcher(CONSULTATION_TOPICS)
+        self.analyzer = AnswerAnalyzer()
+        
         self.map_templates = {
             "emotional_state": [
                 "Эмоциональное состояние: {analysis}",
@@ -61,23 +103,13 @@ class LocalResponseSystem:
     def get_consultation_response(self, question: str) -> str:
         """Возвращает локальный ответ на консультацию"""
         # Простой анализ ключевых слов для более релевантных ответов
-        question_lower = question.lower()
-        
-        if any(word in question_lower for word in ['стресс', 'устал', 'утомлен', 'напряжен']):
-            return "Я понимаю, что вы испытываете стресс. Рекомендую практиковать техники релаксации: глубокое дыхание, медитацию или прогулки на природе. Важно найти время для отдыха и восстановления."
-        
-        elif any(word in question_lower for word in ['тревож', 'беспоко', 'волну']):
-            return "Тревога - это нормальная реакция на неопределенность. Попробуйте техники заземления: сосредоточьтесь на дыхании, обратите внимание на то, что видите, слышите, чувствуете. Помните, что тревога временна."
-        
-        elif any(word in question_lower for word in ['одинок', 'непонят', 'отвергнут']):
-            return "Чувство одиночества знакомо многим. Попробуйте найти способы связи с другими: хобби, группы по интересам, волонтерство. Помните, что вы не одиноки в своих чувствах."
+        topics = self.consultation_matcher.categories(question)
+        for topic in CONSULTATION_TOPICS:
+            if topic in topics:
+                return self.topic_responses[topic]
         
-        elif any(word in question_lower for word in ['злость', 'раздражен', 'сердит']):
-            return "Злость - это естественная эмоция. Важно выражать ее конструктивно. Попробуйте физическую активность, письмо или разговор с понимающим человеком. Найдите здоровые способы выражения эмоций."
-        
-        else:
-            # Возвращаем случайный общий ответ
-            return random.choice(self.consultation_responses)
+        # Возвращаем случайный общий ответ
+        return random.choice(self.consultation_responses)
     
     def get_psychological_consultation(self, question: str) -> str:
         return self.get_consultation_response(question)
@@ -108,48 +140,9 @@ class LocalResponseSystem:
         return map_text.strip()
     
     def _analyze_answers(self, answers: List[str], questions: List[str]) -> str:
-        """Простой анализ ответов"""
-        analysis_parts = []
-        
-        # Анализ эмоционального состояния
-        emotional_keywords = ['хорошо', 'плохо', 'грустно', 'радостно', 'спокойно', 'волнуюсь', 'устал']
-        emotional_count = sum(1 for answer in answers if any(word in answer.lower() for word in emotional_keywords))
-        
-        if emotional_count > len(answers) / 2:
-            analysis_parts.append("Эмоциональное состояние: В целом позитивное, с некоторыми колебаниями настроения.")
-        else:
-            analysis_parts.append("Эмоциональное состояние: Требует внимания, возможны признаки стресса или тревоги.")
-        
-        # Анализ социальных предпочтений
-        social_keywords = ['люди', 'друзья', 'общение', 'компания', 'один']
-        social_count = sum(1 for answer in answers if any(word in answer.lower() for word in social_keywords))
-        
-        if social_count > len(answers) / 2:
-            analysis_parts.append("Социальная активность: Вы цените общение и связи с людьми.")
-        else:
-            analysis_parts.append("Социальная активность: Вы предпочитаете уединение и внутреннюю работу.")
-        
-        # Анализ активности
-        active_keywords = ['движение', 'спорт', 'активность', 'работа', 'занятия']
-        active_count = sum(1 for answer in answers if any(word in answer.lower() for word in active_keywords))
-        
-        if active_count > len(answers) / 2:
-            analysis_parts.append("Уровень активности: Вы ведете активный образ жизни.")
-        else:
-            analysis_parts.append("Уровень активности: Вы предпочитаете спокойный, размеренный ритм жизни.")
-        
-        return "\n".join(analysis_parts)
+        """Анализ ответов по измерениям из config.ANALYSIS_DIMENSIONS"""
+        return "\n".join(self.analyzer.describe(self.analyzer.score(answers)))
     
     def moderate_content(self, content: str) -> Dict[str, Any]:
         """Локальная модерация контента"""
-        # Простая проверка на опасный контент
-        dangerous_keywords = ['самоубийство', 'убить', 'умереть', 'больно', 'ненавижу себя']
-        
-        is_safe = not any(word in content.lower() for word in dangerous_keywords)
-        
-        return {
-            "is_safe": is_safe,
-            "risk_level": "high" if not is_safe else "low",
-            "concerns": [] if is_safe else ["Обнаружен потенциально опасный контент"],
-            "recommendation": "Контент прошел проверку" if is_safe else "Рекомендуется профессиональная помощь"
-        } 
\ No newline at end of file
+        return moderate_content(content)
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Кэш сгенерированных психологических карт.
+
+Ключ — хэш карты, типа анкеты и нормализованных ответов: регистр, "ё",
+пунктуация и лишние пробелы не учитываются, поэтому повторная отправка тех же
+ответов (после "🔙 Назад" или отклонения карты) находит готовый текст без
+повторного анализа. Кэш ограничен MAP_CACHE_SIZE записями (вытесняются
+давно не использованные) и при заданном MAP_CACHE_FILE сохраняется при
+остановке бота. Счетчики попаданий и времени получения текста — в stats().
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from config import MAP_CACHE_SIZE, MAP_CACHE_FILE
+from keyword_matcher import WORD
+
+def normalize_answer(answer: str) -> str:
+    """Слова ответа в нижнем регистре через пробел"""
+    return " ".join(WORD.findall(answer.lower().replace("ё", "е")))
+
+def map_key(map_id: Any, map_type: str, answers: List[str]) -> str:
+    payload = json.dumps([map_id, map_type, [normalize_answer(answer) for answer in answers]], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class MapCache:
+    def __init__(self, max_entries: int = MAP_CACHE_SIZE, state_file: Optional[str] = None):
+        self.max_entries = max_entries
+        self.state_file = state_file
+        # ключ -> [текст карты, идентификатор первой карты с этими ответами]
+        self._entries: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+        if state_file:
+            self.load()
+    
+    @classmethod
+    def from_config(cls) -> "MapCache":
+        return cls(MAP_CACHE_SIZE, MAP_CACHE_FILE)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str) -> Optional[List[Any]]:
+        """Возвращает [текст, идентификатор карты] или None"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+    
+    def put(self, key: str, map_text: str, map_id: Optional[str] = None):
+        self._entries[key] = [map_text, map_id]
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def observe(self, hit: bool, seconds: float):
+        """Учитывает одно получение текста карты: из кэша или генерацией"""
+        if hit:
+            self.hits += 1
+            self.hit_seconds += seconds
+        else:
+            self.misses += 1
+            self.miss_seconds += seconds
+    
+    def stats(self) -> Dict[str, float]:
+        """Доля попаданий и среднее время получения текста (секунды)"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "hit_latency": self.hit_seconds / self.hits if self.hits else 0.0,
+            "miss_latency": self.miss_seconds / self.misses if self.misses else 0.0,
+        }
+    
+    def load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return
+        for key, map_text, map_id in items:
+            self.put(key, map_text, map_id)
+    
+    def save(self):
+        """Сохраняет кэш в порядке использования, чтобы он пережил перезапуск"""
+        if not self.state_file:
+            return
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump([[key, *entry] for key, entry in self._entries.items()], f, ensure_ascii=False)
+        os.replace(tmp_file, self.state_file)
\ No newline at end of file
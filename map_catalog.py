@@ -0,0 +1,83 @@
+"""
+Каталог психологических карт, собранный один раз при импорте.
+
+Кнопки выбора карты и типа анкеты находятся по точному тексту за O(1),
+клавиатуры построены заранее. В user_data хранится только идентификатор
+карты и название типа анкеты; вопросы берутся из PSYCHOLOGICAL_MAPS_BY_ID
+при обращении, а не копируются каждому пользователю.
+"""
+
+from types import MappingProxyType
+from typing import Any, List, Mapping, Optional, Tuple
+from telegram import ReplyKeyboardMarkup
+from psychological_maps import PSYCHOLOGICAL_MAPS, PSYCHOLOGICAL_MAPS_BY_ID
+
+NAVIGATION_ROW = ["🔙 Назад", "🏠 Главное меню"]
+
+class _Frozen:
+    """Запрещает изменять атрибуты после создания"""
+    __slots__ = ()
+    
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+    
+    def __delattr__(self, name: str):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+class MapType(_Frozen):
+    """Тип анкеты: ключ списка вопросов в PSYCHOLOGICAL_MAPS, название и кнопка"""
+    __slots__ = ("key", "name", "button")
+    
+    def __init__(self, key: str, name: str, button: str):
+        object.__setattr__(self, "key", key)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "button", button)
+
+class MapEntry(_Frozen):
+    __slots__ = ("id", "name", "description", "button")
+    
+    def __init__(self, map_id: int, name: str, description: str, button: str):
+        object.__setattr__(self, "id", map_id)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "description", description)
+        object.__setattr__(self, "button", button)
+    
+    def questions(self, map_type: MapType) -> List[str]:
+        """Вопросы анкеты (общий список из PSYCHOLOGICAL_MAPS_BY_ID, не копия)"""
+        return PSYCHOLOGICAL_MAPS_BY_ID[self.id][map_type.key]
+
+MAP_TYPES: Tuple[MapType, ...] = (
+    MapType("basic", "Базовая", "Базовая анкета (4 вопроса)"),
+    MapType("extended", "Расширенная", "Расширенная анкета (10 вопросов)"),
+)
+
+MAPS: Tuple[MapEntry, ...] = tuple(
+    MapEntry(m["id"], m["name"], m["description"], f"{i + 1}. {m['name']}")
+    for i, m in enumerate(PSYCHOLOGICAL_MAPS)
+)
+
+MAPS_BY_ID: Mapping[int, MapEntry] = MappingProxyType({entry.id: entry for entry in MAPS})
+MAP_TYPES_BY_NAME: Mapping[str, MapType] = MappingProxyType({map_type.name: map_type for map_type in MAP_TYPES})
+
+# Текст кнопки (и просто номер карты или название типа, набранные вручную) -> элемент каталога
+MAPS_BY_BUTTON: Mapping[str, MapEntry] = MappingProxyType({
+    **{str(i + 1): entry for i, entry in enumerate(MAPS)},
+    **{entry.button: entry for entry in MAPS},
+})
+MAP_TYPES_BY_BUTTON: Mapping[str, MapType] = MappingProxyType({
+    **MAP_TYPES_BY_NAME,
+    **{map_type.button: map_type for map_type in MAP_TYPES},
+})
+
+MAP_SELECT_KEYBOARD = ReplyKeyboardMarkup(
+    [[entry.button] for entry in MAPS] + [NAVIGATION_ROW], resize_keyboard=True
+)
+MAP_TYPE_KEYBOARD = ReplyKeyboardMarkup(
+    [[map_type.button] for map_type in MAP_TYPES] + [NAVIGATION_ROW], resize_keyboard=True
+)
+
+def find_map(text: str) -> Optional[MapEntry]:
+    return MAPS_BY_BUTTON.get(text.strip())
+
+def find_map_type(text: str) -> Optional[MapType]:
+    return MAP_TYPES_BY_BUTTON.get(text.strip())
\ No newline at end of file
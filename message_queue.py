@@ -0,0 +1,363 @@
+"""
+Очередь исходящих сообщений с учетом лимитов Telegram.
+
+Уведомления администраторам ставятся в очередь и отправляются в фоне,
+не задерживая ответ пользователю. Отправка ограничена двумя токен-бакетами:
+на каждый чат (SEND_PER_CHAT_RATE, по умолчанию 1 сообщение/с) и общим
+(SEND_GLOBAL_RATE, 30 сообщений/с). Сообщения в один чат уходят по порядку,
+разные чаты обслуживаются параллельно. При RetryAfter чат откладывается на
+указанное Telegram время, сетевые ошибки повторяются с экспоненциальной паузой.
+Срочные сообщения (urgent=True, например о кризисном состоянии пользователя)
+встают в очередь чата перед обычными.
+
+AdminDigest ограничивает поток уведомлений администраторам: первые
+ADMIN_DIGEST_IMMEDIATE уведомлений за интервал уходят сразу, остальные
+копятся и отправляются одной сводкой в конце интервала.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import re
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from telegram.error import Forbidden, BadRequest, NetworkError, RetryAfter
+from config import (
+    ADMIN_IDS, SEND_PER_CHAT_RATE, SEND_GLOBAL_RATE, SEND_MAX_CONCURRENCY, SEND_MAX_RETRIES,
+    SEND_STOP_TIMEOUT, SEND_STOP_MAX_TIMEOUT,
+    ADMIN_DIGEST_INTERVAL, ADMIN_DIGEST_IMMEDIATE, ADMIN_DIGEST_MAX_ITEMS
+)
+
+# Максимальная длина текста сообщения в Telegram
+MESSAGE_MAX_LENGTH = 4096
+
+# Оборванный в конце текста тег или HTML-сущность и теги разметки
+_PARTIAL_HTML = re.compile(r"<[^>]*$|&[^;\s]*$")
+_HTML_TAG = re.compile(r"<(/?)([a-z]+)[^>]*>")
+
+def truncate_html(text: str, limit: int) -> str:
+    """Обрезает текст с HTML-разметкой до limit символов: оборванный тег или
+    сущность отбрасываются, незакрытые теги закрываются"""
+    if len(text) <= limit:
+        return text
+    suffix = "…"
+    # Запас под закрывающие теги (<b>, <i>, <code> — несколько десятков символов)
+    cut = _PARTIAL_HTML.sub("", text[:limit - len(suffix) - 32])
+    open_tags: List[str] = []
+    for closing, name in _HTML_TAG.findall(cut):
+        if not closing:
+            open_tags.append(name)
+        elif open_tags and open_tags[-1] == name:
+            open_tags.pop()
+    return cut + suffix + "".join(f"</{name}>" for name in reversed(open_tags))
+
+class TokenBucket:
+    """Токен-бакет с резервированием: reserve() списывает токен и возвращает,
+    сколько секунд нужно подождать до момента, когда он действительно доступен"""
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+    
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    def reserve(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class OutgoingMessage:
+    __slots__ = ("chat_id", "text", "kwargs", "attempt", "urgent")
+    
+    def __init__(self, chat_id: int, text: str, kwargs: Dict[str, Any], urgent: bool = False):
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.attempt = 0
+        self.urgent = urgent
+
+class ChatQueue:
+    """Очередь сообщений одного чата: срочные уходят раньше обычных"""
+    __slots__ = ("urgent", "normal")
+    
+    def __init__(self):
+        self.urgent: Deque[OutgoingMessage] = deque()
+        self.normal: Deque[OutgoingMessage] = deque()
+    
+    def __len__(self) -> int:
+        return len(self.urgent) + len(self.normal)
+    
+    def append(self, message: OutgoingMessage):
+        (self.urgent if message.urgent else self.normal).append(message)
+    
+    def appendleft(self, message: OutgoingMessage):
+        """Возвращает сообщение в начало его очереди (повторная отправка)"""
+        (self.urgent if message.urgent else self.normal).appendleft(message)
+    
+    def popleft(self) -> OutgoingMessage:
+        return self.urgent.popleft() if self.urgent else self.normal.popleft()
+
+class MessageScheduler:
+    def __init__(self, per_chat_rate: float = SEND_PER_CHAT_RATE, global_rate: float = SEND_GLOBAL_RATE,
+                 max_concurrency: int = SEND_MAX_CONCURRENCY, max_retries: int = SEND_MAX_RETRIES):
+        self.per_chat_interval = 1.0 / per_chat_rate
+        self.global_rate = global_rate
+        self.max_retries = max_retries
+        self._global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self._max_concurrency = max_concurrency
+        self._bot = None
+        self._chats: Dict[int, ChatQueue] = {}
+        self._next_send: Dict[int, float] = {}
+        self._ready: List[Tuple[float, int, int]] = []
+        self._scheduled: Set[int] = set()
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+    
+    def start(self, bot):
+        """Запускает отправку (вызывается из post_init)"""
+        if self._dispatcher is not None:
+            return
+        self._bot = bot
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self._max_concurrency)
+        self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch_loop())
+    
+    async def stop(self, timeout: float = SEND_STOP_TIMEOUT, max_timeout: float = SEND_STOP_MAX_TIMEOUT):
+        """Дожидается отправки очереди и останавливает отправку.
+        Ожидание — расчетное время разбора очереди плюс timeout, но не дольше max_timeout"""
+        if self._dispatcher is None:
+            return
+        deadline = time.monotonic() + min(max_timeout, self.drain_time() + timeout)
+        while (self.queue_depth or self._in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self.queue_depth:
+            logging.warning(f"Message queue stopped with {self.queue_depth} unsent messages")
+        self._dispatcher.cancel()
+        for task in list(self._in_flight):
+            task.cancel()
+        await asyncio.gather(self._dispatcher, *self._in_flight, return_exceptions=True)
+        self._dispatcher = None
+    
+    def drain_time(self) -> float:
+        """Сколько секунд займет отправка всех сообщений очереди при текущих лимитах"""
+        now = time.monotonic()
+        per_chat = max(
+            (max(0.0, self._next_send.get(chat_id, 0.0) - now) + (len(queue) - 1) * self.per_chat_interval
+             for chat_id, queue in self._chats.items() if queue),
+            default=0.0
+        )
+        return max(per_chat, self.queue_depth / self.global_rate)
+    
+    @property
+    def queue_depth(self) -> int:
+        """Количество сообщений, ожидающих отправки"""
+        return sum(len(queue) for queue in self._chats.values())
+    
+    def stats(self) -> Dict[str, int]:
+        """Метрики очереди"""
+        return {
+            "queue_depth": self.queue_depth,
+            "waiting_chats": len(self._chats),
+            "in_flight": len(self._in_flight),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+    
+    def send(self, chat_id: int, text: str, urgent: bool = False, **kwargs):
+        """Ставит сообщение в очередь; не ждет отправки.
+        Срочное сообщение уйдет раньше всех обычных сообщений этого чата"""
+        self._chats.setdefault(chat_id, ChatQueue()).append(OutgoingMessage(chat_id, text, kwargs, urgent))
+        self._schedule(chat_id)
+    
+    def notify_admins(self, text: str, urgent: bool = False, **kwargs):
+        """Ставит в очередь сообщение каждому администратору"""
+        for admin_id in ADMIN_IDS:
+            self.send(admin_id, text, urgent=urgent, **kwargs)
+    
+    def _schedule(self, chat_id: int, not_before: float = 0.0):
+        if chat_id in self._scheduled:
+            return
+        ready_time = max(not_before, self._next_send.get(chat_id, 0.0))
+        heapq.heappush(self._ready, (ready_time, next(self._seq), chat_id))
+        self._scheduled.add(chat_id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    async def _wait(self, timeout: Optional[float]):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    
+    async def _dispatch_loop(self):
+        while True:
+            if not self._ready:
+                await self._wait(None)
+                continue
+            ready_time, _, chat_id = self._ready[0]
+            now = time.monotonic()
+            if ready_time > now:
+                await self._wait(ready_time - now)
+                continue
+            heapq.heappop(self._ready)
+            self._scheduled.discard(chat_id)
+            if self._next_send.get(chat_id, 0.0) > now:
+                # Чат отложен из-за RetryAfter, пока запись ждала в куче
+                self._schedule(chat_id)
+                continue
+            queue = self._chats.get(chat_id)
+            if not queue:
+                self._chats.pop(chat_id, None)
+                continue
+            delay = self._global_bucket.reserve(now)
+            if delay:
+                await asyncio.sleep(delay)
+            await self._slots.acquire()
+            message = queue.popleft()
+            if not queue:
+                del self._chats[chat_id]
+            self._next_send[chat_id] = time.monotonic() + self.per_chat_interval
+            if chat_id in self._chats:
+                self._schedule(chat_id)
+            task = asyncio.get_running_loop().create_task(self._deliver(message))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            self._forget_idle_chats()
+    
+    def _forget_idle_chats(self):
+        # Время следующей отправки нужно хранить только для чатов, которым еще рано писать
+        if len(self._next_send) > 10000:
+            now = time.monotonic()
+            self._next_send = {chat_id: t for chat_id, t in self._next_send.items() if t > now}
+    
+    def _requeue(self, message: OutgoingMessage, delay: float):
+        self._next_send[message.chat_id] = time.monotonic() + delay
+        self._chats.setdefault(message.chat_id, ChatQueue()).appendleft(message)
+        self._schedule(message.chat_id)
+    
+    async def _deliver(self, message: OutgoingMessage):
+        try:
+            await self._bot.send_message(chat_id=message.chat_id, text=message.text, **message.kwargs)
+            self.sent += 1
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            logging.warning(f"Flood limit for chat {message.chat_id}, retry in {retry_after} s")
+            self.retried += 1
+            self._requeue(message, float(retry_after))
+        except (Forbidden, BadRequest) as e:
+            self.failed += 1
+            logging.error(f"Error sending message to {message.chat_id}: {e}")
+        except NetworkError as e:
+            message.attempt += 1
+            if message.attempt > self.max_retries:
+                self.failed += 1
+                logging.error(f"Giving up sending message to {message.chat_id}: {e}")
+            else:
+                self.retried += 1
+                self._requeue(message, min(60.0, 2.0 ** message.attempt))
+        except Exception as e:
+            self.failed += 1
+            logging.error(f"Error sending message to {message.chat_id}: {e}")
+        finally:
+            self._slots.release()
+
+_shared_scheduler = None
+
+def get_send_queue() -> MessageScheduler:
+    """Возвращает общую для процесса очередь исходящих сообщений: бот и админ-панель
+    в одном процессе (run_all.py) делят глобальный лимит Telegram"""
+    global _shared_scheduler
+    if _shared_scheduler is None:
+        _shared_scheduler = MessageScheduler()
+    return _shared_scheduler
+
+class AdminDigest:
+    """Сводки для администраторов: не больше ADMIN_DIGEST_IMMEDIATE + 1 сообщений
+    каждому админу за интервал при любом потоке пользовательских сообщений"""
+    
+    SEPARATOR = "\n\n➖➖➖\n\n"
+    # Запас под заголовок и подвал сводки
+    RESERVE = 200
+    # Уведомление длиннее обрезается, чтобы сводка из одного уведомления поместилась в сообщение
+    ITEM_MAX_LENGTH = MESSAGE_MAX_LENGTH - RESERVE - len(SEPARATOR)
+    
+    def __init__(self, scheduler: MessageScheduler, interval: float = ADMIN_DIGEST_INTERVAL,
+                 immediate_limit: int = ADMIN_DIGEST_IMMEDIATE, max_items: int = ADMIN_DIGEST_MAX_ITEMS):
+        self.scheduler = scheduler
+        self.interval = interval
+        self.immediate_limit = immediate_limit
+        self._buffer: Deque[str] = deque(maxlen=max_items)
+        self._sent_in_window = 0
+        self._dropped = 0
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Запускает отправку сводок (вызывается из post_init)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+    
+    async def stop(self):
+        """Отправляет все накопленное и останавливает сводки (вызывается из post_shutdown)"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self._buffer:
+            self._send_digest()
+    
+    def add(self, text: str):
+        """Добавляет уведомление (HTML) для всех администраторов"""
+        text = truncate_html(text, self.ITEM_MAX_LENGTH)
+        if not self._buffer and self._sent_in_window < self.immediate_limit:
+            self._sent_in_window += 1
+            self.scheduler.notify_admins(text, parse_mode='HTML')
+            return
+        if len(self._buffer) == self._buffer.maxlen:
+            self._dropped += 1
+        self._buffer.append(text)
+    
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self._sent_in_window = 0
+            if self._buffer:
+                self._sent_in_window = 1
+                self._send_digest()
+    
+    def _send_digest(self):
+        """Отправляет одну сводку из стольких уведомлений, сколько помещается в сообщение;
+        остальные ждут следующего интервала"""
+        separator = self.SEPARATOR
+        parts = []
+        length = self.RESERVE
+        while self._buffer and (not parts or length + len(separator) + len(self._buffer[0]) <= MESSAGE_MAX_LENGTH):
+            item = self._buffer.popleft()
+            parts.append(item)
+            length += len(separator) + len(item)
+        header = f"📬 <b>Сводка: {len(parts)} уведомл.</b>"
+        footer = []
+        if self._buffer:
+            footer.append(f"Еще в очереди: {len(self._buffer)}")
+        if self._dropped:
+            footer.append(f"Пропущено из-за переполнения: {self._dropped}")
+            self._dropped = 0
+        text = header + separator + separator.join(parts)
+        if footer:
+            text += "\n\n<i>" + "; ".join(footer) + "</i>"
+        self.scheduler.notify_admins(text, parse_mode='HTML')
\ No newline at end of file
@@ -0,0 +1,246 @@
+"""
+Метрики в формате Prometheus: время обработчиков, записи базы, генерации
+и запросов к Bot API.
+
+Сбор включается переменной METRICS_PORT. При METRICS_PORT=0 (по умолчанию)
+декоратор handler возвращает обработчик без изменений, а остальные вызовы
+сразу выходят, поэтому выключенные метрики почти ничего не стоят.
+Включенные метрики отдаются по GET http://METRICS_HOST:METRICS_PORT/metrics;
+значения копятся в памяти процесса, и запрос только выводит их.
+Замер накладных расходов: python3 benchmarks/metrics_overhead.py
+"""
+
+import bisect
+import functools
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+from telegram.request import HTTPXRequest
+from config import METRICS_HOST, METRICS_PORT
+
+ENABLED = METRICS_PORT > 0
+
+# Границы корзин гистограмм времени, с (как в клиентах Prometheus)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_REGISTRY: List["_Metric"] = []
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class _Metric:
+    kind = ""
+    
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+    
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+    
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    """Счетчик: значения по набору меток только растут"""
+    kind = "counter"
+    
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, *labels: str, amount: float = 1):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, labels)} {_number(value)}" for labels, value in values]
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+    
+    def __init__(self, histogram: "Histogram", labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+class Histogram(_Metric):
+    """Гистограмма: число значений по корзинам, их сумма и количество"""
+    kind = "histogram"
+    
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # Метки -> [число значений в каждой корзине (последняя — +Inf), сумма]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+    
+    def observe(self, value: float, *labels: str):
+        if not ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+    
+    def time(self, *labels: str):
+        """Контекстный менеджер: записывает время выполнения блока"""
+        if not ENABLED:
+            return nullcontext()
+        return _Timer(self, labels)
+    
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        lines = []
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = _labels(self.label_names, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+class Gauge(_Metric):
+    """Текущее значение, которое вычисляется функцией при каждом запросе метрик"""
+    kind = "gauge"
+    
+    def __init__(self, name: str, help: str, func: Callable[[], float]):
+        super().__init__(name, help)
+        self.func = func
+    
+    def samples(self) -> List[str]:
+        try:
+            return [f"{self.name} {_number(self.func())}"]
+        except Exception as e:
+            logging.warning(f"Metric {self.name} is unavailable: {e}")
+            return []
+
+HANDLER_SECONDS = Histogram("bot_handler_duration_seconds", "Время выполнения обработчика", ["handler"])
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Исключения в обработчиках", ["handler"])
+DB_WRITE_SECONDS = Histogram("bot_db_write_duration_seconds", "Время записи базы (снимок или журнал)", ["kind"])
+DB_WRITE_BYTES = Counter("bot_db_write_bytes_total", "Байт записано в файлы базы", ["kind"])
+GENERATION_SECONDS = Histogram(
+    "bot_generation_duration_seconds", "Время генерации с ожиданием в очереди пула", ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+GENERATION_REJECTED = Counter("bot_generation_rejected_total", "Задачи, отклоненные из-за заполненной очереди", ["task"])
+BOT_API_SECONDS = Histogram("bot_api_request_duration_seconds", "Время запроса к Bot API", ["method"])
+BOT_API_ERRORS = Counter("bot_api_request_errors_total", "Запросы к Bot API, завершившиеся ошибкой", ["method"])
+
+def handler(func: Callable) -> Callable:
+    """Декоратор обработчика: время выполнения и исключения с меткой handler=<имя функции>"""
+    if not ENABLED:
+        return func
+    name = func.__name__
+    
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, name)
+    
+    return wrapper
+
+class BotApiRequest(HTTPXRequest):
+    """HTTPXRequest, который записывает время и ошибки каждого запроса к Bot API"""
+    __slots__ = ()
+    
+    async def do_request(self, url: str, *args, **kwargs):
+        method = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            return await super().do_request(url, *args, **kwargs)
+        except Exception:
+            BOT_API_ERRORS.inc(method)
+            raise
+        finally:
+            BOT_API_SECONDS.observe(time.perf_counter() - started, method)
+
+def bot_request(**kwargs) -> HTTPXRequest:
+    """Объект запросов для ApplicationBuilder.request (с замерами, если метрики включены)"""
+    return BotApiRequest(**kwargs) if ENABLED else HTTPXRequest(**kwargs)
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus"""
+    return "\n".join(metric.render() for metric in _REGISTRY) + "\n"
+
+_runner = None
+
+async def start(application=None, host: str = METRICS_HOST, port: int = METRICS_PORT):
+    """Запускает HTTP-эндпоинт /metrics (вызывается из post_init)"""
+    global _runner
+    if not ENABLED or _runner is not None:
+        return
+    from aiohttp import web
+    
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(text=render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+    
+    if application is not None and not any(metric.name == "bot_update_queue_size" for metric in _REGISTRY):
+        Gauge("bot_update_queue_size", "Обновления, ожидающие обработки", application.update_queue.qsize)
+    web_app = web.Application()
+    web_app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(web_app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        # Например, бот и админ-панель запущены отдельно с одним METRICS_PORT
+        logging.warning(f"Metrics endpoint is not started on {host}:{port}: {e}")
+        await runner.cleanup()
+        return
+    _runner = runner
+    logging.info(f"Metrics are served on http://{host}:{port}/metrics")
+
+async def stop():
+    """Останавливает HTTP-эндпоинт (вызывается из post_shutdown)"""
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""
+Проверка каждого входящего текста на признаки кризисного состояния.
+
+ModerationStage регистрируется как TypeHandler в группе MODERATION_GROUP,
+то есть выполняется раньше обработчиков диалога, и не прерывает обработку
+сообщения. Текст проверяется local_responses.moderate_content (словарь
+разобран заранее). Сообщение с высоким риском сразу уходит администраторам
+срочным сообщением, в обход сводок AdminDigest и перед обычными
+уведомлениями. Срочные оповещения об одном пользователе ограничены
+RATE_LIMIT_CRISIS_ALERT; сверх лимита они идут в обычную сводку.
+Замер задержки: python3 benchmarks/moderation_benchmark.py
+"""
+
+import html
+from typing import Dict
+from telegram import Update
+from telegram.ext import ContextTypes
+from local_responses import moderate_content
+from message_queue import AdminDigest, MessageScheduler
+from rate_limit import RateLimits
+
+# Группа обработчиков, которая выполняется раньше всех (меньший номер — раньше)
+MODERATION_GROUP = -1
+
+# Сколько символов сообщения показывать администраторам
+ALERT_TEXT_LIMIT = 1000
+
+class ModerationStage:
+    def __init__(self, scheduler: MessageScheduler, digest: AdminDigest, rate_limits: RateLimits):
+        self.scheduler = scheduler
+        self.digest = digest
+        self.rate_limits = rate_limits
+        self.checked = 0
+        self.flagged = 0
+    
+    def stats(self) -> Dict[str, int]:
+        return {"checked": self.checked, "flagged": self.flagged}
+    
+    async def __call__(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        message = update.effective_message
+        text = message and (message.text or message.caption)
+        if not text:
+            return
+        self.checked += 1
+        result = moderate_content(text)
+        if result["is_safe"]:
+            return
+        self.flagged += 1
+        user = update.effective_user
+        user_id = user.id if user else None
+        if len(text) > ALERT_TEXT_LIMIT:
+            text = text[:ALERT_TEXT_LIMIT] + "…"
+        alert = (
+            f"🚨 <b>Возможное кризисное состояние</b>\n"
+            f"ID: <code>{user_id}</code>\n"
+            f"Ник: @{html.escape(user.username or '-') if user else '-'}\n"
+            f"Слова: {html.escape(', '.join(result['keywords']))}\n\n"
+            f"{html.escape(text)}"
+        )
+        if user_id is None or not self.rate_limits.hit("crisis_alert", user_id):
+            self.scheduler.notify_admins(alert, urgent=True, parse_mode='HTML')
+        else:
+            self.digest.add(alert)
\ No newline at end of file
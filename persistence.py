@@ -0,0 +1,148 @@
+"""
+Сохранение состояния диалогов в базе данных бота.
+
+DatabasePersistence хранит context.user_data и состояния ConversationHandler
+в записи пользователя (поля context_data и conversations), поэтому после
+перезапуска пользователь продолжает анкету с того же вопроса. Application
+сохраняет только изменившихся пользователей раз в PERSISTENCE_UPDATE_INTERVAL
+секунд и при остановке. Изменения всех пользователей за один проход
+сохранения копятся в памяти и записываются в хранилище одним вызовом
+set_users_data: в режиме json — одна перезапись базы, в wal — одна запись
+журнала, в sqlite — одна транзакция.
+Сессия анкеты (session.UserSession) записывается в упакованном виде.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+from telegram.ext import BasePersistence, PersistenceInput
+from config import PERSISTENCE_UPDATE_INTERVAL
+from session import decode_user_data, encode_user_data
+
+CONTEXT_FIELD = "context_data"
+CONVERSATIONS_FIELD = "conversations"
+
+def _encode_key(key: tuple) -> str:
+    return ",".join(str(part) for part in key)
+
+def _decode_key(key: str) -> tuple:
+    return tuple(int(part) for part in key.split(","))
+
+class DatabasePersistence(BasePersistence):
+    """BasePersistence поверх Database/SqliteDatabase: хранятся только user_data и диалоги"""
+    
+    def __init__(self, db, update_interval: float = PERSISTENCE_UPDATE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.db = db
+        # Состояния диалогов по пользователям: {user_id: {имя: {ключ: состояние}}}
+        self._conversations: Optional[Dict[int, Dict[str, Dict[str, Any]]]] = None
+        # Изменения текущего прохода сохранения: {user_id: {поле: значение}}
+        self._changes: Dict[int, Dict[str, Any]] = {}
+        self._write_scheduled = False
+    
+    def _set(self, user_id: int, field: str, value: Any):
+        self._changes.setdefault(user_id, {})[field] = value
+        if not self._write_scheduled:
+            self._write_scheduled = True
+            # Application.update_persistence запускает update_* всех пользователей
+            # одновременно (asyncio.gather), и ни один из них не ждет: запись,
+            # поставленная в очередь цикла первым, выполняется после всех
+            asyncio.get_running_loop().call_soon(self._write_changes)
+    
+    def _write_changes(self):
+        self._write_scheduled = False
+        changes, self._changes = self._changes, {}
+        if not changes:
+            return
+        try:
+            self.db.set_users_data(changes)
+        except Exception as e:
+            logging.error(f"Error saving conversations of {len(changes)} users: {e}")
+            # Изменения остаются до следующей записи; более новые значения важнее
+            for user_id, fields in changes.items():
+                self._changes[user_id] = {**fields, **self._changes.get(user_id, {})}
+    
+    def _load_conversations(self) -> Dict[int, Dict[str, Dict[str, Any]]]:
+        if self._conversations is None:
+            self._conversations = {
+                user_id: data[CONVERSATIONS_FIELD]
+                for user_id, data in self.db.get_all_users().items()
+                if data.get(CONVERSATIONS_FIELD)
+            }
+        return self._conversations
+    
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {
+            user_id: decode_user_data(data[CONTEXT_FIELD])
+            for user_id, data in self.db.get_all_users().items()
+            if data.get(CONTEXT_FIELD) is not None
+        }
+    
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        self._set(user_id, CONTEXT_FIELD, encode_user_data(data))
+    
+    async def drop_user_data(self, user_id: int) -> None:
+        self._set(user_id, CONTEXT_FIELD, None)
+    
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        pass
+    
+    async def get_conversations(self, name: str) -> Dict[tuple, object]:
+        conversations = {}
+        for user_conversations in self._load_conversations().values():
+            for key, state in user_conversations.get(name, {}).items():
+                conversations[_decode_key(key)] = state
+        return conversations
+    
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        # Ключ диалога по умолчанию (chat_id, user_id): состояние хранится у пользователя
+        user_id = key[-1]
+        user_conversations = self._load_conversations().setdefault(user_id, {})
+        states = user_conversations.setdefault(name, {})
+        encoded = _encode_key(key)
+        if new_state is None:
+            if states.pop(encoded, None) is None:
+                return
+        elif states.get(encoded) == new_state:
+            return
+        else:
+            states[encoded] = new_state
+        self._set(
+            user_id, CONVERSATIONS_FIELD,
+            {conversation: dict(conversation_states) for conversation, conversation_states in user_conversations.items()}
+        )
+    
+    async def flush(self) -> None:
+        self._write_changes()
+        self.db.flush()
+    
+    # Данные чатов, бота и callback_data не используются
+    async def get_chat_data(self) -> Dict[int, Any]:
+        return {}
+    
+    async def update_chat_data(self, chat_id: int, data: Any) -> None:
+        pass
+    
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+    
+    async def refresh_chat_data(self, chat_id: int, chat_data: Any) -> None:
+        pass
+    
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+    
+    async def update_bot_data(self, data: Any) -> None:
+        pass
+    
+    async def refresh_bot_data(self, bot_data: Any) -> None:
+        pass
+    
+    async def get_callback_data(self) -> None:
+        return None
+    
+    async def update_callback_data(self, data: Any) -> None:
+        pass
\ No newline at end of file
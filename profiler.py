@@ -0,0 +1,109 @@
+"""
+Выборочный профилировщик для работающего бота (команда /profile админ-панели).
+
+SamplingProfiler раз в PROFILE_INTERVAL секунд снимает стеки всех потоков
+процесса (sys._current_frames): цикла событий, пула генерации и прочих — и
+считает одинаковые стеки. Бот не нужно перезапускать, а когда замер не идет,
+профилировщик ничего не стоит. Результат — collapsed stacks, по строке на стек:
+"поток;функция (файл:строка);... число_выборок"; такой файл принимают
+flamegraph.pl, speedscope и inferno.
+
+Выборки берутся по времени, а не по процессору: поток, который ждет
+(например, цикл событий в select), тоже попадает в профиль своим стеком
+ожидания. Замер накладных расходов: python3 benchmarks/profiler_overhead.py
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+from config import PROFILE_INTERVAL
+
+# Глубже стек обрезается: для flamegraph важны верхние кадры
+MAX_DEPTH = 128
+
+class ProfilerBusy(Exception):
+    """Замер уже идет"""
+
+class SamplingProfiler:
+    def __init__(self, interval: float = PROFILE_INTERVAL, max_depth: int = MAX_DEPTH):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.elapsed = 0.0
+        self._labels: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+    
+    def start(self) -> "SamplingProfiler":
+        self._stop.clear()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self) -> "SamplingProfiler":
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.elapsed += time.perf_counter() - self._started
+        return self
+    
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self.stacks[self._collapse(names.get(ident, str(ident)), frame)] += 1
+            self.samples += 1
+    
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            # Путь внутри site-packages или репозитория короче и одинаков на разных серверах
+            for root in sys.path:
+                if root and path.startswith(root + os.sep):
+                    path = path[len(root) + 1:]
+                    break
+            label = self._labels[code] = f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ":")
+        return label
+    
+    def _collapse(self, thread_name: str, frame) -> str:
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.append(thread_name.replace(";", ":").replace(" ", "_"))
+        return ";".join(reversed(labels))
+    
+    def collapsed(self) -> str:
+        """Стеки в формате collapsed stacks (самые частые первыми)"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+_active: Optional[SamplingProfiler] = None
+
+async def profile(seconds: float, interval: float = PROFILE_INTERVAL) -> SamplingProfiler:
+    """Профилирует процесс seconds секунд, не блокируя цикл событий.
+    
+    Одновременно идет только один замер, иначе выбрасывается ProfilerBusy."""
+    global _active
+    if _active is not None:
+        raise ProfilerBusy()
+    _active = SamplingProfiler(interval).start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        result, _active = _active.stop(), None
+    return result
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""
+Ограничение частоты действий пользователей.
+
+Для каждого действия (консультация, карта) задается политика:
+- token_bucket:<N>/<секунд>[:<burst>] — GCRA: N действий за период с запасом burst;
+  состояние пользователя — одно число (теоретическое время следующего запроса);
+- sliding_window:<N>/<секунд> — скользящее окно по двум счетчикам (текущее и
+  предыдущее окно), упакованным в одно целое.
+
+Записи хранятся в OrderedDict в порядке последнего обращения и удаляются,
+как только их состояние истекло (пользователь снова имеет полный лимит),
+а при достижении max_entries вытесняются самые давние. Поэтому память
+ограничена числом недавно активных пользователей, а не всех когда-либо писавших.
+"""
+
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from config import (
+    RATE_LIMIT_CONSULT, RATE_LIMIT_MAP, RATE_LIMIT_CRISIS_ALERT, RATE_LIMIT_MAX_ENTRIES, RATE_LIMIT_STATE_FILE
+)
+
+class TokenBucketPolicy:
+    """Токен-бакет в форме GCRA: состояние — одно число с плавающей точкой"""
+    
+    def __init__(self, count: int, period: float, burst: int = 1):
+        self.interval = period / count
+        self.tolerance = self.interval * (burst - 1)
+    
+    def hit(self, state: Optional[float], now: float) -> Tuple[float, Optional[float]]:
+        """Возвращает (сколько ждать, новое состояние); 0 — действие разрешено"""
+        tat = now if state is None or state < now else state
+        allowed_at = tat - self.tolerance
+        if now < allowed_at:
+            return allowed_at - now, state
+        return 0.0, tat + self.interval
+    
+    def expires_at(self, state: float) -> float:
+        return state
+
+class SlidingWindowPolicy:
+    """Скользящее окно: (номер окна, предыдущий счетчик, текущий счетчик) в одном int"""
+    
+    def __init__(self, count: int, period: float):
+        self.limit = count
+        self.window = period
+    
+    @staticmethod
+    def _unpack(state: int) -> Tuple[int, int, int]:
+        return state >> 32, (state >> 16) & 0xFFFF, state & 0xFFFF
+    
+    def hit(self, state: Optional[int], now: float) -> Tuple[float, Optional[int]]:
+        """Возвращает (сколько ждать, новое состояние); 0 — действие разрешено"""
+        index = int(now // self.window)
+        window_index, previous, current = self._unpack(state) if state is not None else (index, 0, 0)
+        if window_index != index:
+            previous = current if window_index == index - 1 else 0
+            current = 0
+        elapsed = now / self.window - index
+        if previous * (1 - elapsed) + current + 1 > self.limit:
+            if current + 1 > self.limit or not previous:
+                # Текущее окно заполнено. В следующем оно станет предыдущим, и запрос
+                # поместится, когда его вклад current * (1 - elapsed) опустится до limit - 1
+                needed = 1 - (self.limit - 1) / current if current else 0.0
+                return (index + 1 + needed) * self.window - now, state
+            # Ждем, пока вклад предыдущего окна уменьшится настолько, чтобы запрос поместился
+            needed = 1 - (self.limit - 1 - current) / previous
+            return max(0.0, needed - elapsed) * self.window, state
+        return 0.0, (index << 32) | (previous << 16) | min(current + 1, 0xFFFF)
+    
+    def expires_at(self, state: int) -> float:
+        return ((state >> 32) + 2) * self.window
+
+def parse_policy(spec: str):
+    """Разбирает строку вида "token_bucket:1/10" или "sliding_window:5/3600" """
+    kind, _, params = spec.partition(":")
+    rate, _, burst = params.partition(":")
+    count, _, period = rate.partition("/")
+    if kind == "token_bucket":
+        return TokenBucketPolicy(int(count), float(period), int(burst or 1))
+    if kind == "sliding_window":
+        return SlidingWindowPolicy(int(count), float(period))
+    raise ValueError(f"Unknown rate limit policy: {spec}")
+
+class RateLimiter:
+    def __init__(self, policy, max_entries: int = RATE_LIMIT_MAX_ENTRIES):
+        self.policy = policy
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, Any]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def hit(self, key, now: Optional[float] = None) -> float:
+        """Регистрирует действие. Возвращает 0, если оно разрешено, иначе сколько секунд ждать"""
+        now = time.time() if now is None else now
+        self._evict(now)
+        wait, state = self.policy.hit(self._entries.get(key), now)
+        if not wait:
+            self._entries[key] = state
+            self._entries.move_to_end(key)
+        return wait
+    
+    def _evict(self, now: float):
+        entries = self._entries
+        while entries:
+            key = next(iter(entries))
+            if len(entries) < self.max_entries and self.policy.expires_at(entries[key]) > now:
+                break
+            del entries[key]
+    
+    def dump(self, now: Optional[float] = None) -> list:
+        """Непросроченные записи для сохранения"""
+        self._evict(time.time() if now is None else now)
+        return [[key, state] for key, state in self._entries.items()]
+    
+    def restore(self, items: list):
+        for key, state in items:
+            self._entries[key] = state
+        self._evict(time.time())
+
+class RateLimits:
+    """Набор ограничителей по действиям с необязательным сохранением в файл"""
+    
+    def __init__(self, policies: Dict[str, str], state_file: Optional[str] = None,
+                 max_entries: int = RATE_LIMIT_MAX_ENTRIES):
+        self.limiters = {action: RateLimiter(parse_policy(spec), max_entries) for action, spec in policies.items()}
+        self.state_file = state_file
+        if state_file:
+            self.load()
+    
+    @classmethod
+    def from_config(cls) -> "RateLimits":
+        return cls(
+            {"consult": RATE_LIMIT_CONSULT, "map": RATE_LIMIT_MAP, "crisis_alert": RATE_LIMIT_CRISIS_ALERT},
+            RATE_LIMIT_STATE_FILE
+        )
+    
+    def hit(self, action: str, user_id: int) -> float:
+        """Возвращает 0, если действие разрешено, иначе сколько секунд ждать"""
+        return self.limiters[action].hit(user_id)
+    
+    def load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return
+        for action, items in data.items():
+            if action in self.limiters:
+                self.limiters[action].restore(items)
+    
+    def save(self):
+        """Сохраняет непросроченные ограничения, чтобы они пережили перезапуск"""
+        if not self.state_file:
+            return
+        data = {action: limiter.dump() for action, limiter in self.limiters.items()}
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_file, self.state_file)
\ No newline at end of file
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Повторная генерация сохраненных психологических карт.
+
+Карты читаются из базы (DATABASE_MODE) по порядку, их тексты заново строит
+LocalResponseSystem.generate_psychological_map в пуле процессов. Результаты
+записываются пакетами: один пакет — одна запись журнала (json/wal) или одна
+транзакция (sqlite). По умолчанию обновляются только карты, в которых вместо
+текста сохранена ошибка старого OpenAI-клиента (например, 403
+unsupported_country_region_territory); с --all обновляются все карты.
+
+После каждого пакета положение сохраняется в файл контрольной точки, поэтому
+прерванный запуск продолжается с того же места. С --dry-run база не
+меняется, а будущие изменения выводятся в виде diff.
+    
+    python3 regenerate_maps.py [--all] [--dry-run] [--workers 4] [--batch-size 100]
+                               [--checkpoint regenerate_maps.checkpoint] [--restart]
+"""
+
+import argparse
+import difflib
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import generation
+from config import DATABASE_MODE, GENERATION_WORKERS
+
+# Начала текстов, которые старый OpenAI-клиент сохранял вместо карты
+STALE_PREFIXES = (
+    "Извините, произошла ошибка",
+    "Извините, превышен лимит",
+)
+
+def is_stale(map_text: str) -> bool:
+    """Текст карты пустой или содержит сообщение об ошибке"""
+    return not map_text or map_text.startswith(STALE_PREFIXES)
+
+def open_database():
+    """Хранилище согласно DATABASE_MODE с немедленной записью изменений"""
+    if DATABASE_MODE == "sqlite":
+        from sqlite_database import SqliteDatabase
+        return SqliteDatabase()
+    from database import Database
+    return Database(write_behind=False)
+
+def _init_worker():
+    # Ctrl+C обрабатывает только основной процесс: он сохраняет положение и закрывает пул
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def generate_batch(batch: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, str]]:
+    """Строит тексты пакета карт (выполняется в процессе пула)"""
+    return [
+        (map_id, generation.psychological_map(data.get("answers", []), data.get("questions", []), data.get("type", "")))
+        for map_id, data in batch
+    ]
+
+def scan(db, after: Optional[str], batch_size: int, regenerate_all: bool) -> Iterator[Tuple[str, int, list]]:
+    """Разбивает карты на пакеты по batch_size просмотренных карт.
+    Возвращает (последняя просмотренная карта, просмотрено, карты для генерации)"""
+    batch, seen, last = [], 0, after
+    for map_id, map_entry in db.iter_maps(after, batch_size):
+        data = map_entry.get("data", {})
+        last, seen = map_id, seen + 1
+        if regenerate_all or is_stale(data.get("map_text", "")):
+            batch.append((map_id, data))
+        if seen >= batch_size:
+            yield last, seen, batch
+            batch, seen = [], 0
+    if seen:
+        yield last, seen, batch
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return {}
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]):
+    tmp_file = path + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_file, path)
+
+def print_diff(map_id: str, old_text: str, new_text: str):
+    diff = difflib.unified_diff(
+        old_text.splitlines(), new_text.splitlines(),
+        fromfile=f"{map_id} (сейчас)", tofile=f"{map_id} (после)", lineterm=""
+    )
+    print("\n".join(diff), end="\n\n")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Повторная генерация сохраненных психологических карт",
+        epilog="Без --all обновляются только карты с текстом ошибки вместо карты"
+    )
+    parser.add_argument("--all", action="store_true", help="Обновить все карты")
+    parser.add_argument("--dry-run", action="store_true", help="Показать diff, не меняя базу")
+    parser.add_argument("--workers", type=int, default=GENERATION_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--checkpoint", default="regenerate_maps.checkpoint")
+    parser.add_argument("--restart", action="store_true", help="Начать сначала, не учитывая контрольную точку")
+    args = parser.parse_args()
+    
+    checkpoint = {"all": args.all, "after": None, "scanned": 0, "updated": 0}
+    if not args.dry_run and not args.restart:
+        saved = load_checkpoint(args.checkpoint)
+        if saved and saved.get("all") != args.all:
+            sys.exit(f"Контрольная точка {args.checkpoint} создана с другим --all; запустите с --restart")
+        checkpoint.update(saved)
+        if checkpoint["after"] is not None:
+            print(f"Продолжение после карты {checkpoint['after']} "
+                  f"(просмотрено {checkpoint['scanned']}, обновлено {checkpoint['updated']})", file=sys.stderr)
+    
+    db = open_database()
+    total = db.count_maps()
+    started = time.monotonic()
+    scanned_now = 0
+    
+    def finish(last: str, seen: int, old_texts: Dict[str, str], future: Optional[Future]):
+        nonlocal scanned_now
+        texts = {map_id: text for map_id, text in (future.result() if future else []) if text != old_texts[map_id]}
+        if args.dry_run:
+            for map_id, text in texts.items():
+                print_diff(map_id, old_texts[map_id], text)
+        else:
+            db.update_map_texts(texts)
+        checkpoint["after"] = last
+        checkpoint["scanned"] += seen
+        checkpoint["updated"] += len(texts)
+        if not args.dry_run:
+            save_checkpoint(args.checkpoint, checkpoint)
+        scanned_now += seen
+        rate = scanned_now / max(time.monotonic() - started, 1e-9)
+        print(f"Просмотрено {checkpoint['scanned']}/{total}, обновлено {checkpoint['updated']}, "
+              f"{rate:.0f} карт/с", file=sys.stderr, flush=True)
+    
+    # В работе не больше двух пакетов на процесс: карты читаются по мере записи
+    in_flight = deque()
+    pool = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker)
+    try:
+        for last, seen, batch in scan(db, checkpoint["after"], args.batch_size, args.all):
+            old_texts = {map_id: data.get("map_text", "") for map_id, data in batch}
+            in_flight.append((last, seen, old_texts, pool.submit(generate_batch, batch) if batch else None))
+            if len(in_flight) >= 2 * args.workers:
+                finish(*in_flight.popleft())
+        while in_flight:
+            finish(*in_flight.popleft())
+    except KeyboardInterrupt:
+        pool.shutdown(wait=False, cancel_futures=True)
+        db.close()
+        if not args.dry_run:
+            print(f"Прервано; следующий запуск продолжит после карты {checkpoint['after']}", file=sys.stderr)
+        sys.exit(130)
+    pool.shutdown()
+    db.close()
+    
+    if args.dry_run:
+        print(f"Просмотрено карт: {checkpoint['scanned']}, будет обновлено: {checkpoint['updated']}")
+        return
+    # Запуск завершен: следующий начнется сначала
+    if os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    print(f"Просмотрено карт: {checkpoint['scanned']}, обновлено: {checkpoint['updated']}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Запуск основного бота и админской панели в одном процессе:
+один цикл getUpdates и одно общее хранилище вместо двух конкурирующих
+Application с одним токеном (run.py + run_admin.py)
+"""
+
+import os
+import sys
+import logging
+import admin_polling
+import bot_polling
+from config import BOT_MODE
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+def build_application():
+    """Создает Application с обработчиками бота и админ-панели"""
+    app = bot_polling.build_application()
+    # Команды админки регистрируются первыми: иначе внутри диалога их
+    # перехватит fallback ConversationHandler для неизвестных команд
+    admin_polling.register_handlers(app)
+    bot_polling.register_handlers(app)
+    return app
+
+def main():
+    """Основная функция запуска"""
+    # Проверяем переменные окружения
+    if not os.getenv('BOT_TOKEN'):
+        logging.error("BOT_TOKEN environment variable is not set")
+        sys.exit(1)
+    
+    logging.info("Starting psychological bot with admin panel...")
+    
+    try:
+        app = build_application()
+        if BOT_MODE == "webhook":
+            from webhook import run_webhook
+            run_webhook(app)
+        else:
+            app.run_polling(timeout=30, bootstrap_retries=5)
+    except KeyboardInterrupt:
+        logging.info("Bot stopped by user")
+    except Exception as e:
+        logging.error(f"Bot crashed: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Стеммер для русского языка по алгоритму Snowball (Портера):
+https://snowballstem.org/algorithms/russian/stemmer.html
+
+Отбрасывает окончания и суффиксы, чтобы разные формы слова ("тревожно",
+"тревожусь", "тревожная") сводились к одной основе. Работает без
+словарей и сети. stem() кэширует результаты (STEM_CACHE_SIZE слов), поэтому
+повторяющиеся слова разбираются один раз.
+"""
+
+import re
+from functools import lru_cache
+from config import STEM_CACHE_SIZE
+
+VOWELS = "аеиоуыэюя"
+
+# Окончания из группы 1 отбрасываются только после "а" или "я" (сама буква остается)
+PERFECTIVE_GERUND = re.compile(r"(?:ив|ивши|ившись|ыв|ывши|ывшись|(?<=[ая])(?:в|вши|вшись))$")
+REFLEXIVE = re.compile(r"(?:ся|сь)$")
+ADJECTIVE = re.compile(
+    r"(?:ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$"
+)
+PARTICIPLE = re.compile(r"(?:ивш|ывш|ующ|(?<=[ая])(?:ем|нн|вш|ющ|щ))$")
+VERB = re.compile(
+    r"(?:ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|"
+    r"ить|ыть|ишь|ую|ю|(?<=[ая])(?:ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно))$"
+)
+NOUN = re.compile(
+    r"(?:а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|"
+    r"ию|ью|ю|ия|ья|я)$"
+)
+SUPERLATIVE = re.compile(r"(?:ейш|ейше)$")
+DERIVATIONAL = re.compile(r"(?:ост|ость)$")
+
+def _skip(word: str, start: int, vowel: bool) -> int:
+    """Позиция после первой гласной (vowel=True) или согласной, начиная со start"""
+    for i in range(start, len(word)):
+        if (word[i] in VOWELS) == vowel:
+            return i + 1
+    return len(word)
+
+def _strip(pattern: re.Pattern, text: str) -> str:
+    """Отбрасывает самое длинное подходящее окончание (поиск с $ находит самое левое начало)"""
+    match = pattern.search(text)
+    return text[:match.start()] if match else text
+
+def _stem(word: str) -> str:
+    word = word.lower().replace("ё", "е")
+    rv_start = _skip(word, 0, True)
+    r2_start = _skip(word, _skip(word, _skip(word, rv_start, False), True), False)
+    prefix, rv = word[:rv_start], word[rv_start:]
+    
+    # Шаг 1: деепричастие, иначе возвратная частица и прилагательное/глагол/существительное
+    stripped = _strip(PERFECTIVE_GERUND, rv)
+    if stripped == rv:
+        rv = _strip(REFLEXIVE, rv)
+        for pattern in (ADJECTIVE, VERB, NOUN):
+            stripped = _strip(pattern, rv)
+            if stripped != rv:
+                if pattern is ADJECTIVE:
+                    # Прилагательное может стоять после причастного суффикса
+                    stripped = _strip(PARTICIPLE, stripped)
+                break
+    rv = stripped
+    
+    # Шаг 2: конечная "и"
+    if rv.endswith("и"):
+        rv = rv[:-1]
+    
+    # Шаг 3: словообразовательный суффикс, если он целиком в R2
+    match = DERIVATIONAL.search(rv)
+    if match and rv_start + match.start() >= r2_start:
+        rv = rv[:match.start()]
+    
+    # Шаг 4: превосходная степень, двойная "н" и мягкий знак
+    stripped = _strip(SUPERLATIVE, rv)
+    if stripped != rv or rv.endswith("нн"):
+        rv = stripped[:-1] if stripped.endswith("нн") else stripped
+    elif rv.endswith("ь"):
+        rv = rv[:-1]
+    return prefix + rv
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem(word: str) -> str:
+    """Возвращает основу слова (результат кэшируется)"""
+    return _stem(word)
\ No newline at end of file
@@ -0,0 +1,180 @@
+"""
+Компактное состояние диалога пользователя.
+
+UserSession хранится в context.user_data под ключом SESSION_KEY вместо
+отдельных ключей со списками: состояние диалога и стек навигации (bytearray),
+выбранная карта (id из каталога), тип анкеты (номер в MAP_TYPES) и ответы
+(один буфер UTF-8 и массив концов ответов). Номер текущего вопроса — число
+полученных ответов. Вопросы не копируются, они берутся из каталога карт.
+
+Для сохранения в базе сессия упаковывается struct'ом (pack/unpack): заголовок
+в 9 байт, стек навигации, концы ответов и сами ответы; в JSON хранится
+сжатым zlib, строкой base64. Замер памяти: python3 benchmarks/session_benchmark.py
+"""
+
+import base64
+import struct
+import zlib
+from array import array
+from typing import Any, Dict, List, Optional
+from map_catalog import MAP_TYPES, MAPS_BY_ID, MAP_TYPES_BY_NAME, MapEntry, MapType
+
+SESSION_KEY = "session"
+
+FORMAT_VERSION = 1
+# Версия, состояние, карта (0 — не выбрана), тип анкеты (NO_MAP_TYPE — не выбран),
+# длина стека навигации, число ответов
+_HEADER = struct.Struct("<BBHBHH")
+NO_MAP_TYPE = 0xFF
+
+# Сколько последних состояний помнит стек навигации
+NAVIGATION_LIMIT = 32
+
+# Ключи user_data до появления UserSession
+LEGACY_KEYS = ("navigation_stack", "current_state", "selected_map", "map_id",
+               "map_type", "map_questions", "map_answers", "current_q")
+
+class UserSession:
+    __slots__ = ("state", "navigation", "map_id", "_map_type", "_answers", "_ends")
+    
+    def __init__(self, state: int = 0):
+        self.state = state
+        self.navigation = bytearray()
+        self.map_id = 0
+        self._map_type = NO_MAP_TYPE
+        self._answers = b""
+        # Конец каждого ответа в _answers (в байтах)
+        self._ends = array("I")
+    
+    # Навигация
+    
+    def push_state(self, current_state: int, previous_state: Optional[int] = None):
+        if previous_state is not None:
+            self.navigation.append(previous_state)
+            if len(self.navigation) > NAVIGATION_LIMIT:
+                del self.navigation[0]
+        self.state = current_state
+    
+    def pop_state(self, default: int) -> int:
+        return self.navigation.pop() if self.navigation else default
+    
+    def reset(self, state: int):
+        self.navigation.clear()
+        self.state = state
+    
+    # Анкета
+    
+    @property
+    def selected_map(self) -> Optional[MapEntry]:
+        return MAPS_BY_ID.get(self.map_id)
+    
+    @property
+    def map_type(self) -> Optional[MapType]:
+        return MAP_TYPES[self._map_type] if self._map_type < len(MAP_TYPES) else None
+    
+    def questions(self) -> List[str]:
+        selected_map, map_type = self.selected_map, self.map_type
+        return selected_map.questions(map_type) if selected_map and map_type else []
+    
+    def start_questionnaire(self, map_type: MapType):
+        self._map_type = MAP_TYPES.index(map_type)
+        self._answers = b""
+        self._ends = array("I")
+    
+    @property
+    def current_q(self) -> int:
+        return len(self._ends)
+    
+    @property
+    def answers(self) -> List[str]:
+        answers, start = [], 0
+        for end in self._ends:
+            answers.append(self._answers[start:end].decode("utf-8"))
+            start = end
+        return answers
+    
+    def add_answer(self, answer: str):
+        self._answers += answer.encode("utf-8")
+        self._ends.append(len(self._answers))
+    
+    def pop_answer(self):
+        self._ends.pop()
+        self._answers = self._answers[:self._ends[-1] if self._ends else 0]
+    
+    # Сохранение
+    
+    def pack(self) -> bytes:
+        header = _HEADER.pack(FORMAT_VERSION, self.state, self.map_id, self._map_type,
+                              len(self.navigation), len(self._ends))
+        return header + bytes(self.navigation) + self._ends.tobytes() + self._answers
+    
+    @classmethod
+    def unpack(cls, data: bytes) -> "UserSession":
+        version, state, map_id, map_type, navigation_size, answer_count = _HEADER.unpack_from(data)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported session format {version}")
+        session = cls(state)
+        session.map_id = map_id
+        session._map_type = map_type
+        offset = _HEADER.size
+        session.navigation = bytearray(data[offset:offset + navigation_size])
+        offset += navigation_size
+        session._ends.frombytes(data[offset:offset + answer_count * session._ends.itemsize])
+        offset += answer_count * session._ends.itemsize
+        session._answers = data[offset:]
+        if len(session._answers) != (session._ends[-1] if answer_count else 0):
+            raise ValueError("Session data is truncated")
+        return session
+    
+    def to_text(self) -> str:
+        return base64.b64encode(zlib.compress(self.pack())).decode("ascii")
+    
+    @classmethod
+    def from_text(cls, text: str) -> "UserSession":
+        return cls.unpack(zlib.decompress(base64.b64decode(text)))
+    
+    def __reduce__(self):
+        # copy.deepcopy перед сохранением и pickle идут через компактный формат
+        return UserSession.unpack, (self.pack(),)
+    
+    @classmethod
+    def from_legacy(cls, user_data: Dict[Any, Any]) -> "UserSession":
+        """Сессия из ключей user_data, сохраненных до UserSession"""
+        session = cls(user_data.get("current_state", 0))
+        session.navigation = bytearray(user_data.get("navigation_stack", []))
+        selected_map = user_data.get("selected_map")
+        session.map_id = selected_map["id"] if selected_map else user_data.get("map_id", 0)
+        map_type = MAP_TYPES_BY_NAME.get(user_data.get("map_type"))
+        if map_type:
+            session.start_questionnaire(map_type)
+            for answer in user_data.get("map_answers", []):
+                session.add_answer(answer)
+        return session
+
+def get_session(user_data: Dict[Any, Any]) -> UserSession:
+    """Сессия пользователя; создается при первом обращении (из старых ключей, если они есть)"""
+    session = user_data.get(SESSION_KEY)
+    if session is None:
+        session = UserSession.from_legacy(user_data)
+        for key in LEGACY_KEYS:
+            user_data.pop(key, None)
+        user_data[SESSION_KEY] = session
+    return session
+
+def encode_user_data(user_data: Dict[Any, Any]) -> Dict[Any, Any]:
+    """user_data для записи в базу: сессия заменяется строкой"""
+    session = user_data.get(SESSION_KEY)
+    if not isinstance(session, UserSession):
+        return user_data
+    return {**user_data, SESSION_KEY: session.to_text()}
+
+def decode_user_data(user_data: Dict[Any, Any]) -> Dict[Any, Any]:
+    """user_data из базы; поврежденная сессия отбрасывается (диалог начнется заново)"""
+    text = user_data.get(SESSION_KEY)
+    if not isinstance(text, str):
+        return user_data
+    try:
+        session = UserSession.from_text(text)
+    except (ValueError, struct.error, zlib.error):
+        return {key: value for key, value in user_data.items() if key != SESSION_KEY}
+    return {**user_data, SESSION_KEY: session}
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+Вытеснение неактивных сессий из памяти.
+
+Пользователь, который начал анкету и не вернулся, иначе держал бы ответы в
+context.user_data до перезапуска бота. SessionManager запоминает время
+последнего обновления каждого пользователя (TypeHandler в группе
+SESSION_GROUP, раньше модерации и диалога). Задача JobQueue раз в
+SESSION_SWEEP_INTERVAL секунд переносит сессии пользователей, молчащих
+дольше SESSION_IDLE_TIMEOUT, в SessionStore (файл SQLite SESSION_STORE_FILE)
+и удаляет их user_data из памяти. Когда пользователь пишет снова, сессия
+возвращается из файла до обработки сообщения, и анкета продолжается с того
+же вопроса. Сессии, пролежавшие в файле дольше SESSION_STALE_TIMEOUT,
+удаляются.
+"""
+
+import logging
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+from telegram import Update
+from telegram.ext import ContextTypes
+from config import SESSION_STORE_FILE, SESSION_IDLE_TIMEOUT, SESSION_STALE_TIMEOUT, SESSION_SWEEP_INTERVAL
+from session import SESSION_KEY, UserSession
+
+# Группа обработчиков, которая выполняется раньше модерации (MODERATION_GROUP)
+SESSION_GROUP = -2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id INTEGER PRIMARY KEY,
+    evicted REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_evicted ON sessions(evicted);
+"""
+
+class SessionStore:
+    """Сессии, вытесненные из памяти (упакованные UserSession.pack и сжатые zlib)"""
+    
+    def __init__(self, db_file: str = SESSION_STORE_FILE):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+    
+    def put_many(self, sessions: Dict[int, UserSession]):
+        """Сохраняет сессии одной транзакцией"""
+        if not sessions:
+            return
+        now = time.time()
+        rows = [(user_id, now, zlib.compress(session.pack())) for user_id, session in sessions.items()]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO sessions (user_id, evicted, data) VALUES (?, ?, ?)", rows
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+    
+    def pop(self, user_id: int) -> Optional[UserSession]:
+        """Забирает сессию пользователя из файла; поврежденная запись отбрасывается"""
+        with self._lock:
+            row = self._conn.execute("DELETE FROM sessions WHERE user_id = ? RETURNING data", (user_id,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return UserSession.unpack(zlib.decompress(row[0]))
+        except (ValueError, struct.error, zlib.error):
+            logging.warning(f"Dropped unreadable stored session of user {user_id}")
+            return None
+    
+    def purge(self, older_than: float) -> int:
+        """Удаляет сессии, вытесненные раньше older_than (time.time())"""
+        with self._lock:
+            return self._conn.execute("DELETE FROM sessions WHERE evicted < ?", (older_than,)).rowcount
+    
+    def close(self):
+        self._conn.close()
+
+class SessionManager:
+    """Файл сессий открывается в start (post_init) и закрывается в stop (post_shutdown),
+    поэтому импорт бота не создает SESSION_STORE_FILE"""
+    
+    def __init__(self, store: Optional[SessionStore] = None, idle_timeout: float = SESSION_IDLE_TIMEOUT,
+                 stale_timeout: float = SESSION_STALE_TIMEOUT, store_file: str = SESSION_STORE_FILE):
+        self.store = store
+        self.store_file = store_file
+        self.idle_timeout = idle_timeout
+        self.stale_timeout = stale_timeout
+        # user_id -> время последнего обновления; порядок — от давних к недавним
+        self._last_seen: Dict[int, float] = {}
+        self.evicted = 0
+        self.restored = 0
+        self.purged = 0
+    
+    @classmethod
+    def from_config(cls) -> "SessionManager":
+        return cls(None, SESSION_IDLE_TIMEOUT, SESSION_STALE_TIMEOUT, SESSION_STORE_FILE)
+    
+    def stats(self) -> Dict[str, int]:
+        return {"resident": len(self._last_seen), "evicted": self.evicted,
+                "restored": self.restored, "purged": self.purged}
+    
+    def touch(self, user_id: int, now: Optional[float] = None):
+        self._last_seen.pop(user_id, None)
+        self._last_seen[user_id] = time.time() if now is None else now
+    
+    async def __call__(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user = update.effective_user
+        if user is None:
+            return
+        self.touch(user.id)
+        # Сессии в памяти нет — возможно, она была вытеснена
+        if self.store is not None and SESSION_KEY not in context.user_data:
+            session = self.store.pop(user.id)
+            if session is not None:
+                context.user_data[SESSION_KEY] = session
+                self.restored += 1
+    
+    def start(self, application):
+        """Вызывается из post_init: user_data, загруженные из базы, тоже считаются активными
+        с момента запуска; задачи вытеснения и очистки ставятся в JobQueue"""
+        if self.store is None:
+            self.store = SessionStore(self.store_file)
+        now = time.time()
+        for user_id in application.user_data:
+            self._last_seen.setdefault(user_id, now)
+        if application.job_queue is None:
+            logging.warning("JobQueue is not available, idle sessions will stay in memory "
+                            "(install python-telegram-bot[job-queue])")
+            return
+        application.job_queue.run_repeating(self._sweep, interval=SESSION_SWEEP_INTERVAL,
+                                            first=SESSION_SWEEP_INTERVAL, name="session_sweep")
+    
+    def stop(self):
+        """Закрывает файл сессий (вызывается из post_shutdown)"""
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+    
+    async def _sweep(self, context: ContextTypes.DEFAULT_TYPE):
+        self.evict_idle(context.application)
+        self.purge_stale()
+    
+    def evict_idle(self, application, now: Optional[float] = None) -> int:
+        """Переносит в файл сессии пользователей, молчащих дольше idle_timeout"""
+        now = time.time() if now is None else now
+        idle = []
+        for user_id, seen in self._last_seen.items():
+            if now - seen < self.idle_timeout:
+                break
+            idle.append(user_id)
+        sessions = {}
+        for user_id in idle:
+            del self._last_seen[user_id]
+            session = application.user_data.get(user_id, {}).get(SESSION_KEY)
+            if session is not None:
+                sessions[user_id] = session
+        # Сначала запись в файл, затем удаление из памяти (и из базы при следующем сохранении)
+        self.store.put_many(sessions)
+        for user_id in idle:
+            if user_id in application.user_data:
+                application.drop_user_data(user_id)
+        self.evicted += len(sessions)
+        if idle:
+            logging.info(f"Evicted {len(sessions)} idle sessions, {len(self._last_seen)} users resident")
+        return len(sessions)
+    
+    def purge_stale(self, now: Optional[float] = None) -> int:
+        """Удаляет из файла сессии, вытесненные дольше stale_timeout назад"""
+        purged = self.store.purge((time.time() if now is None else now) - self.stale_timeout)
+        self.purged += purged
+        if purged:
+            logging.info(f"Purged {purged} stale sessions")
+        return purged
\ No newline at end of file
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+SQLite-хранилище с тем же интерфейсом, что и database.Database.
+
+Включается через DATABASE_MODE=sqlite. Перенос существующих данных:
+    python3 sqlite_database.py migrate [--json database.json] [--sqlite database.sqlite3]
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from config import DATABASE_FILE, DATABASE_SQLITE_FILE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS psychological_maps (
+    seq INTEGER PRIMARY KEY,
+    map_id TEXT NOT NULL UNIQUE,
+    user_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_maps_status ON psychological_maps(status, seq);
+CREATE INDEX IF NOT EXISTS idx_maps_user ON psychological_maps(user_id, seq);
+"""
+
+class SqliteDatabase:
+    def __init__(self, db_file: Optional[str] = None):
+        self.db_file = db_file or DATABASE_SQLITE_FILE
+        self._lock = threading.Lock()
+        # Транзакции открываются явно через _transaction()
+        self._conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+    
+    @contextmanager
+    def _transaction(self):
+        """Пишущая транзакция: BEGIN IMMEDIATE сразу берет блокировку записи,
+        поэтому чтение-изменение-запись безопасно между процессами"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+    
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+    
+    @staticmethod
+    def _map_row(row) -> Dict[str, Any]:
+        user_id, status, data = row
+        return {"user_id": user_id, "data": json.loads(data), "status": status}
+    
+    def close(self):
+        """Закрывает соединение с базой"""
+        self._conn.close()
+    
+    # Каждая транзакция SQLite фиксируется сразу и пишет только измененные строки,
+    # поэтому отложенная запись здесь не нужна; методы оставлены для единого интерфейса
+    def flush(self):
+        """Сохраняет накопленные изменения"""
+    
+    def start_write_behind(self):
+        """Запускает фоновый сброс изменений (вызывается из post_init)"""
+    
+    async def stop_write_behind(self):
+        """Останавливает фоновый сброс изменений (вызывается из post_shutdown)"""
+    
+    def get_user_state(self, user_id: int) -> Optional[str]:
+        """Получает текущее состояние пользователя"""
+        return self.get_user_data(user_id).get("state")
+    
+    def set_user_state(self, user_id: int, state: str):
+        """Устанавливает состояние пользователя"""
+        self.set_user_data(user_id, "state", state)
+    
+    def get_user_data(self, user_id: int) -> Dict[str, Any]:
+        """Получает данные пользователя"""
+        rows = self._query("SELECT data FROM users WHERE user_id = ?", (str(user_id),))
+        return json.loads(rows[0][0]) if rows else {}
+    
+    def get_all_users(self) -> Dict[int, Dict[str, Any]]:
+        """Получает данные всех пользователей"""
+        return {int(user_id): json.loads(data) for user_id, data in self._query("SELECT user_id, data FROM users")}
+    
+    def set_user_data(self, user_id: int, key: str, value: Any):
+        """Устанавливает данные пользователя"""
+        self.set_users_data({user_id: {key: value}})
+    
+    def set_users_data(self, changes: Dict[int, Dict[str, Any]]):
+        """Устанавливает данные нескольких пользователей одной транзакцией ({user_id: {ключ: значение}})"""
+        if not changes:
+            return
+        with self._transaction() as conn:
+            for user_id, fields in changes.items():
+                row = conn.execute("SELECT data FROM users WHERE user_id = ?", (str(user_id),)).fetchone()
+                user_data = json.loads(row[0]) if row else {}
+                user_data.update(fields)
+                conn.execute(
+                    "INSERT INTO users (user_id, data) VALUES (?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data",
+                    (str(user_id), json.dumps(user_data, ensure_ascii=False))
+                )
+    
+    def save_psychological_map(self, user_id: int, map_data: Dict[str, Any]):
+        """Сохраняет психологическую карту"""
+        with self._transaction() as conn:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM psychological_maps").fetchone()[0]
+            map_id = f"map_{user_id}_{seq}"
+            conn.execute(
+                "INSERT INTO psychological_maps (seq, map_id, user_id, status, data) VALUES (?, ?, ?, 'pending', ?)",
+                (seq, map_id, user_id, json.dumps(map_data, ensure_ascii=False))
+            )
+        return map_id
+    
+    def get_map(self, map_id: str) -> Optional[Dict[str, Any]]:
+        """Получает карту по идентификатору"""
+        rows = self._query("SELECT user_id, status, data FROM psychological_maps WHERE map_id = ?", (map_id,))
+        return self._map_row(rows[0]) if rows else None
+    
+    def count_maps(self) -> int:
+        """Количество всех карт"""
+        return self._query("SELECT COUNT(*) FROM psychological_maps")[0][0]
+    
+    def iter_maps(self, after: Optional[str] = None, batch_size: int = 500) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Перебирает все карты в порядке создания, начиная после карты after.
+        Карты читаются страницами по batch_size (по seq, без OFFSET)"""
+        seq = 0
+        if after is not None:
+            rows = self._query("SELECT seq FROM psychological_maps WHERE map_id = ?", (after,))
+            seq = rows[0][0] if rows else 0
+        while True:
+            rows = self._query(
+                "SELECT seq, map_id, user_id, status, data FROM psychological_maps WHERE seq > ? ORDER BY seq LIMIT ?",
+                (seq, batch_size)
+            )
+            if not rows:
+                return
+            for row in rows:
+                yield row[1], self._map_row(row[2:])
+            seq = rows[-1][0]
+    
+    def update_map_texts(self, texts: Dict[str, str]):
+        """Заменяет тексты нескольких карт одной транзакцией"""
+        with self._transaction() as conn:
+            for map_id, map_text in texts.items():
+                row = conn.execute("SELECT data FROM psychological_maps WHERE map_id = ?", (map_id,)).fetchone()
+                if row is None:
+                    continue
+                map_data = json.loads(row[0])
+                map_data["map_text"] = map_text
+                conn.execute(
+                    "UPDATE psychological_maps SET data = ? WHERE map_id = ?",
+                    (json.dumps(map_data, ensure_ascii=False), map_id)
+                )
+    
+    def get_pending_maps(self) -> Dict[str, Any]:
+        """Получает все карты на модерации"""
+        rows = self._query(
+            "SELECT map_id, user_id, status, data FROM psychological_maps WHERE status = 'pending' ORDER BY seq"
+        )
+        return {row[0]: self._map_row(row[1:]) for row in rows}
+    
+    def count_pending(self, before: Optional[int] = None) -> int:
+        """Количество карт на модерации (с before — только с номером меньше before)"""
+        if before is None:
+            return self._query("SELECT COUNT(*) FROM psychological_maps WHERE status = 'pending'")[0][0]
+        return self._query(
+            "SELECT COUNT(*) FROM psychological_maps WHERE status = 'pending' AND seq < ?", (before,)
+        )[0][0]
+    
+    def get_pending_page(self, after: int = 0, limit: int = 10,
+                         before: Optional[int] = None) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """Страница очереди модерации по индексу idx_maps_status: (seq, map_id, карта)
+        по возрастанию seq. Берутся первые limit карт с seq больше after, а с
+        before — последние limit карт с seq меньше before"""
+        if before is None:
+            rows = self._query(
+                "SELECT seq, map_id, user_id, status, data FROM psychological_maps "
+                "WHERE status = 'pending' AND seq > ? ORDER BY seq LIMIT ?",
+                (after, limit)
+            )
+        else:
+            rows = self._query(
+                "SELECT seq, map_id, user_id, status, data FROM psychological_maps "
+                "WHERE status = 'pending' AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (before, limit)
+            )[::-1]
+        return [(row[0], row[1], self._map_row(row[2:])) for row in rows]
+    
+    def _set_map_status(self, map_id: str, status: str):
+        with self._transaction() as conn:
+            conn.execute("UPDATE psychological_maps SET status = ? WHERE map_id = ?", (status, map_id))
+    
+    def approve_map(self, map_id: str):
+        """Одобряет психологическую карту"""
+        self._set_map_status(map_id, "approved")
+    
+    def reject_map(self, map_id: str):
+        """Отклоняет психологическую карту"""
+        self._set_map_status(map_id, "rejected")
+    
+    def set_maps_status(self, map_ids: List[str], status: str):
+        """Меняет статус нескольких карт одной транзакцией (approved, rejected)"""
+        if not map_ids:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE psychological_maps SET status = ? WHERE map_id = ?",
+                [(status, map_id) for map_id in map_ids]
+            )
+    
+    def get_user_maps(self, user_id: int) -> Dict[str, Any]:
+        """Получает все карты пользователя"""
+        rows = self._query(
+            "SELECT map_id, user_id, status, data FROM psychological_maps WHERE user_id = ? ORDER BY seq",
+            (user_id,)
+        )
+        return {row[0]: self._map_row(row[1:]) for row in rows}
+
+def _map_user_id(map_id: str, map_data: Dict[str, Any]) -> Optional[int]:
+    """Пользователь карты; в старых записях без user_id он берется из map_<user_id>_<номер>"""
+    user_id = map_data.get("user_id")
+    if user_id is not None:
+        return user_id
+    parts = map_id.split("_")
+    if len(parts) == 3 and parts[0] == "map":
+        try:
+            return int(parts[1])
+        except ValueError:
+            pass
+    return None
+
+def migrate_from_json(json_file: str, sqlite_file: str) -> Dict[str, int]:
+    """Переносит пользователей и карты из JSON-базы в SQLite.
+    Уже перенесенные записи пропускаются, поэтому повторный запуск безопасен.
+    Возвращает число добавленных записей и карт, пропущенных без пользователя."""
+    with open(json_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    db = SqliteDatabase(sqlite_file)
+    users = data.get("users", {})
+    maps = data.get("psychological_maps", {})
+    counts = {"users": 0, "psychological_maps": 0, "skipped_maps": 0}
+    with db._transaction() as conn:
+        counts["users"] = conn.executemany(
+            "INSERT OR IGNORE INTO users (user_id, data) VALUES (?, ?)",
+            [(user_id, json.dumps(user_data, ensure_ascii=False)) for user_id, user_data in users.items()]
+        ).rowcount
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM psychological_maps").fetchone()[0]
+        for map_id, map_data in maps.items():
+            user_id = _map_user_id(map_id, map_data)
+            if user_id is None:
+                logging.warning(f"Map {map_id} has no user_id and is not migrated")
+                counts["skipped_maps"] += 1
+                continue
+            seq += 1
+            counts["psychological_maps"] += conn.execute(
+                "INSERT OR IGNORE INTO psychological_maps (seq, map_id, user_id, status, data) VALUES (?, ?, ?, ?, ?)",
+                (
+                    seq,
+                    map_id,
+                    user_id,
+                    map_data.get("status", "pending"),
+                    json.dumps(map_data.get("data", {}), ensure_ascii=False)
+                )
+            ).rowcount
+    db.close()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Работа с SQLite-хранилищем бота")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Перенести данные из database.json")
+    migrate_parser.add_argument("--json", default=DATABASE_FILE)
+    migrate_parser.add_argument("--sqlite", default=DATABASE_SQLITE_FILE)
+    args = parser.parse_args()
+    
+    if args.command == "migrate":
+        counts = migrate_from_json(args.json, args.sqlite)
+        print(f"Перенесено пользователей: {counts['users']}, карт: {counts['psychological_maps']}")
+        if counts["skipped_maps"]:
+            print(f"Пропущено карт без пользователя: {counts['skipped_maps']}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
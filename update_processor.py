@@ -0,0 +1,71 @@
+"""
+Параллельная обработка обновлений с сохранением порядка для каждого пользователя.
+
+PerUserUpdateProcessor передается в ApplicationBuilder.concurrent_updates:
+обновления разных пользователей обрабатываются одновременно (не больше
+UPDATE_CONCURRENCY), а обновления одного пользователя — строго по очереди
+в порядке поступления, поэтому ответы анкеты не перемешиваются. Пока
+обновление пользователя обрабатывается, следующие его обновления ждут в
+очереди этого пользователя и не занимают места в общем лимите.
+Нагрузочный тест: python3 benchmarks/concurrency_load.py
+"""
+
+import logging
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict, Optional
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    __slots__ = ("_queues",)
+    
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        # Ключ пользователя -> обновления, ожидающие окончания текущего
+        self._queues: Dict[int, Deque[Awaitable[Any]]] = {}
+    
+    @staticmethod
+    def key(update: object) -> Optional[int]:
+        """Пользователь (или чат, если пользователя нет), обновления которого упорядочиваются"""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return update.effective_chat.id
+        return None
+    
+    @property
+    def busy_users(self) -> int:
+        return len(self._queues)
+    
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self.key(update)
+        if key is None:
+            await coroutine
+            return
+        queue = self._queues.get(key)
+        if queue is not None:
+            # Обновление выполнит тот, кто сейчас обрабатывает этого пользователя
+            queue.append(coroutine)
+            return
+        self._queues[key] = queue = deque([coroutine])
+        try:
+            while queue:
+                try:
+                    await queue.popleft()
+                except Exception:
+                    # Ошибки обработчиков Application передает в error handler сам;
+                    # сюда попадает только то, что не должно остановить очередь пользователя
+                    logging.exception(f"Error while processing update of {key}")
+        finally:
+            del self._queues[key]
+            # При отмене (остановка бота) оставшиеся обновления не выполнятся
+            for pending in queue:
+                getattr(pending, "close", lambda: None)()
+    
+    async def initialize(self) -> None:
+        pass
+    
+    async def shutdown(self) -> None:
+        pass
\ No newline at end of file
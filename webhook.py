@@ -0,0 +1,115 @@
+"""
+Режим webhook: Telegram присылает обновления POST-запросами на aiohttp-сервер
+вместо длинного опроса getUpdates.
+
+Включается переменной BOT_MODE=webhook. Сервер проверяет секретный токен
+из заголовка X-Telegram-Bot-Api-Secret-Token, отвечает на GET /health и
+при SIGINT/SIGTERM перестает принимать запросы, дообрабатывает очередь
+обновлений и только потом останавливает Application.
+"""
+
+import asyncio
+import hmac
+import logging
+import secrets
+import signal
+from typing import Optional
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+from config import WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+class WebhookServer:
+    def __init__(self, application: Application, listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT,
+                 path: str = WEBHOOK_PATH, url: Optional[str] = WEBHOOK_URL, secret: Optional[str] = WEBHOOK_SECRET):
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self.url = url
+        # Если секрет не задан, он генерируется при каждом запуске и передается в setWebhook
+        self.secret = secret or secrets.token_urlsafe(32)
+        self._stopping = False
+        self._runner: Optional[web.AppRunner] = None
+    
+    @property
+    def address(self):
+        """Фактический адрес сервера (полезно при port=0)"""
+        return self._runner.addresses[0] if self._runner else None
+    
+    def _make_web_app(self) -> web.Application:
+        web_app = web.Application()
+        web_app.router.add_post(self.path, self._handle_update)
+        web_app.router.add_get("/health", self._handle_health)
+        return web_app
+    
+    async def _handle_update(self, request: web.Request) -> web.Response:
+        if self._stopping:
+            return web.Response(status=503)
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            return web.Response(status=403)
+        try:
+            update = Update.de_json(await request.json(), self.application.bot)
+        except Exception as e:
+            logging.warning(f"Invalid webhook payload: {e}")
+            return web.Response(status=400)
+        await self.application.update_queue.put(update)
+        return web.Response()
+    
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "status": "stopping" if self._stopping else "ok",
+                "update_queue": self.application.update_queue.qsize(),
+            },
+            status=503 if self._stopping else 200
+        )
+    
+    async def start(self):
+        """Инициализирует Application, регистрирует webhook и запускает HTTP-сервер"""
+        await self.application.initialize()
+        if self.application.post_init:
+            await self.application.post_init(self.application)
+        if self.url:
+            await self.application.bot.set_webhook(
+                url=self.url,
+                secret_token=self.secret,
+                allowed_updates=Update.ALL_TYPES
+            )
+        await self.application.start()
+        self._runner = web.AppRunner(self._make_web_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.listen, self.port).start()
+        logging.info(f"Webhook server listening on {self.address} (path {self.path})")
+    
+    async def stop(self):
+        """Плавная остановка: новые обновления отклоняются, принятые дообрабатываются"""
+        self._stopping = True
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        await self.application.stop()
+        if self.application.post_stop:
+            await self.application.post_stop(self.application)
+        await self.application.shutdown()
+        if self.application.post_shutdown:
+            await self.application.post_shutdown(self.application)
+
+async def serve(application: Application):
+    server = WebhookServer(application)
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    await server.start()
+    try:
+        await stop_event.wait()
+    finally:
+        logging.info("Stopping webhook server...")
+        await server.stop()
+
+def run_webhook(application: Application):
+    """Запускает бота в режиме webhook до SIGINT/SIGTERM"""
+    asyncio.run(serve(application))
\ No newline at end of file